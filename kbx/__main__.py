@@ -1,9 +1,16 @@
 from argparse import ArgumentParser, Namespace
 import logging
+import os
 from typing import Final, Any
 from pyk.utils import check_file_path, check_dir_path, ensure_dir_path
 from pathlib import Path
 
+from kbx.benchmark import DEFAULT_THRESHOLD, MODES, WORKSPACES, BenchmarkWorkspace, compare, \
+    environment_differences, format_regressions, format_report, load_report, run_benchmark, write_report
+from kbx.distributed import DEFAULT_CACHE_DIR, TOKEN_ENV, Worker, parse_address
+from kbx.profiling import Profiler
+from kbx.workload import FamiliesShape, HCSPShape, write_families_workload, write_hcsp_workload
+
 _LOGGER: Final = logging.getLogger(__name__)
 _LOG_FORMAT: Final = '%(levelname)s %(asctime)s %(name)s - %(message)s'
 
@@ -18,13 +25,19 @@ def main() -> None:
         raise AssertionError(f'Unimplemented command: {args.command}')
 
     execute = globals()[executor_name]
-    execute(**vars(args))
+    profiler = Profiler(args.profile_dir, enabled=args.profile)
+    with profiler.phase(args.command):
+        execute(**vars(args))
 
 
 def create_argument_parser() -> ArgumentParser:
     shared_args = ArgumentParser(add_help=False)
     shared_args.add_argument('--verbose', '-v', default=False, action='store_true', help='Verbose output.')
     shared_args.add_argument('--debug', default=False, action='store_true', help='Debug output.')
+    shared_args.add_argument('--profile', default=False, action='store_true',
+                             help='Write cProfile and tracemalloc reports of the command.')
+    shared_args.add_argument('--profile-dir', type=Path, default=Path('kbx-profile'),
+                             help='Output directory of the profiling reports.')
 
     parser = ArgumentParser(prog='kbx', description='KBX command line tool')
 
@@ -48,9 +61,160 @@ def create_argument_parser() -> ArgumentParser:
         required=False,
     )
 
+    # Generate Synthetic Workloads
+    workload_subparser = command_parser.add_parser('workload',
+                                                   help='generate synthetic models of arbitrary size.',
+                                                   parents=[shared_args])
+    workload_subparser.add_argument('kind', choices=['families', 'hcsp'], help='Kind of the generated models.')
+    workload_subparser.add_argument('--output_dir', dest='output_dir', type=dir_path, default=Path('.'),
+                                    help='Output directory path')
+    workload_subparser.add_argument('--stem', default='generated', help='File name stem of the generated models.')
+    workload_subparser.add_argument('--seed', type=int, default=0, help='Seed of the generation and the edits.')
+    workload_subparser.add_argument('--edits', type=int, default=0,
+                                    help='Number of edits for the modified versions of the models.')
+    workload_subparser.add_argument('--families', type=int, default=FamiliesShape.families,
+                                    help='Number of families.')
+    workload_subparser.add_argument('--max-sons', type=int, default=FamiliesShape.max_sons,
+                                    help='Maximal number of sons per family.')
+    workload_subparser.add_argument('--max-daughters', type=int, default=FamiliesShape.max_daughters,
+                                    help='Maximal number of daughters per family.')
+    workload_subparser.add_argument('--nothing-ratio', type=float, default=FamiliesShape.nothing_ratio,
+                                    help='Share of families with a `Nothing` parent.')
+    workload_subparser.add_argument('--processes', type=int, default=HCSPShape.processes,
+                                    help='Number of HCSP processes.')
+    workload_subparser.add_argument('--statements', type=int, default=HCSPShape.statements,
+                                    help='Number of top-level statements per HCSP process.')
+    workload_subparser.add_argument('--max-depth', type=int, default=HCSPShape.max_depth,
+                                    help='Maximal nesting depth of `CSPProcess`.')
+    workload_subparser.add_argument('--interrupts', type=int, default=HCSPShape.interrupts,
+                                    help='Number of communication interrupts.')
+    workload_subparser.add_argument('--branches', type=int, default=HCSPShape.branches,
+                                    help='Number of branches per communication interrupt.')
+
+    # Benchmark BX Workspaces
+    bench_subparser = command_parser.add_parser('bench',
+                                                help='benchmark the generation and synchronization of workspaces.',
+                                                parents=[shared_args])
+    bench_subparser.add_argument('--workspace', dest='workspaces', action='append', default=None,
+                                 help='Name of a registered workspace or a JSON file describing one '
+                                      '(repeatable; default: all registered workspaces).')
+    bench_subparser.add_argument('--mode', dest='modes', action='append', choices=MODES, default=None,
+                                 help='Mode to benchmark (repeatable; default: all modes).')
+    bench_subparser.add_argument('--size', dest='sizes', action='append', default=None,
+                                 help='Model size to benchmark (repeatable; default: all sizes).')
+    bench_subparser.add_argument('--warmup', type=int, default=1, help='Number of unmeasured runs per case.')
+    bench_subparser.add_argument('--repeat', type=int, default=5, help='Number of measured runs per case.')
+    bench_subparser.add_argument('--output', type=Path, default=Path('benchmark.json'),
+                                 help='Output file of the results.')
+    bench_subparser.add_argument('--baseline', type=Path, default=None,
+                                 help='Results to compare with; regressions make the command fail.')
+    bench_subparser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                 help='Relative increase of a median over the baseline reported as a regression.')
+
+    # Compare Benchmark Results
+    compare_subparser = command_parser.add_parser('bench-compare',
+                                                  help='compare benchmark results with a baseline.',
+                                                  parents=[shared_args])
+    compare_subparser.add_argument('results', type=file_path, help='Benchmark results.')
+    compare_subparser.add_argument('baseline', type=file_path, help='Baseline benchmark results.')
+    compare_subparser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                   help='Relative increase of a median over the baseline reported as a regression.')
+
+    # Run Synchronization Jobs of a Coordinator
+    worker_subparser = command_parser.add_parser('worker',
+                                                 help='run the synchronization jobs of a coordinator.',
+                                                 parents=[shared_args])
+    worker_subparser.add_argument('coordinator', type=parse_address,
+                                  help='Address of the coordinator (kbx.py serve), <host>:<port>.')
+    worker_subparser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                                  help='Directory of the workspace artifacts, shared by the workers of the host.')
+    worker_subparser.add_argument('--slots', type=int, default=1, help='Number of jobs run at once.')
+    worker_subparser.add_argument('--connect-timeout', type=float, default=30.0,
+                                  help='Seconds to retry connecting to the coordinator.')
+    worker_subparser.add_argument('--token', type=str, default=os.environ.get(TOKEN_ENV),
+                                  help=f'Token of the coordinator (default: ${TOKEN_ENV}).')
+
     return parser
 
 
+def exec_bench(
+    workspaces: list[str] | None,
+    modes: list[str] | None,
+    sizes: list[str] | None,
+    warmup: int,
+    repeat: int,
+    output: Path,
+    baseline: Path | None,
+    threshold: float,
+    **kwargs: Any,
+) -> None:
+    selected = [WORKSPACES[name] if name in WORKSPACES else BenchmarkWorkspace.load(file_path(name))
+                for name in workspaces or WORKSPACES]
+    report = run_benchmark(selected, modes or MODES, sizes, warmup, repeat)
+    write_report(report, output)
+    print(format_report(report))
+    _LOGGER.info(f'Benchmark results are written to: {output}')
+    if baseline is not None:
+        exec_bench_compare(output, baseline, threshold)
+
+
+def exec_bench_compare(
+    results: Path,
+    baseline: Path,
+    threshold: float,
+    **kwargs: Any,
+) -> None:
+    current, base = load_report(results), load_report(baseline)
+    differences = environment_differences(current, base)
+    if differences:
+        _LOGGER.warning(f'The results were measured in different environments: {", ".join(differences)}')
+    regressions = compare(current, base, threshold)
+    if regressions:
+        print(format_regressions(regressions))
+        raise SystemExit(f'{len(regressions)} regressions beyond {threshold:.0%} of the baseline.')
+    print(f'No regressions beyond {threshold:.0%} of the baseline.')
+
+
+def exec_worker(
+    coordinator: tuple[str, int],
+    cache_dir: Path,
+    slots: int,
+    connect_timeout: float,
+    token: str | None,
+    **kwargs: Any,
+) -> None:
+    jobs = Worker(coordinator, cache_dir, slots, connect_timeout, token=token).run()
+    _LOGGER.info(f'Ran {jobs} synchronization jobs.')
+
+
+def exec_workload(
+    kind: str,
+    output_dir: Path,
+    stem: str,
+    seed: int,
+    edits: int,
+    families: int,
+    max_sons: int,
+    max_daughters: int,
+    nothing_ratio: float,
+    processes: int,
+    statements: int,
+    max_depth: int,
+    interrupts: int,
+    branches: int,
+    **kwargs: Any,
+) -> None:
+    if kind == 'families':
+        shape = FamiliesShape(families, max_sons, max_daughters, nothing_ratio)
+        paths = write_families_workload(output_dir, shape, seed, edits, stem)
+    else:
+        shape = HCSPShape(processes, statements, max_depth, interrupts, branches)
+        paths = write_hcsp_workload(output_dir, shape, seed, edits, stem)
+    for path in paths:
+        _LOGGER.info(f'Generated: {path}')
+        print(path)
+
+
 def exec_gen(
     input_file: str,
     output_dir: str = 'none',
@@ -0,0 +1,456 @@
+"""
+This module benchmarks BX workspaces end to end.
+A benchmark case is one step on one workspace: the generation, the `init` of the interpreters, or a `trans` of the
+models of one size in one mode (`creation`, `sync` or `hints`, i.e., a creation with proof hints).
+Every step runs in a child process, after untimed warmup runs, and every run records
+1. the wall time;
+2. the CPU time and the peak RSS of the child and the processes it waited for (`kompile`, `krun`), from `wait4`.
+The report holds the median, the 95th percentile and the standard deviation of every metric, together with the
+environment it was measured in, and is compared against a stored baseline to flag regressions.
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final, Iterable
+
+from pyk.kast.inner import KInner, KToken
+
+from kbx.profiling import run_with_usage
+from kbx.synchronizer import DIRECTIONS, Synchronizer
+
+if TYPE_CHECKING:
+    from kbx.generator import BXGenerator
+
+MODES: Final = ('generate', 'init', 'creation', 'sync', 'hints')
+# the modes of one workspace; the others run on the models of every size
+WORKSPACE_MODES: Final = ('generate', 'init')
+METRICS: Final = ('wall_s', 'cpu_s', 'max_rss_kb')
+BENCH_DIR: Final = 'bench'
+DEFAULT_THRESHOLD: Final = 0.1
+_EVALUATION_DIR: Final = Path(__file__).resolve().parent.parent / 'evaluation'
+# generate the workspace described by the JSON of `BenchmarkWorkspace` in `sys.argv[1]`
+_GENERATE_SCRIPT: Final = """
+import contextlib, io, json, sys
+from kbx.benchmark import BenchmarkWorkspace
+from kbx.kompile import BuildProfile
+workspace = BenchmarkWorkspace.from_dict(json.loads(sys.argv[1]))
+with contextlib.redirect_stdout(io.StringIO()):
+    workspace.generator().generate(build_profile=BuildProfile.DEV)
+"""
+
+
+@dataclass(frozen=True)
+class BenchmarkModels:
+    """
+    The models of one size.
+    :param source: the source model, relative to the unidirectional definition; None if there is none
+    :param target: the target model, consistent with the source, relative to the unidirectional definition
+    """
+    source: str | None
+    target: str | None = None
+
+
+@dataclass(frozen=True)
+class BenchmarkWorkspace:
+    """
+    A BX workspace to benchmark: the arguments of its `BXGenerator` and its models by size.
+    :param name: the name the workspace is selected by
+    :param uni_path: the unidirectional definition
+    """
+    name: str
+    uni_path: Path
+    input_cell_name: str
+    input_cell_endstate: KInner
+    in_deletes: list[str]
+    output_cell_name: str
+    output_sort_name: str
+    out_deletes: list[str]
+    models: dict[str, BenchmarkModels]
+    default_value: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def workspace_dir(self) -> Path:
+        return self.uni_path.with_name(self.uni_path.stem + '-kbx-workspace')
+
+    def model_path(self, model: str) -> Path:
+        return self.uni_path.parent / model
+
+    def generator(self) -> BXGenerator:
+        # the generator imports the kompile machinery; only the child process generating the workspace needs it
+        from kbx.generator import BXGenerator
+        return BXGenerator(self.uni_path, self.input_cell_name, self.input_cell_endstate, self.in_deletes,
+                           self.output_cell_name, self.output_sort_name, self.out_deletes, self.default_value)
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data['uni_path'] = str(self.uni_path)
+        data['input_cell_endstate'] = self.input_cell_endstate.to_dict()
+        return data
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> BenchmarkWorkspace:
+        return BenchmarkWorkspace(
+            name=data['name'],
+            uni_path=Path(data['uni_path']),
+            input_cell_name=data['input_cell_name'],
+            input_cell_endstate=KInner.from_dict(data['input_cell_endstate']),
+            in_deletes=data['in_deletes'],
+            output_cell_name=data['output_cell_name'],
+            output_sort_name=data['output_sort_name'],
+            out_deletes=data['out_deletes'],
+            models={size: BenchmarkModels(**models) for size, models in data['models'].items()},
+            default_value=data.get('default_value', {}),
+        )
+
+    @staticmethod
+    def load(path: Path) -> BenchmarkWorkspace:
+        """Read a workspace from a JSON file; its relative paths are relative to the file."""
+        with open(path) as f:
+            data = json.load(f)
+        data['uni_path'] = str(path.parent / data['uni_path'])
+        return BenchmarkWorkspace.from_dict(data)
+
+
+FAMILIES2PERSONS: Final = BenchmarkWorkspace(
+    name='families2persons',
+    uni_path=_EVALUATION_DIR / 'families2persons' / 'families-to-persons.k',
+    input_cell_name='k',
+    input_cell_endstate=KToken('.Famlies', 'Families'),
+    in_deletes=['.Families', r',\s*\.FamilyMembers', '.FamilyMembers', r',\s*\ ~> .K'],
+    output_cell_name='person',
+    output_sort_name='Persons',
+    out_deletes=[r',\s*\.Persons'],
+    models={'example': BenchmarkModels('example.family', 'example.person')},
+)
+HCSP2UML: Final = BenchmarkWorkspace(
+    name='hcsp2uml',
+    uni_path=_EVALUATION_DIR / 'hcsp2uml' / 'hcsp-to-sequence.k',
+    input_cell_name='csp-program',
+    input_cell_endstate=KToken('.CSP', 'CSP'),
+    in_deletes=[r'\$\.CSPCommunicationInterrupts', r';\s*\.CSPProcess', r',\s*\.ContinuousAssignments', '.CSP'],
+    output_cell_name='uml-sequence',
+    output_sort_name='SequenceStatements',
+    out_deletes=[r'\.SequenceStatements'],
+    models={
+        'example': BenchmarkModels('example.hcsp', 'example.plantuml'),
+        'example-100': BenchmarkModels('example-100.hcsp'),
+        'example-1000': BenchmarkModels('example-1000.hcsp'),
+    },
+    default_value={
+        '?KbxGenTodo0': '#token("placeholdervar","Id")',
+        '?KbxGenTodo1': "0",
+        '?KbxGenTodo2': '#token("placeholdervar","Id")',
+        '?KbxGenTodo3': "0",
+        '?KbxGenTodo4': '#token("placeholder","Id")',
+        '?KbxGenTodo5': '#token("placeHolderHybrid","Hybrid")',
+        '?KbxGenTodo6': '#token("placeHolderHybrid","Hybrid")',
+    },
+)
+WORKSPACES: Final[dict[str, BenchmarkWorkspace]] = {}
+
+
+def register_workspace(workspace: BenchmarkWorkspace) -> None:
+    WORKSPACES[workspace.name] = workspace
+
+
+register_workspace(FAMILIES2PERSONS)
+register_workspace(HCSP2UML)
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    """
+    :param size: the size of the models; None for the modes of the whole workspace
+    :param direction: the direction of the `trans`; None for the modes of the whole workspace
+    """
+    workspace: str
+    mode: str
+    size: str | None = None
+    direction: str | None = None
+
+    @property
+    def name(self) -> str:
+        return '/'.join(part for part in (self.workspace, self.mode, self.size, self.direction) if part is not None)
+
+
+@dataclass
+class RunMeasurement:
+    wall_s: float
+    cpu_s: float
+    max_rss_kb: int
+
+
+@dataclass
+class CaseResult:
+    case: BenchmarkCase
+    runs: list[RunMeasurement]
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {metric: summarize([getattr(run, metric) for run in self.runs]) for metric in METRICS}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {'case': self.case.name, **asdict(self.case), 'runs': [asdict(run) for run in self.runs],
+                'stats': self.stats()}
+
+
+@dataclass(frozen=True)
+class Regression:
+    """
+    :param ratio: the current value divided by the baseline value
+    """
+    case: str
+    metric: str
+    baseline: float
+    current: float
+    ratio: float
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    """The median, the 95th percentile (nearest rank), the standard deviation, the minimum and the mean."""
+    ordered = sorted(values)
+    p95 = ordered[max(0, -(-95 * len(ordered) // 100) - 1)]
+    return {
+        'median': statistics.median(ordered),
+        'p95': p95,
+        'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'min': ordered[0],
+        'mean': statistics.fmean(ordered),
+    }
+
+
+def environment() -> dict[str, Any]:
+    """The metadata of the environment the benchmark runs in; results of different environments do not compare."""
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': _cpu_model(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'pyk': _package_version('kframework'),
+        'k': _command_version(['kompile', '--version']),
+        'kbx_commit': _command_version(['git', '-C', str(Path(__file__).resolve().parent), 'rev-parse', 'HEAD']),
+    }
+
+
+def cases(
+        workspaces: Iterable[BenchmarkWorkspace],
+        modes: Iterable[str] = MODES,
+        sizes: Iterable[str] | None = None,
+) -> list[BenchmarkCase]:
+    """
+    The cases of the modes on the workspaces, in the order they have to run: a workspace is generated and
+    initialized before its models are synchronized.
+    :param sizes: only the models of these sizes; all sizes if None
+    """
+    modes = [mode for mode in MODES if mode in set(modes)]
+    result = []
+    for workspace in workspaces:
+        for mode in modes:
+            if mode in WORKSPACE_MODES:
+                result.append(BenchmarkCase(workspace.name, mode))
+                continue
+            for size, models in workspace.models.items():
+                if sizes is not None and size not in sizes:
+                    continue
+                for direction, model in (('forward', models.source), ('backward', models.target)):
+                    if model is None or (mode == 'sync' and (models.source is None or models.target is None)):
+                        continue
+                    result.append(BenchmarkCase(workspace.name, mode, size, direction))
+    return result
+
+
+def run_benchmark(
+        workspaces: Iterable[BenchmarkWorkspace],
+        modes: Iterable[str] = MODES,
+        sizes: Iterable[str] | None = None,
+        warmup: int = 1,
+        repeat: int = 5,
+) -> dict[str, Any]:
+    """
+    Run the cases of the workspaces and return the report: the environment, the settings and the results.
+    A workspace that is not generated or initialized yet is, before its first case, even if the mode is not selected.
+    """
+    workspaces = list(workspaces)
+    by_name = {workspace.name: workspace for workspace in workspaces}
+    results = []
+    for case in cases(workspaces, modes, sizes):
+        workspace = by_name[case.workspace]
+        _prepare(workspace, case)
+        for _ in range(warmup):
+            _run_case(workspace, case)
+        result = CaseResult(case, [_run_case(workspace, case) for _ in range(repeat)])
+        results.append(result)
+        median = result.stats()['wall_s']['median']
+        print(f'{case.name}: {median * 1000:.3f} ms (median of {repeat})')
+    return {
+        'environment': environment(),
+        'settings': {'warmup': warmup, 'repeat': repeat},
+        'results': [result.to_dict() for result in results],
+    }
+
+
+def write_report(report: dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+
+def load_report(path: Path) -> dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(
+        current: dict[str, Any],
+        baseline: dict[str, Any],
+        threshold: float = DEFAULT_THRESHOLD,
+        statistic: str = 'median',
+        metrics: Iterable[str] = METRICS,
+) -> list[Regression]:
+    """
+    The cases of the current report whose statistic of a metric exceeds that of the baseline by more than the
+    threshold, e.g., 0.1 for 10%; the cases missing in either report are not compared.
+    """
+    baseline_stats = {result['case']: result['stats'] for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        stats = baseline_stats.get(result['case'])
+        if stats is None:
+            continue
+        for metric in metrics:
+            base, value = stats[metric][statistic], result['stats'][metric][statistic]
+            if base > 0 and value > base * (1 + threshold):
+                regressions.append(Regression(result['case'], metric, base, value, value / base))
+    return regressions
+
+
+def environment_differences(current: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """The environment metadata that differ between the reports, apart from the time they were measured."""
+    current_env, baseline_env = current.get('environment', {}), baseline.get('environment', {})
+    keys = sorted((set(current_env) | set(baseline_env)) - {'timestamp', 'kbx_commit'})
+    return [key for key in keys if current_env.get(key) != baseline_env.get(key)]
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [f'{"case":<48} {"median ms":>12} {"p95 ms":>12} {"stddev ms":>12} {"cpu s":>10} {"rss MB":>10}']
+    for result in report['results']:
+        stats = result['stats']
+        lines.append(f'{result["case"]:<48} {stats["wall_s"]["median"] * 1000:>12.3f} '
+                     f'{stats["wall_s"]["p95"] * 1000:>12.3f} {stats["wall_s"]["stddev"] * 1000:>12.3f} '
+                     f'{stats["cpu_s"]["median"]:>10.3f} {stats["max_rss_kb"]["median"] / 1024:>10.1f}')
+    return '\n'.join(lines)
+
+
+def format_regressions(regressions: list[Regression]) -> str:
+    return '\n'.join(f'{r.case} {r.metric}: {r.baseline:.4g} -> {r.current:.4g} (+{(r.ratio - 1) * 100:.1f}%)'
+                     for r in regressions)
+
+
+def _prepare(workspace: BenchmarkWorkspace, case: BenchmarkCase) -> None:
+    """Generate and initialize the workspace if the case needs it; this is not measured."""
+    if case.mode == 'generate':
+        return
+    if not (workspace.workspace_dir / 'kbx.py').exists():
+        _check(run_with_usage(_command(workspace, BenchmarkCase(workspace.name, 'generate')), env=_child_env())[0])
+    if case.mode != 'init' and not _is_kompiled(workspace):
+        _check(run_with_usage(_command(workspace, BenchmarkCase(workspace.name, 'init')), env=_child_env())[0])
+
+
+def _is_kompiled(workspace: BenchmarkWorkspace) -> bool:
+    """Whether `init` kompiled the definitions of the workspace, in its directories of either mode."""
+    with Synchronizer(workspace.workspace_dir) as sync:
+        return all(sync.kompiled_path(direction).exists() for direction in DIRECTIONS)
+
+
+def _run_case(workspace: BenchmarkWorkspace, case: BenchmarkCase) -> RunMeasurement:
+    if case.mode not in WORKSPACE_MODES:
+        _stage_models(workspace, case)
+    result, usage = run_with_usage(_command(workspace, case), env=_child_env())
+    _check(result)
+    return RunMeasurement(usage.wall_s, usage.user_cpu_s + usage.system_cpu_s, usage.max_rss_kb)
+
+
+def _command(workspace: BenchmarkWorkspace, case: BenchmarkCase) -> list[str]:
+    if case.mode == 'generate':
+        return [sys.executable, '-c', _GENERATE_SCRIPT, json.dumps(workspace.to_dict())]
+    kbx_script = str(workspace.workspace_dir / 'kbx.py')
+    if case.mode == 'init':
+        return [sys.executable, kbx_script, 'init', '--allow-proof-hints']
+    input_path, output_path = _staged_paths(workspace, case)
+    cmd = [sys.executable, kbx_script, 'trans', case.direction, str(input_path), str(output_path), '--no-cache']
+    if case.mode == 'hints':
+        cmd.append('--proof-hints')
+    return cmd
+
+
+def _staged_paths(workspace: BenchmarkWorkspace, case: BenchmarkCase) -> tuple[Path, Path]:
+    """The copies of the models a `trans` case runs on, in the `bench/` directory of the workspace."""
+    models = workspace.models[case.size]
+    source, target = (models.source, models.target) if case.direction == 'forward' else (models.target, models.source)
+    bench_dir = workspace.workspace_dir / BENCH_DIR / case.mode / case.size
+    output = Path(target).name if target is not None else Path(source).name + '.out'
+    return bench_dir / Path(source).name, bench_dir / output
+
+
+def _stage_models(workspace: BenchmarkWorkspace, case: BenchmarkCase) -> None:
+    """
+    Copy the models of the case before every run: a creation starts without the model to create,
+    a synchronization from the consistent pair of models.
+    """
+    models = workspace.models[case.size]
+    source, target = (models.source, models.target) if case.direction == 'forward' else (models.target, models.source)
+    input_path, output_path = _staged_paths(workspace, case)
+    shutil.rmtree(input_path.parent, ignore_errors=True)
+    input_path.parent.mkdir(parents=True)
+    shutil.copyfile(workspace.model_path(source), input_path)
+    if case.mode == 'sync':
+        shutil.copyfile(workspace.model_path(target), output_path)
+
+
+def _child_env() -> dict[str, str]:
+    # pin the hash seed, so that the iteration order of sets and dicts does not vary between the runs
+    return {**os.environ, 'PYTHONHASHSEED': '0'}
+
+
+def _check(result: subprocess.CompletedProcess) -> None:
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors='replace') if isinstance(result.stderr, bytes) else result.stderr
+        raise RuntimeError(f"'{' '.join(map(str, result.args[:3]))} ...' failed: {stderr}")
+
+
+def _cpu_model() -> str:
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def _package_version(name: str) -> str | None:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _command_version(cmd: list[str]) -> str | None:
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip().splitlines()[0] if result.returncode == 0 and result.stdout.strip() else None
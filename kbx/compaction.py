@@ -0,0 +1,159 @@
+"""
+This module compacts the complements of a configuration written by the interpreter.
+Create rules add entries to the `<kbx-complements-holder>` map and put rules rewrite them, but no rule removes them:
+the entries of elements deleted from the models stay, and the map grows with the history of the models.
+The compaction drops every entry whose key holds a token (a name, a number, ...) that occurs nowhere else in the
+configuration, i.e., in neither model: no element of the models can match the key any more.
+The rule id a key starts with is not such a token; a key of no other token is kept.
+`compact_complements_kore` does the same on the KORE text written by the interpreter: only the holder cell is parsed
+and rewritten, the rest of the configuration is only searched for its tokens.
+"""
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from typing import Final
+
+from pyk.kore.syntax import DV, App, Pattern
+
+from kbx.kore import KoreReader, replace_cell, write_pattern
+from kbx.prelude import COMPLEMENTS_CELL_NAME
+
+MAP_CONCAT: Final = "Lbl'Unds'Map'Unds'"
+MAP_ITEM: Final = "Lbl'UndsPipe'-'-GT-Unds'"
+MAP_UNIT: Final = "Lbl'Stop'Map"
+_INJ: Final = 'inj'
+_DV: Final = '\\dv'
+_HOLDER: Final = f"Lbl'-LT-'{COMPLEMENTS_CELL_NAME}'-GT-'"
+
+
+@dataclass(frozen=True)
+class CompactionReport:
+    """
+    :param kept: the number of complement entries kept
+    :param dropped: the number of complement entries dropped
+    """
+    kept: int
+    dropped: int
+
+
+def compact_complements(config: Pattern) -> tuple[Pattern, CompactionReport]:
+    """Drop the complement entries of the configuration that no element of the models can match any more."""
+    holder = None
+    live: set[DV] = set()
+    stack = [config]
+    while stack:
+        p = stack.pop()
+        if isinstance(p, App) and p.symbol == _HOLDER:
+            holder = p
+            continue
+        if isinstance(p, DV):
+            live.add(p)
+            continue
+        stack.extend(p.patterns)
+    if holder is None or not holder.args:
+        return config, CompactionReport(0, 0)
+    compacted, kept, dropped = _compact_map(holder.args[0], live, True)
+    if not dropped:
+        return config, CompactionReport(kept, 0)
+    return replace_cell(config, _HOLDER, holder.let(args=[compacted])), CompactionReport(kept, dropped)
+
+
+def compact_complements_kore(config: bytes) -> tuple[bytes, CompactionReport]:
+    """`compact_complements` on the KORE text of the configuration."""
+    reader = KoreReader(io.BytesIO(config))
+    holder = reader.find([_HOLDER]).get(_HOLDER)
+    if not isinstance(holder, App) or not holder.args:
+        return config, CompactionReport(0, 0)
+    start, end = reader.spans[_HOLDER]
+    live: set[DV] = set()
+    for part in (config[:start], config[end:]):
+        live.update(token for token in KoreReader(io.BytesIO(part)).find_all(_DV) if isinstance(token, DV))
+    compacted, kept, dropped = _compact_map(holder.args[0], live, True)
+    if not dropped:
+        return config, CompactionReport(kept, 0)
+    output = io.StringIO()
+    write_pattern(holder.let(args=[compacted]), output)
+    return config[:start] + output.getvalue().encode() + config[end:], CompactionReport(kept, dropped)
+
+
+def _compact_map(pattern: Pattern, live: set[DV], keyed_by_rule: bool) -> tuple[Pattern, int, int]:
+    """
+    :param keyed_by_rule: the first token of every key is the rule id;
+        otherwise, the keys are those of the map of one rule (the nested layout)
+    """
+    kept: list[App] = []
+    dropped = 0
+    for item in map_items(pattern):
+        key, value = item.args
+        if keyed_by_rule and _is_map(value):
+            # the nested layout: the key is the rule id, the value the map of its complements
+            group, group_kept, group_dropped = _compact_map(_strip_inj(value), live, False)
+            dropped += group_dropped
+            if group_kept:
+                kept.append(item.let(args=[key, _with_map(value, group)]))
+            continue
+        tokens = _tokens(key)
+        if keyed_by_rule:
+            tokens = tokens[1:]
+        if all(token in live for token in tokens):
+            kept.append(item)
+        else:
+            dropped += 1
+    return build_map(kept), len(kept), dropped
+
+
+def map_items(pattern: Pattern) -> list[App]:
+    """The `|->` applications of a map, in order."""
+    items = []
+    stack = [pattern]
+    while stack:
+        p = stack.pop()
+        if isinstance(p, App) and p.symbol == MAP_CONCAT:
+            stack.extend(reversed(p.args))
+        elif isinstance(p, App) and p.symbol == MAP_ITEM:
+            items.append(p)
+        elif not (isinstance(p, App) and p.symbol == MAP_UNIT):
+            raise ValueError(f'Unexpected pattern in a map: {p}')
+    return items
+
+
+def build_map(items: list[App]) -> Pattern:
+    """A map of the `|->` applications."""
+    if not items:
+        return App(MAP_UNIT)
+    result: Pattern = items[-1]
+    for item in reversed(items[:-1]):
+        result = App(MAP_CONCAT, (), (item, result))
+    return result
+
+
+def _is_map(pattern: Pattern) -> bool:
+    pattern = _strip_inj(pattern)
+    return isinstance(pattern, App) and pattern.symbol in (MAP_CONCAT, MAP_ITEM, MAP_UNIT)
+
+
+def _with_map(value: Pattern, group: Pattern) -> Pattern:
+    """The value with the map it injects replaced."""
+    if isinstance(value, App) and value.symbol == _INJ:
+        return value.let(args=[_with_map(value.args[0], group)])
+    return group
+
+
+def _strip_inj(pattern: Pattern) -> Pattern:
+    while isinstance(pattern, App) and pattern.symbol == _INJ:
+        pattern = pattern.args[0]
+    return pattern
+
+
+def _tokens(pattern: Pattern) -> list[DV]:
+    """The tokens of the pattern in pre-order."""
+    tokens = []
+    stack = [pattern]
+    while stack:
+        p = stack.pop()
+        if isinstance(p, DV):
+            tokens.append(p)
+        else:
+            stack.extend(reversed(p.patterns))
+    return tokens
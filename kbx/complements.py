@@ -0,0 +1,186 @@
+"""
+This module stores the complements of the synchronized models in a BX workspace.
+Every complement is a file in the `complements/` directory named by the hash of the real path of the model and of
+the content it was created for; the path index (`file_hashes.json`) maps the real path of each model to the hash of
+that content. A complement also depends on the other model of its pair, so models with the same content do not
+share one. A complement is referenced by its indexed path, and deleted once that path references other content.
+The store can be bounded in the number of complements, their total size and their age;
+it evicts the least recently used complements first.
+Evicting a complement is safe: the synchronizer creates the complements of both models before every run, or, in
+`watch`, whenever the complement it would continue from is gone.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Final
+
+from kbx.workspace import ComplementLimits
+
+_SECONDS_PER_DAY: Final = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class ComplementEntry:
+    hash: str
+    path: Path
+    size: int
+    last_used: float
+    refs: int
+
+
+@dataclass
+class GCReport:
+    dropped_paths: list[str] = field(default_factory=list)
+    removed: list[ComplementEntry] = field(default_factory=list)
+
+    @property
+    def freed_bytes(self) -> int:
+        return sum(entry.size for entry in self.removed)
+
+
+class ComplementStore:
+    directory: Path
+    index_file: Path
+    limits: ComplementLimits
+
+    def __init__(self, directory: Path, index_file: Path, limits: ComplementLimits | None = None) -> None:
+        self.directory = directory
+        self.index_file = index_file
+        self.limits = limits if limits is not None else ComplementLimits()
+
+    def load_index(self) -> dict[str, str]:
+        """
+        Load the path index with real paths as keys; entries recorded through different spellings of a path merge.
+        """
+        if not self.index_file.exists():
+            return {}
+        with open(self.index_file) as f:
+            stored: dict[str, str] = json.load(f)
+        return {_normalize(path): content_hash for path, content_hash in stored.items()}
+
+    def save_index(self, index: dict[str, str]) -> None:
+        tmp = self.index_file.with_name(self.index_file.name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=4)
+        os.replace(tmp, self.index_file)
+
+    def complement_path(self, model: str | Path, content_hash: str) -> Path:
+        """The file of the complement of the model with the given content hash."""
+        return self.directory / _complement_name(_normalize(model), content_hash)
+
+    def lookup(self, model: str | Path, content_hash: str | None = None) -> Path | None:
+        """
+        The complement of the model, marked as used; None if the model has no stored complement.
+        :param content_hash: only return a complement created for this content of the model
+        """
+        stored_hash = self.load_index().get(_normalize(model))
+        if stored_hash is None or content_hash is not None and stored_hash != content_hash:
+            return None
+        path = self.complement_path(model, stored_hash)
+        if not path.exists():
+            return None
+        os.utime(path)
+        return path
+
+    def put(self, model: str | Path, content_hash: str, complement: bytes) -> Path:
+        """Store the complement of the model with the given content hash, and delete its previous complement."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index = self.load_index()
+        key = _normalize(model)
+        prev_hash = index.get(key)
+        index[key] = content_hash
+        path = self.complement_path(key, content_hash)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(complement)
+        os.replace(tmp, path)
+        if prev_hash and prev_hash != content_hash:
+            self.complement_path(key, prev_hash).unlink(missing_ok=True)
+        self.save_index(index)
+        return path
+
+    def entries(self, index: dict[str, str] | None = None) -> list[ComplementEntry]:
+        """The stored complements, least recently used first."""
+        if index is None:
+            index = self.load_index()
+        refs = Counter(_complement_name(path, content_hash) for path, content_hash in index.items())
+        if not self.directory.exists():
+            return []
+        result = []
+        for path in self.directory.iterdir():
+            if path.suffix == '.tmp' or not path.is_file():
+                continue
+            stat = path.stat()
+            result.append(ComplementEntry(path.name, path, stat.st_size, stat.st_mtime, refs[path.name]))
+        result.sort(key=lambda entry: entry.last_used)
+        return result
+
+    def evict(self, limits: ComplementLimits | None = None) -> list[ComplementEntry]:
+        """
+        Evict complements until the store is within its limits: first the expired ones,
+        then the least recently used ones; the index entries of evicted complements are dropped.
+        """
+        limits = limits if limits is not None else self.limits
+        if not limits.bounded:
+            return []
+        index = self.load_index()
+        entries = self.entries(index)
+        now = time.time()
+        evicted = []
+        if limits.max_age_days is not None:
+            expired = [e for e in entries if now - e.last_used > limits.max_age_days * _SECONDS_PER_DAY]
+            evicted.extend(expired)
+            entries = [e for e in entries if e not in expired]
+        total = sum(e.size for e in entries)
+        while entries and ((limits.max_entries is not None and len(entries) > limits.max_entries)
+                           or (limits.max_bytes is not None and total > limits.max_bytes)):
+            entry = entries.pop(0)
+            total -= entry.size
+            evicted.append(entry)
+        if evicted:
+            self._remove(evicted, index)
+        return evicted
+
+    def gc(self, limits: ComplementLimits | None = None, dry_run: bool = False) -> GCReport:
+        """
+        Collect the garbage of the store:
+        1. drop the index entries of models that no longer exist;
+        2. remove the complements no path references, and leftovers of interrupted writes;
+        3. evict complements beyond the limits.
+        """
+        report = GCReport()
+        index = self.load_index()
+        report.dropped_paths = [path for path in index if not os.path.exists(path)]
+        for path in report.dropped_paths:
+            del index[path]
+        report.removed = [entry for entry in self.entries(index) if entry.refs == 0]
+        if dry_run:
+            return report
+        self.save_index(index)
+        self._remove(report.removed, index)
+        if self.directory.exists():
+            for tmp in self.directory.glob('*.tmp'):
+                tmp.unlink(missing_ok=True)
+        report.removed.extend(self.evict(limits))
+        return report
+
+    def _remove(self, entries: list[ComplementEntry], index: dict[str, str]) -> None:
+        names = {entry.hash for entry in entries}
+        for entry in entries:
+            entry.path.unlink(missing_ok=True)
+        self.save_index({path: content_hash for path, content_hash in index.items()
+                         if _complement_name(path, content_hash) not in names})
+
+
+def _normalize(path: str | Path) -> str:
+    return os.path.realpath(path)
+
+
+def _complement_name(real_path: str, content_hash: str) -> str:
+    return hashlib.sha256(f'{real_path}\0{content_hash}'.encode()).hexdigest()
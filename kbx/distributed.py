@@ -0,0 +1,654 @@
+"""
+This module distributes the synchronizations of a batch to workers on other hosts.
+A `Coordinator` runs in a BX workspace whose interpreters are kompiled and serves synchronization jobs over TCP;
+a `Worker` (`python -m kbx worker <host>:<port>`) needs no workspace of its own:
+1. On connecting, a worker receives the manifest of the workspace artifacts: every file of the generated definitions
+   and their interpreters, with the hash of its content. It fetches only the blobs missing from the artifact cache of
+   its host, so a host downloads an artifact once, whatever the number of its workers and synchronizations.
+2. Every slot of a worker then pulls one job at a time: the job holds the content of both models, and the worker
+   returns the written model and the complements of both models, which the coordinator writes and stores as a local
+   synchronization would.
+The queue of the coordinator is bounded: `submit` blocks while it is full, and a slot only gets a job when it is free.
+A worker sends heartbeats while it runs a job; the job of a worker that disconnects or falls silent is requeued, up
+to a number of retries. A job failing in the synchronization itself is not retried, it would fail again.
+Distributed jobs run without proof hints.
+A worker proves with a shared token that it may read the workspace; a coordinator listening on another than a
+loopback address requires one. The token is sent in the clear, so the network between the hosts must be trusted.
+Neither side trusts the paths the other sends: artifact paths stay within the workspace, job files are plain names,
+and the coordinator stores the returned complements under the hashes of the models it sent.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, asdict
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Final
+
+from kbx.synchronizer import SYNCHRONIZED_SUFFIX, BatchJob, BatchResult, SyncError, SyncResult, Synchronizer, \
+    check_independent
+from kbx.workspace import CONFIG_FILE, SYNC_FILE
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+PROTOCOL_VERSION: Final = 2
+DEFAULT_HOST: Final = '127.0.0.1'
+# the environment variable of the shared token, read by the command line
+TOKEN_ENV: Final = 'KBX_TOKEN'
+DEFAULT_CACHE_DIR: Final = Path.home() / '.cache' / 'kbx-artifacts'
+DEFAULT_QUEUE_SIZE: Final = 64
+DEFAULT_RETRIES: Final = 2
+HEARTBEAT_INTERVAL: Final = 5.0
+# a worker silent for this long while running a job is lost
+HEARTBEAT_TIMEOUT: Final = 30.0
+# the lengths of the JSON header and of the payloads of a message
+_FRAME: Final = struct.Struct('>IQ')
+# how often idle threads check whether the coordinator was closed
+_IDLE_POLL: Final = 0.5
+_DIGEST_RE: Final = re.compile(r'[0-9a-f]{64}')
+
+
+class DistributedError(Exception):
+    """A broken connection or protocol, e.g., a worker that disconnected or a corrupted artifact."""
+
+
+@dataclass(frozen=True)
+class Artifact:
+    """
+    A file of the workspace a worker needs.
+    :param path: the path relative to the workspace
+    :param mode: the permission bits of the file, e.g., executable for the interpreter
+    """
+    path: str
+    hash: str
+    size: int
+    mode: int
+
+
+def workspace_artifacts(sync: Synchronizer) -> list[Artifact]:
+    """The files of the workspace a worker synchronizes with: its description and its kompiled definitions."""
+    for direction in ('forward', 'backward'):
+        if not sync.kompiled_path(direction).exists():
+            raise DistributedError(f"'{sync.kompiled_path(direction)}' does not exist; run 'kbx.py init' first.")
+    paths = [sync.workspace / SYNC_FILE]
+    if (sync.workspace / CONFIG_FILE).exists():
+        paths.append(sync.workspace / CONFIG_FILE)
+    for definition_dir in sync.definition_dirs:
+        paths.extend(sorted(path for path in (sync.workspace / definition_dir).rglob('*')
+                            if path.is_file() and not path.name.endswith('.tmp')))
+    return [Artifact(path.relative_to(sync.workspace).as_posix(), _file_hash(path), path.stat().st_size,
+                     path.stat().st_mode & 0o777) for path in paths]
+
+
+def manifest_id(artifacts: list[Artifact]) -> str:
+    return hashlib.sha256(json.dumps([asdict(artifact) for artifact in artifacts]).encode()).hexdigest()
+
+
+def check_artifact(artifact: Artifact) -> None:
+    """Reject an artifact outside of the workspace, or whose hash is no file name of the blob store."""
+    path = PurePosixPath(artifact.path)
+    if path.is_absolute() or not path.parts or '..' in path.parts or '\\' in artifact.path:
+        raise DistributedError(f'Unexpected artifact path: {artifact.path!r}')
+    if not _DIGEST_RE.fullmatch(artifact.hash):
+        raise DistributedError(f'Unexpected artifact hash: {artifact.hash!r}')
+
+
+def check_file_name(name: str) -> str:
+    """Reject a job file name that is not a plain file name, e.g., a path."""
+    if not name or name in ('.', '..') or '/' in name or '\\' in name or '\0' in name:
+        raise DistributedError(f'Unexpected file name: {name!r}')
+    return name
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """`<host>:<port>` as a socket address."""
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Expected '<host>:<port>', found: {address!r}")
+    return host, int(port)
+
+
+class ArtifactStore:
+    """
+    The blobs fetched by the workers of a host, by the hash of their content, and the workspaces built from them.
+    The blobs are read-only; a workspace links them, except for executables, which are copied.
+    """
+    directory: Path
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def blob_path(self, digest: str) -> Path:
+        return self.directory / 'blobs' / digest
+
+    def add(self, digest: str, content: bytes) -> None:
+        if hashlib.sha256(content).hexdigest() != digest:
+            raise DistributedError(f'The content of the artifact {digest[:12]} does not match its hash.')
+        path = self.blob_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+
+    def materialize(self, artifacts: list[Artifact], fetch: Callable[[str], bytes], name: str) -> Path:
+        """
+        Build a workspace of the artifacts, fetching the missing blobs.
+        :param name: the name of the workspace directory, replaced if it exists
+        :return: the workspace
+        """
+        for artifact in artifacts:
+            check_artifact(artifact)
+        missing = {artifact.hash for artifact in artifacts if not self.blob_path(artifact.hash).exists()}
+        for digest in sorted(missing):
+            self.add(digest, fetch(digest))
+        if missing:
+            _LOGGER.info(f'Fetched {len(missing)} of {len(artifacts)} workspace artifacts.')
+        root = self.directory / 'workspaces' / name
+        shutil.rmtree(root, ignore_errors=True)
+        for artifact in artifacts:
+            path = root / artifact.path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            blob = self.blob_path(artifact.hash)
+            if artifact.mode & 0o111:
+                shutil.copyfile(blob, path)
+                os.chmod(path, artifact.mode)
+                continue
+            try:
+                os.link(blob, path)
+            except OSError:
+                shutil.copyfile(blob, path)
+        return root
+
+
+class _Connection:
+    """Messages over a socket: a JSON header and binary payloads; sending is thread-safe."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self._send_lock = threading.Lock()
+
+    def send(self, header: dict[str, Any], *payloads: bytes) -> None:
+        data = json.dumps({**header, 'sizes': [len(payload) for payload in payloads]}).encode()
+        with self._send_lock:
+            self.sock.sendall(_FRAME.pack(len(data), sum(map(len, payloads))) + data)
+            for payload in payloads:
+                self.sock.sendall(payload)
+
+    def recv(self) -> tuple[dict[str, Any], list[bytes]]:
+        header_size, payload_size = _FRAME.unpack(self._recv_exactly(_FRAME.size))
+        header = json.loads(self._recv_exactly(header_size))
+        data = self._recv_exactly(payload_size)
+        payloads = []
+        offset = 0
+        for size in header.pop('sizes'):
+            payloads.append(data[offset:offset + size])
+            offset += size
+        return header, payloads
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def _recv_exactly(self, size: int) -> bytes:
+        buffer = bytearray()
+        while len(buffer) < size:
+            try:
+                chunk = self.sock.recv(min(size - len(buffer), 1 << 20))
+            except socket.timeout as e:
+                raise DistributedError('The peer fell silent.') from e
+            if not chunk:
+                raise DistributedError('The peer closed the connection.')
+            buffer.extend(chunk)
+        return bytes(buffer)
+
+
+@dataclass
+class _Task:
+    job: BatchJob
+    future: Future
+    attempts: int = 0
+
+
+class _JobQueue:
+    """A bounded FIFO of tasks; requeued tasks go first and are not bounded, they were admitted already."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._tasks: deque[_Task] = deque()
+        self._maxsize = maxsize
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, task: _Task, timeout: float | None = None) -> None:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or len(self._tasks) < self._maxsize, timeout):
+                raise DistributedError(f'The job queue stayed full for {timeout}s.')
+            if self._closed:
+                raise DistributedError('The coordinator is closed.')
+            self._tasks.append(task)
+            self._cond.notify_all()
+
+    def put_front(self, task: _Task) -> None:
+        with self._cond:
+            self._tasks.appendleft(task)
+            self._cond.notify_all()
+
+    def get(self, timeout: float) -> _Task | None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._tasks or self._closed, timeout)
+            if not self._tasks:
+                return None
+            task = self._tasks.popleft()
+            self._cond.notify_all()
+            return task
+
+    def close(self) -> list[_Task]:
+        """Stop accepting tasks; return the tasks no worker took."""
+        with self._cond:
+            self._closed = True
+            tasks = list(self._tasks)
+            self._tasks.clear()
+            self._cond.notify_all()
+            return tasks
+
+
+class Coordinator:
+    """
+    Serves the synchronization jobs of a workspace to workers, and writes their results into the workspace.
+    The server listens from construction until `close`.
+    """
+    sync: Synchronizer
+    retries: int
+    heartbeat_timeout: float
+    use_cache: bool
+
+    def __init__(
+            self,
+            sync: Synchronizer,
+            host: str = DEFAULT_HOST,
+            port: int = 0,
+            queue_size: int = DEFAULT_QUEUE_SIZE,
+            retries: int = DEFAULT_RETRIES,
+            use_cache: bool = True,
+            heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+            token: str | None = None,
+    ) -> None:
+        """
+        :param port: the port to listen on; a free port if 0
+        :param queue_size: the number of jobs waiting for a worker at most; `submit` blocks beyond
+        :param retries: how many times the job of a lost worker is requeued before it fails
+        :param token: the token the workers must present; required unless the host is a loopback address
+        """
+        if not token and not _is_loopback(host):
+            raise DistributedError(f"Serving on '{host}' requires a token (--token or ${TOKEN_ENV}).")
+        self.sync = sync
+        self.retries = retries
+        self.use_cache = use_cache
+        self.heartbeat_timeout = heartbeat_timeout
+        self._token = token
+        self._artifacts = workspace_artifacts(sync)
+        self._manifest_id = manifest_id(self._artifacts)
+        self._blobs = {artifact.hash: sync.workspace / artifact.path for artifact in self._artifacts}
+        self._queue = _JobQueue(queue_size)
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._workers = 0
+        self._handlers: list[threading.Thread] = []
+        self._server = socket.create_server((host, port))
+        self._server.settimeout(_IDLE_POLL)
+        self._accept_thread = threading.Thread(target=self._accept, name='kbx-coordinator', daemon=True)
+        self._accept_thread.start()
+
+    def __enter__(self) -> Coordinator:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        host, port = self._server.getsockname()[:2]
+        return host, port
+
+    @property
+    def workers(self) -> int:
+        """The number of connected worker slots."""
+        return self._workers
+
+    def submit(self, job: BatchJob, timeout: float | None = None) -> Future:
+        """
+        Queue the job, waiting while the queue is full.
+        :return: the future of its `SyncResult`; a failed synchronization raises `SyncError`
+        """
+        future: Future = Future()
+        self._queue.put(_Task(job, future), timeout)
+        return future
+
+    def run_batch(self, jobs: list[BatchJob]) -> BatchResult:
+        """Synchronize independent model pairs on the workers; a failing synchronization does not stop the others."""
+        check_independent(jobs)
+        started = time.perf_counter()
+        futures = [self.submit(job) for job in jobs]
+        results: list[SyncResult] = []
+        failures: list[tuple[BatchJob, str]] = []
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append((job, str(e) or type(e).__name__))
+        return BatchResult(results, failures, time.perf_counter() - started)
+
+    def spawn_local_workers(self, count: int, cache_dir: Path | None = None, slots: int = 1) -> list[subprocess.Popen]:
+        """Start worker processes on this host, e.g., to use its cores or to test a deployment."""
+        host, port = self.address
+        cmd = [sys.executable, '-m', 'kbx', 'worker', f'{host}:{port}', '--slots', str(slots)]
+        if cache_dir is not None:
+            cmd += ['--cache-dir', str(cache_dir)]
+        package_root = str(Path(__file__).resolve().parent.parent)
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [package_root, os.environ.get('PYTHONPATH')]))}
+        # the token is passed in the environment, the command lines of the processes are visible to all users
+        if self._token:
+            env[TOKEN_ENV] = self._token
+        return [subprocess.Popen(cmd, env=env, stdin=subprocess.DEVNULL) for _ in range(count)]
+
+    def close(self) -> None:
+        """Stop serving; the idle workers are told to shut down, and the jobs no worker took fail."""
+        self._closed.set()
+        for task in self._queue.close():
+            if task.attempts or task.future.set_running_or_notify_cancel():
+                task.future.set_exception(SyncError('The coordinator was closed before the job ran.'))
+        self._accept_thread.join()
+        self._server.close()
+        # the idle connections tell their workers to shut down within a poll
+        for thread in self._handlers:
+            thread.join(4 * _IDLE_POLL)
+
+    def _accept(self) -> None:
+        while not self._closed.is_set():
+            try:
+                sock, peer = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            handler = threading.Thread(target=self._serve, args=(sock, f'{peer[0]}:{peer[1]}'), daemon=True)
+            handler.start()
+            self._handlers.append(handler)
+
+    def _serve(self, sock: socket.socket, peer: str) -> None:
+        conn = _Connection(sock)
+        sock.settimeout(self.heartbeat_timeout)
+        with self._lock:
+            self._workers += 1
+        try:
+            header, _ = conn.recv()
+            if header.get('type') != 'hello' or header.get('version') != PROTOCOL_VERSION:
+                raise DistributedError(f"Unexpected greeting of type {header.get('type')!r}, version "
+                                       f"{header.get('version')!r}")
+            if self._token and not hmac.compare_digest(str(header.get('token') or '').encode(), self._token.encode()):
+                raise DistributedError('The worker presented no or a wrong token.')
+            name = f"{header.get('host', peer)}/{header.get('pid')}/{header.get('slot')}"
+            conn.send({'type': 'workspace', 'id': self._manifest_id,
+                       'artifacts': [asdict(artifact) for artifact in self._artifacts]})
+            while True:
+                header, _ = conn.recv()
+                if header['type'] == 'ready':
+                    break
+                if header['type'] != 'fetch' or header['hash'] not in self._blobs:
+                    raise DistributedError(f'Unexpected request: {header}')
+                conn.send({'type': 'blob', 'hash': header['hash']}, self._blobs[header['hash']].read_bytes())
+            _LOGGER.info(f'Worker {name} is ready.')
+            self._run_jobs(conn, name)
+        except (OSError, DistributedError) as e:
+            _LOGGER.warning(f'Lost the connection to {peer}: {e}')
+        finally:
+            conn.close()
+            with self._lock:
+                self._workers -= 1
+
+    def _run_jobs(self, conn: _Connection, name: str) -> None:
+        while True:
+            task = self._queue.get(_IDLE_POLL)
+            if task is None:
+                if self._closed.is_set():
+                    conn.send({'type': 'shutdown'})
+                    return
+                continue
+            if task.attempts == 0 and not task.future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._dispatch(conn, task)
+            except (OSError, DistributedError) as e:
+                self._retry(task, f'Worker {name} was lost: {e}')
+                return
+            except Exception as e:
+                # e.g., a malformed reply; the state of the connection is unknown
+                _LOGGER.exception(f'Unexpected error in the job of worker {name}')
+                if not task.future.done():
+                    task.future.set_exception(SyncError(f'Unexpected error: {e}'))
+                return
+
+    def _dispatch(self, conn: _Connection, task: _Task) -> None:
+        job = task.job
+        input_path, output_path = Path(os.path.abspath(job.input_path)), Path(os.path.abspath(job.output_path))
+        if not input_path.is_file():
+            task.future.set_exception(SyncError(f"Input file '{input_path}' does not exist."))
+            return
+        input_content = input_path.read_bytes()
+        output_content = output_path.read_bytes() if output_path.exists() else None
+        conn.send({'type': 'job', 'direction': job.direction, 'input_name': input_path.name,
+                   'output_name': output_path.name, 'output_exists': output_content is not None,
+                   'use_cache': self.use_cache}, input_content, output_content or b'')
+        header, payloads = conn.recv()
+        while header['type'] == 'heartbeat':
+            header, payloads = conn.recv()
+        if header['type'] != 'result':
+            raise DistributedError(f'Unexpected reply: {header}')
+        if not header['ok']:
+            task.future.set_exception(SyncError(header['error']))
+            return
+        if len(payloads) != 3:
+            raise DistributedError(f'Expected the written model and two complements, found {len(payloads)} payloads.')
+        written = output_path if header['created'] else Path(f'{output_path}{SYNCHRONIZED_SUFFIX}')
+        # the complements are of the models as sent, or of the created output; the worker's view of them is not trusted
+        digests = [hashlib.sha256(input_content).hexdigest(),
+                   hashlib.sha256(payloads[0] if header['created'] else output_content or b'').hexdigest()]
+        with self._lock:
+            _write_atomic(written, payloads[0])
+            for model, digest, has_complement, complement in zip((input_path, output_path), digests,
+                                                                 header['complements'], payloads[1:]):
+                if has_complement is True:
+                    self.sync.store.put(model, digest, complement)
+        task.future.set_result(SyncResult(job.direction, input_path, output_path, written, header['timings'],
+                                          cached=header['cached']))
+
+    def _retry(self, task: _Task, reason: str) -> None:
+        task.attempts += 1
+        if task.attempts > self.retries or self._closed.is_set():
+            task.future.set_exception(SyncError(f'{reason}; gave up after {task.attempts} attempts.'))
+            return
+        _LOGGER.warning(f"{reason}; requeued the synchronization of '{task.job.input_path}'.")
+        self._queue.put_front(task)
+
+
+class Worker:
+    """
+    Runs the jobs of a coordinator, one per slot at a time, in a workspace built from the artifact cache.
+    The slots share one `Synchronizer`, as the synchronizations of a local batch do.
+    """
+    address: tuple[str, int]
+    store: ArtifactStore
+    slots: int
+
+    def __init__(
+            self,
+            address: tuple[str, int],
+            cache_dir: Path = DEFAULT_CACHE_DIR,
+            slots: int = 1,
+            connect_timeout: float = 30.0,
+            heartbeat_interval: float = HEARTBEAT_INTERVAL,
+            token: str | None = None,
+    ) -> None:
+        """
+        :param connect_timeout: how long to retry connecting to a coordinator that does not listen yet
+        :param token: the token of the coordinator
+        """
+        self.address = address
+        self.store = ArtifactStore(cache_dir)
+        self.slots = slots
+        self.connect_timeout = connect_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self._token = token
+        self._lock = threading.Lock()
+        self._sync: Synchronizer | None = None
+        self._workspace_id: str | None = None
+        self._jobs = 0
+        # the workspace of this worker; the workers of a host share the blobs only
+        self._name = uuid.uuid4().hex[:8]
+
+    def run(self) -> int:
+        """Serve the coordinator until it shuts down or disconnects; return the number of jobs run."""
+        threads = [threading.Thread(target=self._slot, args=(slot,), name=f'kbx-worker-{slot}')
+                   for slot in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._sync is not None:
+            self._sync.close()
+            shutil.rmtree(self._sync.workspace, ignore_errors=True)
+        return self._jobs
+
+    def _slot(self, slot: int) -> None:
+        conn = self._connect()
+        try:
+            conn.send({'type': 'hello', 'version': PROTOCOL_VERSION, 'host': socket.gethostname(),
+                       'pid': os.getpid(), 'slot': slot, 'token': self._token})
+            header, _ = conn.recv()
+            sync = self._synchronizer(conn, header['id'], [Artifact(**artifact) for artifact in header['artifacts']])
+            conn.send({'type': 'ready'})
+            while True:
+                header, payloads = conn.recv()
+                if header['type'] == 'shutdown':
+                    return
+                if header['type'] != 'job':
+                    raise DistributedError(f'Unexpected message: {header}')
+                conn.send(*self._run_job(conn, sync, slot, header, payloads))
+                with self._lock:
+                    self._jobs += 1
+        except (OSError, DistributedError) as e:
+            _LOGGER.warning(f'Slot {slot} lost the coordinator: {e}')
+        finally:
+            conn.close()
+
+    def _connect(self) -> _Connection:
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                sock = socket.create_connection(self.address)
+                sock.settimeout(None)
+                return _Connection(sock)
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(_IDLE_POLL)
+
+    def _synchronizer(self, conn: _Connection, workspace_id: str, artifacts: list[Artifact]) -> Synchronizer:
+        """The synchronizer of the workspace of the coordinator, built by the first slot to connect."""
+        with self._lock:
+            if self._workspace_id != workspace_id:
+                if self._sync is not None:
+                    self._sync.close()
+
+                def _fetch(digest: str) -> bytes:
+                    conn.send({'type': 'fetch', 'hash': digest})
+                    header, payloads = conn.recv()
+                    if header['type'] != 'blob' or header['hash'] != digest:
+                        raise DistributedError(f'Unexpected reply: {header}')
+                    return payloads[0]
+
+                workspace = self.store.materialize(artifacts, _fetch, f'{workspace_id[:16]}-{self._name}')
+                self._sync = Synchronizer(workspace)
+                self._workspace_id = workspace_id
+            return self._sync
+
+    def _run_job(self, conn: _Connection, sync: Synchronizer, slot: int, header: dict[str, Any],
+                 payloads: list[bytes]) -> tuple[Any, ...]:
+        """Synchronize the models of the job in the scratch directory of the slot; return the reply."""
+        scratch = sync.workspace / 'jobs' / str(slot)
+        shutil.rmtree(scratch, ignore_errors=True)
+        input_path = scratch / 'input' / check_file_name(header['input_name'])
+        output_path = scratch / 'output' / check_file_name(header['output_name'])
+        input_path.parent.mkdir(parents=True)
+        output_path.parent.mkdir(parents=True)
+        input_path.write_bytes(payloads[0])
+        if header['output_exists']:
+            output_path.write_bytes(payloads[1])
+        done = threading.Event()
+
+        def _heartbeat() -> None:
+            while not done.wait(self.heartbeat_interval):
+                conn.send({'type': 'heartbeat'})
+
+        heartbeat = threading.Thread(target=_heartbeat, daemon=True)
+        heartbeat.start()
+        try:
+            result = sync.trans_job(BatchJob(header['direction'], input_path, output_path), f'worker.{slot}',
+                                    use_cache=header['use_cache'])
+            # the complements of the models as they are now, if the synchronization left them
+            contents = []
+            for path in (input_path, output_path):
+                complement = sync.store.lookup(path, _file_hash(path)) if path.exists() else None
+                contents.append(complement.read_bytes() if complement is not None else None)
+        except Exception as e:
+            if not isinstance(e, SyncError):
+                _LOGGER.exception(f'Unexpected error in the job of slot {slot}')
+            return ({'type': 'result', 'ok': False, 'error': str(e) or type(e).__name__},)
+        finally:
+            done.set()
+            heartbeat.join()
+        reply = {'type': 'result', 'ok': True, 'created': result.created, 'timings': result.timings,
+                 'cached': result.cached, 'complements': [content is not None for content in contents]}
+        return reply, result.written_path.read_bytes(), *(content or b'' for content in contents)
+
+
+def _is_loopback(host: str) -> bool:
+    """Whether every address the host resolves to is a loopback address."""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except OSError:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].split('%')[0]).is_loopback for info in infos)
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, content: bytes) -> None:
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
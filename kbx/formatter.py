@@ -0,0 +1,128 @@
+"""
+This module contains the IterativeFormatter class, which formats KAST terms like `pyk.kast.formatter.Formatter`
+with explicit stacks, so that the cons lists of large models do not exhaust the stack.
+"""
+from __future__ import annotations
+
+from typing import Final, Sequence
+
+from pyk.kast.att import Atts
+from pyk.kast.formatter import Formatter, _with_bracket
+from pyk.kast.inner import KApply, KInner, KSequence, KToken, KVariable
+from pyk.kast.outer import KDefinition, KNonTerminal, KProduction, KRegexTerminal, KTerminal
+
+_KSEQ_SEPARATOR: Final = ' ~> '
+
+
+class _FormatToken:
+    """A token of the format of a production, to be interpreted for an application."""
+    __slots__ = ('token', 'production', 'kapply')
+
+    def __init__(self, token: str, production: KProduction, kapply: KApply) -> None:
+        self.token = token
+        self.production = production
+        self.kapply = kapply
+
+
+class IterativeFormatter(Formatter):
+    def format(self, term: KInner, fragments: Sequence[str] | None = None, fragment_sort: str | None = None) -> str:
+        """
+        :param fragments: the texts of the tokens of the fragment sort, by the index the token holds;
+            a text formatted at indentation 0 is indented to where its token is
+        """
+        if self._brackets:
+            term = add_brackets(self.definition, term)
+        chunks: list[str] = []
+        stack: list[KInner | _FormatToken | str] = [term]
+        while stack:
+            item = stack.pop()
+            match item:
+                case str():
+                    chunks.append(item)
+                case _FormatToken():
+                    stack.extend(reversed(self._interpret(item)))
+                case KToken(token, sort):
+                    if fragments is not None and sort.name == fragment_sort:
+                        text = fragments[int(token)]
+                        chunks.append(text.replace('\n', '\n' + self._indent * '  ') if self._indent else text)
+                    else:
+                        chunks.append(token)
+                case KVariable(name, sort):
+                    sort_str = f':{sort.name}' if sort else ''
+                    chunks.append(f'{name}{sort_str}')
+                case KSequence():
+                    stack.append('.K')
+                    for kitem in reversed(item.items):
+                        stack.append(_KSEQ_SEPARATOR)
+                        stack.append(kitem)
+                case KApply():
+                    production = self.definition.syntax_symbols[item.label.name]
+                    formatt = production.att.get(Atts.FORMAT, production.default_format)
+                    stack.extend(_FormatToken(token, production, item) for token in reversed(formatt.tokens))
+                case _:
+                    raise ValueError(f'Unsupported term: {item}')
+        return ''.join(chunks)
+
+    def _interpret(self, item: _FormatToken) -> list[KInner | str]:
+        """Interpret a format token like `Formatter._interpret_token`, without formatting the arguments."""
+        token = item.token
+        if not token[0] == '%':
+            return [token]
+        escape = token[1:]
+        if escape[0].isdigit():
+            index = int(escape)
+            production = item.production
+            assert 0 < index <= len(production.items), f'Format escape index out of bounds: {index}: {production}'
+            production_item = production.items[index - 1]
+            match production_item:
+                case KTerminal(value):
+                    return [value]
+                case KNonTerminal():
+                    arg_index = sum(isinstance(i, KNonTerminal) for i in production.items[: index - 1])
+                    return [item.kapply.args[arg_index]]
+                case KRegexTerminal():
+                    raise ValueError(f'Invalid format index escape to regex terminal: {index}: {production}')
+                case _:
+                    raise AssertionError()
+        match escape:
+            case 'n':
+                return ['\n', self._indent * '  ']
+            case 'i':
+                self._indent += 1
+                return []
+            case 'd':
+                self._indent -= 1
+                return []
+            case 'c' | 'r':
+                return []
+            case _:
+                return [escape]
+
+
+def add_brackets(definition: KDefinition, term: KInner) -> KInner:
+    """Add brackets like `pyk.kast.formatter.add_brackets`, bottom-up with an explicit stack."""
+    if not isinstance(term, KApply):
+        return term
+    # [application, its processed arguments, ...]
+    stack: list = [term, []]
+    while True:
+        args = stack[-1]
+        kapply = stack[-2]
+        if len(args) < len(kapply.args):
+            arg = kapply.args[len(args)]
+            if isinstance(arg, KApply):
+                stack.append(arg)
+                stack.append([])
+            else:
+                args.append(arg)
+            continue
+        stack.pop()
+        stack.pop()
+        production = definition.symbols[kapply.label.name]
+        non_terminals = [(index, item) for index, item in enumerate(production.items)
+                         if isinstance(item, KNonTerminal)]
+        kapply = kapply.let(args=[_with_bracket(definition, kapply, arg, item.sort, index)
+                                  for arg, (index, item) in zip(args, non_terminals)])
+        if not stack:
+            return kapply
+        stack[-1].append(kapply)
@@ -1,21 +1,36 @@
 import contextlib
+import dataclasses
+import io
+import json
 import shutil
-from collections import OrderedDict
+from collections import Counter, OrderedDict
 from pathlib import Path
-from string import Template
 from typing import Final, Iterable
 
 from pyk.kast import Atts
-from pyk.kast.outer import KDefinition, read_kast_definition, KSentence, KRule, KFlatModule, KImport
+from pyk.kast.outer import KDefinition, read_kast_definition, KSentence, KRule, KFlatModule, KImport, KSort
 from pyk.kast.inner import KApply, KLabel, KInner, KRewrite, KToken, collect, var_occurrences, KVariable, bottom_up, top_down
+from pyk.konvert import kast_to_kore
+from pyk.prelude.kbool import andBool
 from pyk.prelude.kint import intToken
 
-from kbx.kompile import kompile, KompileSource
+from kbx.kompile import kompile, KompileSource, BuildProfile
+from kbx.kore import write_pattern
+from kbx.native_lists import NativeList, find_user_lists, native_list_cells, to_native_config, to_native_rule, \
+    add_native_lists_module
 from kbx.outer import get_pure_k_definition, is_from_single_file, KConfiguration
 from kbx.pretty_sugar import PrettyPrinterWithSugar
+from kbx.priorities import PriorityReport, PRIORITIES_FILE, assign_priorities, load_profile, \
+    write_report as write_priority_report
+from kbx.profiling import Profiler, default_profile_dir
+from kbx.pruning import PruneMode, PrunedRule, PRUNING_FILE, find_dead_rules, write_report
+from kbx.rule_cache import RuleCache, RULE_CACHE_FILE, RULE_ID_PLACEHOLDER, rule_hash, todo_prefix, relocate, retag
 from kbx.utils import has_file_changed
+from kbx.workspace import WorkspaceConfig, SyncDefinition
 from .prelude import add_c_holder, content_of_c_holder, add_check_consistency, lower_priority, tokens2vars, vars2todos, \
-    add_required_modules
+    add_required_modules, tag_rule, ATT_KBX_RULE, RULE_INDEX_FILE, ComplementLayout, complements_module, \
+    COMPLEMENTS_MODULE_FILE, ConsistencyCheck, content_of_present_complement, \
+    add_direction_to_rule, add_direction_to_state, SOURCE_VAR, TARGET_VAR
 from .synchronizer_template import SYNC_TEMPLATE
 
 
@@ -38,7 +53,7 @@ def inverse_rule(rule: KRule) -> KRule:
 
 def _search_for_complement(
         rule: KRule,
-        rule_id: int,
+        rule_id: KToken,
 ) -> tuple[
     tuple[KInner, ...],
     tuple[KInner, ...],
@@ -47,6 +62,7 @@ def _search_for_complement(
     """
     Search for the complement of the rule.
     :param rule: the rule to search for the complement
+    :param rule_id: the token of the rule id, the first of the common tokens
     :return: a tuple of three tuples (common, miss_r, miss_l)
         - common: [common variables/tokens across different states]
         - miss_r: [variables/tokens unique to the left-hand side]
@@ -91,7 +107,7 @@ def _search_for_complement(
     # [variables/tokens unique to the right-hand side]
     miss_l = [token for token in all_right if token not in all_left]
     # [rule ID, common variables/tokens across different states]
-    common = [intToken(rule_id)] + [token for token in all_left if token in all_right and token not in cell_common]
+    common = [rule_id] + [token for token in all_left if token in all_right and token not in cell_common]
     return tuple(common), tuple(miss_r), tuple(miss_l)
 
 
@@ -200,6 +216,17 @@ class BXGenerator:
     _output_sort_name: Final[str]
     _out_deletes: Final[list[str]]
     _default_value: Final[dict[str, str]]
+    _complement_layout: Final[ComplementLayout]
+    _consistency_check: Final[ConsistencyCheck]
+    _native_lists: Final[bool]
+    _unified: Final[bool]
+    _rule_cache: Final[RuleCache | None]
+    _prune: Final[PruneMode]
+    # the dead rules found in each generated definition
+    _pruned: Final[dict[KompileSource, list[PrunedRule]]]
+    # the rule applications by definition and rule tag to assign the priorities from, if any
+    _rule_profile: Final[dict[str, Counter[str]] | None]
+    _priority_reports: Final[dict[KompileSource, PriorityReport]]
 
     def __init__(
             self,
@@ -210,9 +237,28 @@ class BXGenerator:
             output_cell_name: str,
             output_sort_name: str,
             out_deletes: list[str],
-            default_value: dict[str, str] = None
+            default_value: dict[str, str] = None,
+            complement_layout: ComplementLayout = ComplementLayout.FLAT,
+            consistency_check: ConsistencyCheck = ConsistencyCheck.DISJUNCTION,
+            native_lists: bool = False,
+            unified: bool = False,
+            stable_names: bool = False,
+            prune: PruneMode = PruneMode.OFF,
+            rule_profile: Iterable[Path] | None = None,
     ) -> None:
+        """
+        :param unified: generate one definition for both directions, whose rules are guarded by a direction cell,
+            instead of a forward and a backward definition; it is kompiled once
+        :param stable_names: name the `?KbxGenTodo` placeholders of each rule by the hash of the rule instead of
+            numbering them across all rules, and only synthesize the rules changed since the last generation
+        :param prune: report or drop the generated rules that can never apply, see `kbx.pruning`
+        :param rule_profile: the JSON rule statistics of representative synchronizations;
+            the priorities of the generated rules are assigned from them, see `kbx.priorities`
+        """
         self._uni_path = uni_path
+        # load the cache before the workspace is recreated
+        options = f'{complement_layout.value}:{consistency_check.value}'
+        self._rule_cache = RuleCache.load(self.kbx_workspace / RULE_CACHE_FILE, options) if stable_names else None
         # Create the folder; if exists, delete it and recreate
         if has_file_changed(self._uni_path):
             if self.kbx_workspace.exists():
@@ -244,14 +290,33 @@ class BXGenerator:
         if default_value is None:
             default_value = {}
         self._default_value = default_value
+        self._complement_layout = complement_layout
+        self._consistency_check = consistency_check
+        self._native_lists = native_lists
+        self._unified = unified
+        self._prune = prune
+        self._pruned = {}
+        self._rule_profile = load_profile(rule_profile) if rule_profile is not None else None
+        self._priority_reports = {}
 
     @property
     def kbx_workspace(self) -> Path:
         return self._uni_path.with_name(self._uni_path.stem + '-kbx-workspace')
 
-    def generate(self) -> None:
+    def generate(self, profile: bool = False, build_profile: BuildProfile = BuildProfile.RELEASE) -> None:
+        """
+        Generate the BX workspace.
+        :param profile: write cProfile and tracemalloc reports of the generation phases to the workspace
+        :param build_profile: the build profile `kbx.py init` uses unless told otherwise
+        """
+        profiler = Profiler(default_profile_dir(self.kbx_workspace), enabled=profile)
         # generate the BX definition: Steps 1-5
-        forward_k_def, backward_k_def = self.bx_synthesis()
+        with profiler.phase('bx-synthesis'):
+            if self._unified:
+                k_defs = {KompileSource.UNIFIED: self.unified_synthesis()}
+            else:
+                forward_k_def, backward_k_def = self.bx_synthesis()
+                k_defs = {KompileSource.FOR: forward_k_def, KompileSource.BAK: backward_k_def}
 
         def _print(k_def: KDefinition, source_type: KompileSource) -> None:
             # print the K definition with sugar & kompile
@@ -262,87 +327,266 @@ class BXGenerator:
             tmp_path.parent.mkdir(parents=True, exist_ok=True)
             with open(tmp_path, 'w') as tmp_f:
                 tmp_f.write(k_def_str)
+            self._write_rule_index(k_def, tmp_path.parent / RULE_INDEX_FILE)
+            if source_type in self._pruned:
+                write_report(tmp_path.parent / PRUNING_FILE, self._pruned[source_type], self._prune == PruneMode.DROP)
+            if source_type in self._priority_reports:
+                write_priority_report(tmp_path.parent / PRIORITIES_FILE, self._priority_reports[source_type])
+            module_str = complements_module(self._complement_layout, k_def)
+            if module_str is not None:
+                with open(tmp_path.parent / COMPLEMENTS_MODULE_FILE, 'w') as module_f:
+                    module_f.write(module_str)
         # bx.6 print the forward and backward transformations
-        forward_k_def = add_required_modules(forward_k_def)
-        backward_k_def = add_required_modules(backward_k_def)
-        _print(forward_k_def, KompileSource.FOR)
-        _print(backward_k_def, KompileSource.BAK)
-        script = Template(SYNC_TEMPLATE).substitute({
-            'bx_def': self._uni_path.stem + '.k',
-            'f_in_cell_name': self._input_cell_name,
-            'f_out_cell_name': self._output_cell_name,
-            'f_in_delete': self._in_deletes,
-            'f_out_delete': self._out_deletes,
-        })
-        with open(self.kbx_workspace / 'kbx.py', 'w') as f:
-            f.write(script)
+        with profiler.phase('print-definitions'):
+            for source_type, k_def in k_defs.items():
+                _print(add_required_modules(k_def, self._complement_layout), source_type)
+        with profiler.phase('write-script'):
+            sync_def = SyncDefinition(
+                bx_def=self._uni_path.stem + '.k',
+                in_cell_name=self._input_cell_name,
+                in_deletes=self._in_deletes,
+                out_cell_name=self._output_cell_name,
+                out_deletes=self._out_deletes,
+                native_lists={cell_name: (native_list.cons, native_list.nil)
+                              for cell_name, native_list in self._native_list_cells(self._extract()[1][0]).items()},
+            )
+            if self._unified:
+                sync_def = self._with_unified_inits(sync_def)
+            sync_def.save(self.kbx_workspace)
+            with open(self.kbx_workspace / 'kbx.py', 'w') as f:
+                f.write(SYNC_TEMPLATE)
+            config = WorkspaceConfig.load(self.kbx_workspace)
+            config.build_profile = build_profile
+            config.save(self.kbx_workspace)
+        if self._rule_cache is not None:
+            print(f"Synthesized {self._rule_cache.misses} changed rules, "
+                  f"reused {self._rule_cache.hits} unchanged rules.")
+        for source_type, pruned in self._pruned.items():
+            action = 'Dropped' if self._prune == PruneMode.DROP else 'Found'
+            print(f"{action} {len(pruned)} dead rules in the {source_type.value} definition; "
+                  f"see '{source_type.value}/{PRUNING_FILE}'.")
+        for source_type, report in self._priority_reports.items():
+            print(f"Assigned the priorities of the {source_type.value} definition from the profile: "
+                  f"{report.old_attempts} -> {report.new_attempts} expected rule attempts "
+                  f"({report.saving:.1%} fewer); see '{source_type.value}/{PRIORITIES_FILE}'.")
         print("BX generation completed successfully.")
+        if profile:
+            print(f"Profiling reports are written to '{profiler.output_dir}'.")
         print("Please provide default values for `?KbxGenTodo` in the generated K definition of"
               " the backward transformation before synchronization.")
 
     def bx_synthesis(self) -> tuple[KDefinition, KDefinition]:
         # bx.1. extract the elements of the K definition of Unidirectional Transformation
         syntax, state, rules = self._extract()
+        native_cells = self._native_list_cells(state[0])
+        if native_cells:
+            rules = [(to_native_rule(rule, native_cells), module_name) for rule, module_name in rules]
         # f.2. construct State+C
         state_c: tuple[KConfiguration, str] = add_c_holder(state)
         # b.2. construct State+C^-1
         state_c_inv: tuple[KConfiguration, str] = self._reverse_io(state_c[0]), state_c[1]
-        rules_r: list[tuple[KRule, str]] = []
-        rules_l: list[tuple[KRule, str]] = []
-        # priorities_l = list(gen_reverse_priorities([rule for rule, _ in rules]))
-        for idx, rule in enumerate(rules):
-            group = rule[0].att.get(Atts.GROUP)
-            if group and group == 'bx':
-                rules_r.append(rule)
-                rules_l.append(rule)
-                continue
-            # declare the variables
-            put_r: tuple[KRule, str] | None = None
-            put_l: tuple[KRule, str] | None = None
-            # search for the complement
-            common, miss_r, miss_l = _search_for_complement(rule[0], idx)
-            if len(miss_r) == 0 and len(miss_l) == 0:
-                # f.3. construct CreateR semantic rules
-                create_r = rule
-                # b.3. construct CreateL semantic rules
-                create_l = inverse_rule(rule[0]), rule[1]
-                # create_l = change_priority(create_l[0], priorities_l[idx]), create_l[1]
-            else:
-                # f.3. construct CreateR semantic rules
-                create_r_content = content_of_c_holder('create_r', common, miss_r, miss_l)
-                create_r = add_c_holder(rule, create_r_content)
-                create_r = (add_check_consistency(create_r[0], common, miss_r, miss_l), create_r[1])
-                create_r = new_priority(create_r[0], True), create_r[1]
-                # create_r = lower_priority(create_r[0]), create_r[1]
-                # f.4. construct PutR semantic rules
-                var_rule, var_common, var_miss_r, var_miss_l = tokens2vars(rule[0], common, miss_r, miss_l)
-                put_r_content = content_of_c_holder('put_r', var_common, var_miss_r, var_miss_l)
-                put_r = var_rule, rule[1]
-                put_r = add_c_holder(put_r, put_r_content, True)
-                put_r = new_priority(put_r[0]), put_r[1]
-                # b.4. construct PutL semantic rules
-                put_l_content = content_of_c_holder('put_l', var_common, var_miss_r, var_miss_l)
-                inv_rule = inverse_rule(var_rule), rule[1]
-                put_l = add_c_holder(inv_rule, put_l_content, True)
-                put_l = new_priority(put_l[0]), put_l[1]
-                # put_l = change_priority(put_l[0], priorities_l[idx]), put_l[1]
-                # b.3. construct CreateL semantic rules
-                todo_rule, todo_miss_r = vars2todos(inv_rule[0], var_miss_r)
-                todo_rule = todo_rule, rule[1]
-                create_l_content = content_of_c_holder('create_l', var_common, todo_miss_r, var_miss_l)  # todo
-                create_l = add_c_holder(todo_rule, create_l_content)
-                create_l = add_check_consistency(create_l[0], var_common, todo_miss_r, var_miss_l), rule[1]
-                # create_l = change_priority(create_l[0], priorities_l[idx]), create_l[1]
-                # create_l = lower_priority(create_l[0]), create_l[1]
-                create_l = new_priority(create_l[0], True), create_l[1]
-            assert create_r and create_l, "Expected both create_r and create_l"
-            rules_r.extend([create_r, put_r] if put_r else [create_r])
-            rules_l.extend([create_l, put_l] if put_l else [create_l])
+        if native_cells:
+            state_c = to_native_config(state_c[0], native_cells), state_c[1]
+            state_c_inv = to_native_config(state_c_inv[0], native_cells), state_c_inv[1]
+        rules_r, rules_l = self._synthesize_rules(rules)
+        rules_r = self._profile_priorities(self._prune_rules(rules_r, KompileSource.FOR), KompileSource.FOR)
+        rules_l = self._profile_priorities(self._prune_rules(rules_l, KompileSource.BAK), KompileSource.BAK)
         # bx.5. construct the KDefinition of the forward transformation and the backward transformation
         forward_k_def = self._construct_kdef(syntax, state_c, rules_r)
         backward_k_def = self._construct_kdef(syntax, state_c_inv, rules_l)
+        if native_cells:
+            module_names = [state[1], *(module_name for _, module_name in rules)]
+            forward_k_def = add_native_lists_module(forward_k_def, native_cells.values(), module_names)
+            backward_k_def = add_native_lists_module(backward_k_def, native_cells.values(), module_names)
         return forward_k_def, backward_k_def
 
+    def unified_synthesis(self) -> KDefinition:
+        """
+        Construct one K definition holding the rules of both directions.
+        The configuration holds the source model (`$SOURCE`), the target model (`$TARGET`), the complements,
+        and the direction (`$DIRECTION`, 0 for forward and 1 for backward);
+        every generated rule matches the direction cell of its direction, the rules of the `bx` group match both.
+        """
+        syntax, state, rules = self._extract()
+        native_cells = self._native_list_cells(state[0])
+        if native_cells:
+            rules = [(to_native_rule(rule, native_cells), module_name) for rule, module_name in rules]
+        state_c = add_c_holder(state)
+        state_u = add_direction_to_state(self._unify_io(state_c[0]))
+        if native_cells:
+            state_u = to_native_config(state_u, native_cells)
+        rules_r, rules_l = self._synthesize_rules(rules)
+        rules_u = []
+        for direction, direction_rules in (('forward', rules_r), ('backward', rules_l)):
+            for rule, module_name in direction_rules:
+                if rule.att.get(ATT_KBX_RULE).endswith(':bx'):
+                    if direction == 'forward':
+                        rules_u.append((rule, module_name))
+                    continue
+                rules_u.append((add_direction_to_rule(rule, direction), module_name))
+        rules_u = self._profile_priorities(self._prune_rules(rules_u, KompileSource.UNIFIED), KompileSource.UNIFIED)
+        k_def = self._construct_kdef(syntax, (state_u, state_c[1]), rules_u)
+        if native_cells:
+            module_names = [state[1], *(module_name for _, module_name in rules)]
+            k_def = add_native_lists_module(k_def, native_cells.values(), module_names)
+        return k_def
+
+    def _synthesize_rules(
+            self,
+            rules: list[tuple[KRule, str]],
+    ) -> tuple[list[tuple[KRule, str]], list[tuple[KRule, str]]]:
+        """The rules of the forward and the backward transformation (steps 3 and 4)."""
+        rules_r: list[tuple[KRule, str]] = []
+        rules_l: list[tuple[KRule, str]] = []
+        cache = self._rule_cache
+        for idx, rule in enumerate(rules):
+            if cache is None:
+                rule_r, rule_l = self._synthesize_rule(idx, rule)
+            else:
+                digest = rule_hash(*rule)
+                cached = cache.get(digest)
+                if cached is None:
+                    cached = self._synthesize_rule(None, rule, todo_prefix(digest))
+                    cache.put(digest, cached)
+                rule_r = [(relocate(retag(r, idx), rule[0]), m) for r, m in cached[0]]
+                rule_l = [(relocate(retag(r, idx), rule[0]), m) for r, m in cached[1]]
+            rules_r.extend(rule_r)
+            rules_l.extend(rule_l)
+        if cache is not None:
+            cache.save()
+        return rules_r, rules_l
+
+    def _synthesize_rule(
+            self,
+            idx: int | None,
+            rule: tuple[KRule, str],
+            name_prefix: str | None = None,
+    ) -> tuple[list[tuple[KRule, str]], list[tuple[KRule, str]]]:
+        """
+        The rules of the forward and the backward transformation synthesized from one unidirectional rule.
+        :param idx: the rule id; None for the placeholder of the cached rules
+        :param name_prefix: the prefix of the names of its `?KbxGenTodo` placeholders; numbered globally by default
+        """
+        rule_id = RULE_ID_PLACEHOLDER if idx is None else intToken(idx)
+        layout = self._complement_layout
+        group = rule[0].att.get(Atts.GROUP)
+        if group and group == 'bx':
+            bx_rule = tag_rule(rule[0], rule_id.token, 'bx'), rule[1]
+            return [bx_rule], [bx_rule]
+        # declare the variables
+        put_r: tuple[KRule, str] | None = None
+        put_l: tuple[KRule, str] | None = None
+        # search for the complement
+        common, miss_r, miss_l = _search_for_complement(rule[0], rule_id)
+        if len(miss_r) == 0 and len(miss_l) == 0:
+            # f.3. construct CreateR semantic rules
+            create_r = [rule]
+            # b.3. construct CreateL semantic rules
+            create_l = [(inverse_rule(rule[0]), rule[1])]
+        else:
+            # f.3. construct CreateR semantic rules
+            create_r = self._create_rules('create_r', rule, common, miss_r, miss_l)
+            # create_r = lower_priority(create_r[0]), create_r[1]
+            # f.4. construct PutR semantic rules
+            var_rule, var_common, var_miss_r, var_miss_l = tokens2vars(rule[0], common, miss_r, miss_l)
+            put_r_content = content_of_c_holder('put_r', var_common, var_miss_r, var_miss_l, layout)
+            put_r = var_rule, rule[1]
+            put_r = add_c_holder(put_r, put_r_content, True)
+            put_r = new_priority(put_r[0]), put_r[1]
+            # b.4. construct PutL semantic rules
+            put_l_content = content_of_c_holder('put_l', var_common, var_miss_r, var_miss_l, layout)
+            inv_rule = inverse_rule(var_rule), rule[1]
+            put_l = add_c_holder(inv_rule, put_l_content, True)
+            put_l = new_priority(put_l[0]), put_l[1]
+            # b.3. construct CreateL semantic rules
+            todo_rule, todo_miss_r = vars2todos(inv_rule[0], var_miss_r, name_prefix)
+            todo_rule = todo_rule, rule[1]
+            create_l = self._create_rules('create_l', todo_rule, var_common, todo_miss_r, var_miss_l)
+        assert create_r and create_l, "Expected both create_r and create_l"
+        create_r = [(tag_rule(r, rule_id.token, 'create_r'), m) for r, m in create_r]
+        create_l = [(tag_rule(r, rule_id.token, 'create_l'), m) for r, m in create_l]
+        if put_r and put_l:
+            put_r = tag_rule(put_r[0], rule_id.token, 'put_r'), put_r[1]
+            put_l = tag_rule(put_l[0], rule_id.token, 'put_l'), put_l[1]
+        return ([*create_r, put_r] if put_r else create_r), ([*create_l, put_l] if put_l else create_l)
+
+    def _prune_rules(self, rules: list[tuple[KRule, str]], source_type: KompileSource) -> list[tuple[KRule, str]]:
+        """Find the dead rules of a generated definition; they are left out in the drop mode."""
+        if self._prune == PruneMode.OFF:
+            return rules
+        dead = find_dead_rules(rules, self._uni_kdef)
+        self._pruned[source_type] = list(dead.values())
+        if self._prune == PruneMode.DROP:
+            return [rule for idx, rule in enumerate(rules) if idx not in dead]
+        return rules
+
+    def _profile_priorities(
+            self,
+            rules: list[tuple[KRule, str]],
+            source_type: KompileSource,
+    ) -> list[tuple[KRule, str]]:
+        """Assign the priorities of the rules of a generated definition from the rule profile, if any."""
+        if self._rule_profile is None:
+            return rules
+        hits = self._rule_profile.get(source_type.value, Counter())
+        priorities, self._priority_reports[source_type] = assign_priorities(rules, hits, source_type.value)
+        return [(change_priority(rule, priorities[idx]), module_name) if idx in priorities else (rule, module_name)
+                for idx, (rule, module_name) in enumerate(rules)]
+
+    def _native_list_cells(self, config: KConfiguration) -> dict[str, NativeList]:
+        """The cells backed by `List` in the native list mode, by cell name; empty otherwise."""
+        if not self._native_lists:
+            return {}
+        return native_list_cells(config, find_user_lists(self._uni_pure_kdef))
+
+    def _create_rules(
+            self,
+            content_type: str,
+            rule: tuple[KRule, str],
+            common: tuple[KInner, ...],
+            miss_r: tuple[KInner, ...],
+            miss_l: tuple[KInner, ...],
+    ) -> list[tuple[KRule, str]]:
+        """
+        Construct the create rules storing the complement of the rule, checked for consistency.
+        :param content_type: `create_r` or `create_l`
+        :return: one rule with a disjunctive check, or the rule matching an equal complement and the rule storing
+            the complement if that one does not apply
+        """
+        layout = self._complement_layout
+        content = content_of_c_holder(content_type, common, miss_r, miss_l, layout)
+        create = new_priority(add_c_holder(rule, content)[0], True)
+        if self._consistency_check == ConsistencyCheck.DISJUNCTION:
+            return [(add_check_consistency(create, common, miss_r, miss_l, layout), rule[1])]
+        present_content, constraint = content_of_present_complement(common, miss_r, miss_l, layout)
+        present = add_c_holder(rule, present_content, True)[0]
+        if constraint is not None:
+            present = present.let(requires=andBool([present.requires, constraint]))
+        return [(new_priority(present, True), rule[1]), (lower_priority(create), rule[1])]
+
+    def _write_rule_index(self, k_def: KDefinition, path: Path) -> None:
+        """
+        Write the index of the generated rules in the order they are printed.
+        The n-th entry describes the n-th `rule` of the printed definition, which lets the runtime attribute
+        the execution statistics of a kompiled rule back to its unidirectional rule and its variant.
+        """
+        entries = []
+        for module in k_def.all_modules:
+            for sentence in self._printer.sugar_kflatmodule(module).sentences:
+                if not isinstance(sentence, KRule):
+                    continue
+                tag = sentence.att.get(ATT_KBX_RULE)
+                rule_id, variant = tag.split(':') if tag else (None, None)
+                location = sentence.att.get(Atts.LOCATION)
+                entries.append({
+                    'rule_id': int(rule_id) if rule_id is not None else None,
+                    'variant': variant,
+                    'module': module.name,
+                    'source_location': list(location) if location else None,
+                })
+        with open(path, 'w') as f:
+            json.dump({'source': str(self._uni_path), 'rules': entries}, f, indent=4)
+
     def _extract(self) -> tuple[
         list[tuple[KSentence, str]],
         tuple[KConfiguration, str],
@@ -401,6 +645,76 @@ class BXGenerator:
             att=self._uni_pure_kdef.att
         )
 
+    def _source_sort(self, config: KConfiguration) -> str | None:
+        """The sort of the source model: the sort `$PGM` is cast to in the configuration."""
+        if isinstance(config.content, tuple):
+            for cell in config.content:
+                sort = self._source_sort(cell)
+                if sort is not None:
+                    return sort
+            return None
+        content = config.content
+        if isinstance(content, KApply) and content.label.name.startswith('#SemanticCastTo') and len(content.args) == 1 \
+                and isinstance(content.args[0], KVariable) and content.args[0].name == '$PGM':
+            return content.label.name[len('#SemanticCastTo'):]
+        return None
+
+    def _output_init(self, config: KConfiguration) -> KInner | None:
+        """The initial content of the output cell of the configuration."""
+        if config.cell_name == self._output_cell_name:
+            return config.content
+        if isinstance(config.content, tuple):
+            for cell in config.content:
+                init = self._output_init(cell)
+                if init is not None:
+                    return init
+        return None
+
+    def _with_unified_inits(self, sync_def: SyncDefinition) -> SyncDefinition:
+        """
+        Describe the configuration variables of the unified definition for the runtime:
+        the sorts of the models, and the KORE of the end state of the source and the initial target,
+        which start the configurations of the backward and the forward transformation respectively.
+        """
+        state = self._extract()[1][0]
+        source_sort = self._source_sort(state)
+        assert source_sort is not None, "Expected the source model to be `$PGM` cast to its sort"
+        target_init = self._output_init(state)
+        assert isinstance(target_init, KInner), "Expected the output cell to hold its initial content"
+
+        def _to_kore(term: KInner, sort: str) -> str:
+            output = io.StringIO()
+            write_pattern(kast_to_kore(self._uni_kdef, term, KSort(sort)), output)
+            return output.getvalue()
+
+        return dataclasses.replace(
+            sync_def,
+            unified=True,
+            source_sort=source_sort,
+            target_sort=self._output_sort_name,
+            source_init=_to_kore(self._input_cell_endstate, source_sort),
+            target_init=_to_kore(target_init, self._output_sort_name),
+        )
+
+    def _unify_io(self, config: KConfiguration) -> KConfiguration:
+        """Start the source cell with `$SOURCE` and the output cell with `$TARGET` instead of `$PGM`."""
+        if config.cell_name == self._output_cell_name:
+            content: KInner | tuple = KApply('#SemanticCastTo' + self._output_sort_name, [KVariable(TARGET_VAR)])
+        elif isinstance(config.content, tuple):
+            content = tuple(self._unify_io(cell) for cell in config.content)
+        elif isinstance(config.content, KApply) and len(config.content.args) == 1 \
+                and isinstance(config.content.args[0], KVariable) and config.content.args[0].name == '$PGM':
+            content = config.content.let(args=[config.content.args[0].let(name=SOURCE_VAR)])
+        else:
+            return config
+        return KConfiguration(
+            cell_name=config.cell_name,
+            content=content,
+            multiplicity=config.multiplicity,
+            multi_type=config.multi_type,
+            att=config.att
+        )
+
     def _reverse_io(self, config: KConfiguration) -> KConfiguration:
         # change the input with $PGM into its end state
         if config.cell_name == self._output_cell_name:
@@ -10,6 +10,46 @@ class KompileSource(Enum):
     UNI = 'unidirectional'
     FOR = 'forward'
     BAK = 'backward'
+    UNIFIED = 'unified'
+
+
+class BuildProfile(Enum):
+    """
+    The kompile options of the generated interpreters, trading the kompile time against the synchronization time.
+    DEV: no optimization, for fast iterations on the definitions;
+    RELEASE: `-O3` and the GLR bison parser, for the fastest synchronization;
+    HINTS: RELEASE with the instrumentation for proof hints.
+    """
+    DEV = 'dev'
+    RELEASE = 'release'
+    HINTS = 'hints'
+
+    @property
+    def optimization(self) -> int:
+        match self:
+            case self.DEV:
+                return 0
+            case self.RELEASE | self.HINTS:
+                return 3
+            case _:
+                raise AssertionError()
+
+    @property
+    def bison_parser(self) -> bool:
+        return self != BuildProfile.DEV
+
+    @property
+    def proof_hints(self) -> bool:
+        return self == BuildProfile.HINTS
+
+    def kompile_flags(self) -> list[str]:
+        """The options of the `kompile` command line for the profile."""
+        flags = [f'-O{self.optimization}'] if self.optimization else []
+        if self.bison_parser:
+            flags.append('--gen-glr-bison-parser')
+        if self.proof_hints:
+            flags.append('--llvm-proof-hint-instrumentation')
+        return flags
 
 
 class KompileTarget(Enum):
@@ -63,7 +103,7 @@ def kompile(
         base_args=base_args_llvm,
         ccopts=ccopts,
         opt_level=optimization,
-        llvm_kompile_type=LLVMKompileType.C
+        llvm_kompile_type=llvm_kompile_type if llvm_kompile_type is not None else LLVMKompileType.C
     )
     return kompile_llvm(
         output_dir=output_dir / (str(source_type.value) + '-llvm-library'),
@@ -0,0 +1,359 @@
+"""
+This module handles the KORE terms of the synchronization without recursion.
+User lists (`List{Family, ","}`) are cons lists in KORE, so the terms of a model nest as deep as the model is long;
+the recursive descent of `KoreParser.pattern` and `Pattern.write` exhaust the stack on large models.
+The functions here use explicit stacks instead, and the cell search and replacement only visit what they need.
+`KoreReader` parses the output of the interpreter from its pipe as it is written.
+"""
+from __future__ import annotations
+
+import re
+from typing import IO, Final, Iterable, Iterator
+
+from pyk.dequote import dequote_string
+from pyk.kore.lexer import TokenType
+from pyk.kore.parser import KoreParser
+from pyk.kore.syntax import App, EVar, MLPattern, Pattern, Sort, SortApp, SortVar, String, SVar
+
+_ML_TOKENS: Final = frozenset(KoreParser._ML_SYMBOLS)
+
+
+class _Frame:
+    """A symbol application whose arguments are being parsed."""
+    __slots__ = ('symbol', 'is_ml', 'sorts', 'args')
+
+    def __init__(self, symbol: str, is_ml: bool, sorts: list[Sort]) -> None:
+        self.symbol = symbol
+        self.is_ml = is_ml
+        self.sorts = sorts
+        self.args: list[Pattern] = []
+
+    def build(self) -> Pattern:
+        if self.is_ml:
+            return MLPattern.of(self.symbol, self.sorts, self.args)
+        return App(self.symbol, self.sorts, self.args)
+
+
+class IterativeKoreParser(KoreParser):
+    """A `KoreParser` whose patterns are parsed with an explicit stack."""
+
+    def pattern(self) -> Pattern:
+        stack: list[_Frame] = []
+        while True:
+            # parse the next pattern, or open the application it starts
+            token_type = self._la.type
+            term: Pattern | None = None
+            if token_type == TokenType.STRING:
+                term = self.string()
+            elif token_type == TokenType.SET_VAR_ID:
+                term = self.set_var()
+            else:
+                is_ml = token_type in _ML_TOKENS
+                if not is_ml and token_type not in (TokenType.SYMBOL_ID, TokenType.ID):
+                    raise ValueError(f'Expected a pattern, found: {self._la.text}')
+                symbol = self._consume()
+                if token_type == TokenType.ID and self._la.type == TokenType.COLON:
+                    self._consume()
+                    term = EVar(symbol, self.sort())
+                else:
+                    frame = _Frame(symbol, is_ml, self._sort_list())
+                    self._match(TokenType.LPAREN)
+                    if self._la.type != TokenType.RPAREN:
+                        stack.append(frame)
+                        continue
+                    self._consume()
+                    term = frame.build()
+            # close the applications the pattern completes
+            while True:
+                if not stack:
+                    return term
+                stack[-1].args.append(term)
+                if self._la.type == TokenType.COMMA:
+                    self._consume()
+                    break
+                self._match(TokenType.RPAREN)
+                term = stack.pop().build()
+
+
+def parse_pattern(text: str) -> Pattern:
+    return IterativeKoreParser(text).pattern()
+
+
+def write_pattern(pattern: Pattern, output: IO[str]) -> None:
+    """Write the pattern like `Pattern.write`."""
+    stack: list[Pattern | str] = [pattern]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            output.write(item)
+            continue
+        if isinstance(item, App):
+            symbol, sorts, args = item.symbol, item.sorts, item.args
+        elif isinstance(item, MLPattern):
+            symbol, sorts, args = item.symbol(), item.sorts, item.ctor_patterns
+        else:
+            # strings and variables
+            item.write(output)
+            continue
+        output.write(symbol)
+        output.write('{')
+        output.write(', '.join(sort.text for sort in sorts))
+        output.write('}(')
+        stack.append(')')
+        for i in range(len(args) - 1, -1, -1):
+            stack.append(args[i])
+            if i:
+                stack.append(', ')
+
+
+def find_cell(pattern: Pattern, symbol: str) -> App | None:
+    """The first application of the symbol in pre-order, e.g., a cell."""
+    stack = [pattern]
+    while stack:
+        p = stack.pop()
+        if isinstance(p, App) and p.symbol == symbol:
+            return p
+        stack.extend(reversed(p.patterns))
+    return None
+
+
+def replace_cell(pattern: Pattern, symbol: str, replacement: Pattern) -> Pattern:
+    """
+    Replace the first application of the symbol in pre-order, e.g., a cell;
+    only the patterns on the path to it are rebuilt.
+    """
+    # [(ancestor, index of the child on the path)]
+    ancestors: list[tuple[Pattern, int]] = []
+    stack: list[tuple[Pattern, int, int]] = [(pattern, 0, -1)]
+    while stack:
+        p, depth, index = stack.pop()
+        del ancestors[depth:]
+        if depth:
+            ancestors[depth - 1] = (ancestors[depth - 1][0], index)
+        if isinstance(p, App) and p.symbol == symbol:
+            break
+        ancestors.append((p, -1))
+        children = p.patterns
+        for i in range(len(children) - 1, -1, -1):
+            stack.append((children[i], depth + 1, i))
+    else:
+        return pattern
+    term = replacement
+    for ancestor, index in reversed(ancestors):
+        patterns = list(ancestor.patterns)
+        patterns[index] = term
+        term = ancestor.let_patterns(patterns)
+    return term
+
+
+_CHUNK_SIZE: Final = 1 << 16
+# whitespace, then an identifier (symbols, variables, sorts), a string literal, or a punctuation character
+_TOKEN_RE: Final = re.compile(rb'[ \t\r\n]*(?:([\\@]?[A-Za-z][A-Za-z0-9\'-]*)|("(?:[^"\\]|\\.)*")|([(){},:]))',
+                              re.DOTALL)
+_ID: Final = 1
+_STRING: Final = 2
+_PUNCT: Final = 3
+_EOF: Final = 0
+# the characters of identifiers; an application is only found where the symbol is not preceded by one
+_ID_CHARS: Final = rb"A-Za-z0-9'\\@-"
+
+
+class KoreReader:
+    """
+    Read KORE patterns from a binary stream as the bytes arrive, e.g., from the stdout of `krun`,
+    without decoding the stream into one string first; the patterns are parsed with an explicit stack.
+    `find` skips everything but the wanted applications by searching the bytes, without tokenizing them.
+    """
+    _stream: IO[bytes]
+    _chunk_size: int
+    # the byte offsets of the applications found by `find`, from their symbol up to the next token
+    spans: dict[str, tuple[int, int]]
+
+    def __init__(self, stream: IO[bytes], chunk_size: int = _CHUNK_SIZE) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._read = getattr(stream, 'read1', stream.read)
+        self._buf = b''
+        self._pos = 0
+        # the offset of the buffer in the stream
+        self._offset = 0
+        self._eof = False
+        self.spans = {}
+        self._names: dict[bytes, str] = {}
+        self._la_kind = _EOF
+        self._la_text = b''
+        self._advance()
+
+    def pattern(self) -> Pattern:
+        stack: list[_Frame] = []
+        while True:
+            # parse the next pattern, or open the application it starts
+            kind, text = self._la_kind, self._la_text
+            if kind == _STRING:
+                self._advance()
+                term: Pattern = String(dequote_string(text[1:-1].decode('utf-8')))
+            elif kind == _ID:
+                name = self._name(text)
+                self._advance()
+                if name[0] == '@':
+                    self._expect(b':')
+                    term = SVar(name, self._sort())
+                elif self._la_text == b':':
+                    self._advance()
+                    term = EVar(name, self._sort())
+                else:
+                    frame = _Frame(name, name[0] == '\\', self._sorts())
+                    self._expect(b'(')
+                    if self._la_text != b')':
+                        stack.append(frame)
+                        continue
+                    self._advance()
+                    term = frame.build()
+            else:
+                raise ValueError(f'Expected a pattern, found: {text!r}')
+            # close the applications the pattern completes
+            while True:
+                if not stack:
+                    return term
+                stack[-1].args.append(term)
+                if self._la_text == b',':
+                    self._advance()
+                    break
+                self._expect(b')')
+                term = stack.pop().build()
+
+    def find(self, symbols: Iterable[str]) -> dict[str, Pattern]:
+        """
+        The first application of each symbol in pre-order, e.g., cells; the rest of the stream is skipped.
+        The applications are found by searching the bytes for the symbol followed by its sort list,
+        so a string literal containing that text would be mistaken for the application.
+        """
+        wanted = {symbol.encode(): symbol for symbol in symbols}
+        found: dict[str, Pattern] = {}
+        if not wanted:
+            self.drain()
+            return found
+        regex = _application_regex(wanted)
+        keep = max(map(len, wanted)) + 2
+        while len(found) < len(wanted):
+            located = self._seek(regex, keep)
+            if located is None:
+                break
+            name, start = located
+            symbol = wanted[name]
+            pattern = self.pattern()
+            if symbol not in found:
+                found[symbol] = pattern
+                self.spans[symbol] = (start, self._offset + self._pos - len(self._la_text))
+        self.drain()
+        return found
+
+    def find_all(self, symbol: str) -> Iterator[Pattern]:
+        """
+        The outermost applications of the symbol in pre-order, e.g., the domain values, found as `find` finds them;
+        the rest of the stream is skipped.
+        """
+        regex = _application_regex([symbol.encode()])
+        while self._seek(regex, len(symbol) + 2) is not None:
+            yield self.pattern()
+        self.drain()
+
+    def drain(self) -> None:
+        """Read the stream to its end, e.g., to let the writing process exit."""
+        while not self._eof:
+            self._offset += len(self._buf)
+            self._buf = b''
+            self._pos = 0
+            self._fill()
+        self._la_kind, self._la_text = _EOF, b''
+
+    def _fill(self) -> None:
+        chunk = self._read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return
+        self._offset += self._pos
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+
+    def _seek(self, regex: re.Pattern[bytes], keep: int) -> tuple[bytes, int] | None:
+        """
+        Search the bytes from the lookahead token on for the regex, and tokenize from the match.
+        :param keep: the bytes kept from a searched chunk, for a match continuing in the next chunk
+        :return: the first group of the match and its offset in the stream; None at the end of the stream
+        """
+        # the lookahead token was tokenized already; search from its start
+        self._pos -= len(self._la_text)
+        while True:
+            match = regex.search(self._buf, self._pos)
+            if match is not None:
+                start = self._offset + match.start()
+                self._pos = match.start()
+                self._advance()
+                return match.group(1), start
+            if self._eof:
+                self._la_kind, self._la_text = _EOF, b''
+                return None
+            self._pos = max(self._pos, len(self._buf) - keep)
+            self._fill()
+
+    def _advance(self) -> None:
+        while True:
+            match = _TOKEN_RE.match(self._buf, self._pos)
+            # a token at the end of the buffer may continue in the next chunk
+            if match is not None and (match.end() < len(self._buf) or self._eof):
+                self._pos = match.end()
+                self._la_kind = match.lastindex
+                self._la_text = match.group(match.lastindex)
+                return
+            if self._eof:
+                rest = self._buf[self._pos:]
+                if rest.strip():
+                    raise ValueError(f'Unexpected KORE input: {rest[:64]!r}')
+                self._la_kind, self._la_text = _EOF, b''
+                return
+            self._fill()
+
+    def _expect(self, text: bytes) -> None:
+        if self._la_text != text or self._la_kind == _STRING:
+            raise ValueError(f'Expected {text!r}, found: {self._la_text!r}')
+        self._advance()
+
+    def _name(self, text: bytes) -> str:
+        name = self._names.get(text)
+        if name is None:
+            name = self._names[text] = text.decode('ascii')
+        return name
+
+    def _sorts(self) -> list[Sort]:
+        self._expect(b'{')
+        sorts: list[Sort] = []
+        while self._la_text != b'}':
+            if sorts:
+                self._expect(b',')
+            sorts.append(self._sort())
+        self._advance()
+        return sorts
+
+    def _sort(self) -> Sort:
+        if self._la_kind != _ID:
+            raise ValueError(f'Expected a sort, found: {self._la_text!r}')
+        name = self._name(self._la_text)
+        self._advance()
+        if self._la_text == b'{':
+            return SortApp(name, self._sorts())
+        return SortVar(name)
+
+
+def _application_regex(symbols: Iterable[bytes]) -> re.Pattern[bytes]:
+    """The symbols followed by their sort lists, where the symbol is not the end of a longer identifier."""
+    return re.compile(rb'(?<![' + _ID_CHARS + rb'])(' + b'|'.join(map(re.escape, symbols)) + rb')\{')
+
+
+def read_pattern(stream: IO[bytes]) -> Pattern:
+    return KoreReader(stream).pattern()
+
+
+def read_cell(stream: IO[bytes], symbol: str) -> Pattern | None:
+    """The first application of the symbol in pre-order, e.g., a cell, reading only what it needs to parse."""
+    return KoreReader(stream).find([symbol]).get(symbol)
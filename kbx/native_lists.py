@@ -0,0 +1,255 @@
+"""
+This module backs the top-level user lists of a BX definition with K's builtin `List`.
+A user list (`syntax Families ::= List{Family, ","}`) is a cons list, so rules consume a model head-first through
+nested cons cells, and a model of n elements is a term nested n deep.
+In the native list mode, the cells holding a user list in the configuration hold a `List` instead:
+the model is converted by a generated function when it enters the configuration,
+the rules on those cells match `ListItem`s, and the runtime converts the `List` back to the user list on output.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Final, Iterable
+
+from pyk.kast import KAtt
+from pyk.kast.att import Atts
+from pyk.kast.inner import KApply, KInner, KLabel, KRewrite, KSequence, KSort, KToken, KVariable, build_assoc, \
+    collect, top_down, var_occurrences
+from pyk.kast.outer import KDefinition, KFlatModule, KImport, KNonTerminal, KProduction, KRule, KTerminal
+from pyk.prelude.collections import LIST, list_empty, list_item
+
+from kbx.outer import KConfiguration
+
+NATIVE_LISTS_MODULE_NAME: Final = 'KBX-NATIVE-LISTS'
+_LIST_CONCAT: Final = '_List_'
+_LIST_ITEM: Final = 'ListItem'
+_LIST_UNIT: Final = '.List'
+
+
+@dataclass(frozen=True)
+class NativeList:
+    """
+    A user list sort backed by `List`.
+    :param sort: the user list sort, e.g., `Families`
+    :param element_sort: the sort of its elements, e.g., `Family`
+    :param cons: the label of the cons production
+    :param nil: the label of the nil production
+    :param module: the module declaring the user list
+    """
+    sort: str
+    element_sort: str
+    cons: str
+    nil: str
+    module: str
+
+    @property
+    def to_list(self) -> str:
+        return f'kbx{self.sort}ToList'
+
+
+def find_user_lists(kdef: KDefinition) -> dict[str, NativeList]:
+    """The user lists of the definition by sort."""
+    cons: dict[str, tuple[str, str, str]] = {}
+    nils: dict[str, str] = {}
+    for module in kdef.all_modules:
+        for production in module.productions:
+            if not production.att.get(Atts.USER_LIST) or production.klabel is None:
+                continue
+            if production.arity == 0:
+                nils[production.sort.name] = production.klabel.name
+            else:
+                cons[production.sort.name] = (production.klabel.name, production.argument_sorts[0].name, module.name)
+    return {sort: NativeList(sort, element_sort, label, nils[sort], module)
+            for sort, (label, element_sort, module) in cons.items() if sort in nils}
+
+
+def native_list_cells(config: KConfiguration, lists: dict[str, NativeList]) -> dict[str, NativeList]:
+    """
+    The leaf cells of the configuration holding a top-level user list: `$PGM` cast to a user list sort,
+    or the nil of a user list.
+    """
+    if isinstance(config.content, tuple):
+        cells = {}
+        for cell in config.content:
+            cells.update(native_list_cells(cell, lists))
+        return cells
+    content = config.content
+    if isinstance(content, KApply):
+        if content.label.name.startswith('#SemanticCastTo') and content.label.name[15:] in lists:
+            return {config.cell_name: lists[content.label.name[15:]]}
+        for native_list in lists.values():
+            if content.label.name == native_list.nil:
+                return {config.cell_name: native_list}
+    return {}
+
+
+def to_native_config(config: KConfiguration, cells: dict[str, NativeList]) -> KConfiguration:
+    """Convert the initial contents of the cells to `List`."""
+    if isinstance(config.content, tuple):
+        content = tuple(to_native_config(cell, cells) for cell in config.content)
+    elif config.cell_name in cells:
+        native_list = cells[config.cell_name]
+        content = config.content
+        if isinstance(content, KApply) and content.label.name == native_list.nil:
+            content = list_empty()
+        elif isinstance(content, KToken) and content.sort.name == native_list.sort:
+            # a user list has no tokens; a token of its sort is an end state written as a token
+            content = list_empty()
+        else:
+            content = KApply(native_list.to_list, [content])
+    else:
+        return config
+    return KConfiguration(config.cell_name, content, config.multiplicity, config.multi_type, config.att)
+
+
+def to_native_rule(rule: KRule, cells: dict[str, NativeList]) -> KRule:
+    """
+    Convert the contents of the cells in the rule to `List`:
+    cons cells become `ListItem`s, nil becomes `.List`, and the list variables the left-hand sides bind become
+    `List` variables; other lists on the right-hand sides are converted by the generated function.
+    """
+    labels = {f'<{name}>': native_list for name, native_list in cells.items()}
+    found: list[KApply] = []
+    collect(lambda term: found.append(term) if isinstance(term, KApply) and term.label.name in labels else None,
+            rule.body)
+    if not found:
+        return rule
+    bound: set[str] = set()
+    for cell in found:
+        bound.update(_bound_vars(cell.args[1], labels[cell.label.name]))
+    # a `List` variable cannot be used where the user list is expected
+    inside: dict[str, int] = {}
+    for cell in found:
+        for name, occurrences in var_occurrences(cell.args[1]).items():
+            inside[name] = inside.get(name, 0) + len(occurrences)
+    for term in (rule.body, rule.requires, rule.ensures):
+        for name, occurrences in var_occurrences(term).items():
+            if name in bound:
+                inside[name] = inside.get(name, 0) - len(occurrences)
+    outside = sorted(name for name in bound if inside.get(name, 0) < 0)
+    if outside:
+        raise ValueError(f'The list variables {outside} are used outside the native list cells of the rule: {rule}')
+
+    def _convert(term: KInner) -> KInner:
+        if isinstance(term, KApply) and term.label.name in labels:
+            content = _to_native(term.args[1], labels[term.label.name], True, bound)
+            return term.let(args=[term.args[0], content, *term.args[2:]])
+        return term
+
+    return rule.let(body=top_down(_convert, rule.body))
+
+
+def _tail(term: KInner, native_list: NativeList) -> tuple[list[KInner], KInner]:
+    """Split the cons cells of the term into its elements and its tail."""
+    elements = []
+    while isinstance(term, KApply) and term.label.name == native_list.cons:
+        elements.append(term.args[0])
+        term = term.args[1]
+    return elements, term
+
+
+def _bound_vars(term: KInner, native_list: NativeList) -> set[str]:
+    """The variables the left-hand side of the cell content binds at list positions."""
+    bound = set()
+    while True:
+        if isinstance(term, KSequence) and len(term.items) == 1:
+            term = term.items[0]
+        if isinstance(term, KRewrite):
+            term = term.lhs
+        _, term = _tail(term, native_list)
+        if isinstance(term, KVariable):
+            bound.add(term.name)
+        if not isinstance(term, KRewrite):
+            return bound
+
+
+def _to_native(term: KInner, native_list: NativeList, lhs: bool, bound: set[str]) -> KInner:
+    if isinstance(term, KSequence) and len(term.items) == 1:
+        return KSequence([_to_native(term.items[0], native_list, lhs, bound)])
+    if isinstance(term, KRewrite):
+        return KRewrite(_to_native(term.lhs, native_list, True, bound),
+                        _to_native(term.rhs, native_list, False, bound))
+    elements, tail = _tail(term, native_list)
+    if isinstance(tail, KApply) and tail.label.name == native_list.nil:
+        tail = list_empty()
+    elif isinstance(tail, KVariable) and (lhs or tail.name in bound):
+        tail = tail.let_sort(LIST) if tail.sort is not None else tail
+    elif isinstance(tail, KRewrite):
+        tail = _to_native(tail, native_list, lhs, bound)
+    elif lhs:
+        raise ValueError(f'Unsupported pattern of the user list {native_list.sort}: {tail}')
+    else:
+        tail = KApply(native_list.to_list, [tail])
+    return build_assoc(list_empty(), KLabel(_LIST_CONCAT), [*map(list_item, elements), tail])
+
+
+def add_native_lists_module(kdef: KDefinition, lists: Iterable[NativeList], module_names: Iterable[str]) -> KDefinition:
+    """Add the module of the conversion functions to the K definition, imported by the given modules."""
+    module = native_lists_module(lists)
+    module_names = set(module_names)
+    all_modules = [m.let(imports=[*m.imports, KImport(module.name)]) if m.name in module_names else m
+                   for m in kdef.all_modules]
+    return kdef.let(all_modules=[*all_modules, module])
+
+
+def native_lists_module(lists: Iterable[NativeList]) -> KFlatModule:
+    """
+    The module of the functions converting the user lists to `List`, e.g., `kbxFamiliesToList(Fs)`;
+    they append the elements to an accumulator, so that the conversion is tail-recursive.
+    """
+    lists = list({native_list.sort: native_list for native_list in lists}.values())
+    sentences: list[KProduction | KRule] = []
+    for native_list in lists:
+        sentences.extend(_conversion_sentences(native_list))
+    sentences = [sentence.let_att(sentence.att.update([Atts.LOCATION((line, 1, line, 1))]))
+                 for line, sentence in enumerate(sentences, 1)]
+    imports = [KImport('LIST'), *(KImport(module) for module in dict.fromkeys(nl.module for nl in lists))]
+    return KFlatModule(NATIVE_LISTS_MODULE_NAME, sentences, imports, KAtt([Atts.LOCATION((0, 0, 0, 0))]))
+
+
+def _conversion_sentences(native_list: NativeList) -> list[KProduction | KRule]:
+    sort = KSort(native_list.sort)
+    to_list, to_list_aux = native_list.to_list, native_list.to_list + 'Aux'
+    es, acc = KVariable('Es', sort), KVariable('Acc', LIST)
+    e = KVariable('E', KSort(native_list.element_sort))
+    nil = KApply(native_list.nil)
+    return [
+        _function(to_list, LIST, [sort]),
+        _function(to_list_aux, LIST, [sort, LIST]),
+        KRule(KRewrite(KApply(to_list, [es]), KApply(to_list_aux, [es, list_empty()]))),
+        KRule(KRewrite(KApply(to_list_aux, [KApply(native_list.cons, [e, es]), acc]),
+                       KApply(to_list_aux, [es, KApply(_LIST_CONCAT, [acc, list_item(e)])]))),
+        KRule(KRewrite(KApply(to_list_aux, [nil, acc]), acc)),
+    ]
+
+
+def _function(name: str, sort: KSort, argument_sorts: list[KSort]) -> KProduction:
+    items = [KTerminal(name), KTerminal('(')]
+    for i, argument_sort in enumerate(argument_sorts):
+        if i:
+            items.append(KTerminal(','))
+        items.append(KNonTerminal(argument_sort))
+    items.append(KTerminal(')'))
+    return KProduction(sort, items, att=KAtt([Atts.FUNCTION(None), Atts.TOTAL(None), Atts.SYMBOL(name)]))
+
+
+def from_native_list(term: KInner, cons: str, nil: str) -> KInner:
+    """Convert a `List` (possibly in a K sequence) back to the user list, with explicit stacks."""
+    if isinstance(term, KSequence):
+        return KSequence([from_native_list(item, cons, nil) for item in term.items])
+    if not isinstance(term, KApply) or term.label.name not in (_LIST_CONCAT, _LIST_ITEM, _LIST_UNIT):
+        return term
+    elements = []
+    stack = [term]
+    while stack:
+        t = stack.pop()
+        if isinstance(t, KApply) and t.label.name == _LIST_CONCAT:
+            stack.extend(reversed(t.args))
+        elif isinstance(t, KApply) and t.label.name == _LIST_ITEM:
+            elements.append(t.args[0])
+        elif not (isinstance(t, KApply) and t.label.name == _LIST_UNIT):
+            raise ValueError(f'Unexpected term in a native list: {t}')
+    result: KInner = KApply(nil)
+    for element in reversed(elements):
+        result = KApply(cons, [element, result])
+    return result
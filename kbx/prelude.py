@@ -1,10 +1,15 @@
+import re
+from enum import Enum
 from functools import partial
+from typing import Final
 
 from pyk.kast import Atts, AttEntry
-from pyk.kast.inner import KLabel, KApply, KInner, KVariable, KRewrite, KToken, bottom_up, KSort
-from pyk.kast.outer import KRule, KImport, KDefinition
+from pyk.kast.att import AttKey, _STR
+from pyk.kast.inner import KLabel, KApply, KInner, KVariable, KRewrite, KToken, bottom_up, KSort, collect
+from pyk.kast.outer import KRule, KImport, KDefinition, KRequire
 from pyk.prelude.collections import list_of, list_empty, map_item, MAP
 from pyk.prelude.kbool import andBool, orBool
+from pyk.prelude.kint import intToken
 from kbx.outer import KConfiguration
 
 
@@ -13,11 +18,113 @@ DEFAULT_COMPLEMENTS_VAR = KVariable('KbxComplements', 'Map')
 GEN_VAR_NAME = 'KbxGenVar'
 GEN_TODO_NAME = '?KbxGenTodo'
 vars2todos_count = -1
+# `<rule id>:<variant>` of a generated rule, e.g., `3:create_r`; used for the rule index, never printed
+ATT_KBX_RULE: Final = AttKey('kbx-rule', type=_STR)
+RULE_INDEX_FILE: Final = 'rules.json'
+COMPLEMENTS_MODULE_NAME: Final = 'KBX-COMPLEMENTS'
+COMPLEMENTS_MODULE_FILE: Final = 'kbx-complements.k'
+TUPLE_KEY_PREFIX: Final = 'kbxKey'
+COMPLEMENTS_GROUP_VAR: Final = KVariable('KbxComplementsGroup', 'Map')
+# the unified definition: one configuration and both rule sets, selected by the direction cell
+DIRECTION_CELL_NAME: Final = 'kbx-direction'
+DIRECTION_VALUES: Final = {'forward': 0, 'backward': 1}
+SOURCE_VAR: Final = '$SOURCE'
+TARGET_VAR: Final = '$TARGET'
+DIRECTION_VAR: Final = '$DIRECTION'
 
 
-def add_required_modules(kdef: KDefinition) -> KDefinition:
+class ComplementLayout(Enum):
     """
-    Add the required modules `MAP`, `LIST`, `INT-SYNTAX` to the K definition.
+    The layout of the complements in the `<kbx-complements-holder>` cell.
+    - FLAT: one map from `ListItem(rule id) ListItem(common)...` to the complement
+    - NESTED: a map from the rule id to a map from `ListItem(common)...` to the complement;
+        the per-rule maps are smaller and their keys are shorter
+    - TUPLE: one map from `kbxKey<n>(rule id, common...)` to the complement;
+        the keys are free constructors, cheaper to hash and to compare than lists
+    """
+    FLAT = 'flat'
+    NESTED = 'nested'
+    TUPLE = 'tuple'
+
+
+class ConsistencyCheck(Enum):
+    """
+    How a create rule checks that it is consistent with the stored complement.
+    - DISJUNCTION: one rule with `requires M[key] orDefault .List ==K .List orBool M[key] orDefault .List ==K value`
+    - MATCHING: one `[owise]` rule matching `key |-> value` in the complements cell, which the backend indexes in its
+        decision tree, and one rule of the next lower priority storing the complement, without a side condition;
+        unlike the disjunction, the latter also replaces a stored complement that differs once no other rule applies
+    """
+    DISJUNCTION = 'disjunction'
+    MATCHING = 'matching'
+
+
+_NESTED_COMPLEMENTS_MODULE: Final = """module KBX-COMPLEMENTS
+    imports DOMAINS
+
+    syntax Map ::= kbxGroup(Map, KItem) [function, total]
+
+    rule kbxGroup(K |-> G:Map _, K) => G
+
+    rule kbxGroup(_, _) => .Map [owise]
+
+    syntax Map ::= kbxPutComplement(Map, KItem, KItem, KItem) [function, total]
+
+    rule kbxPutComplement(M, G, K, V) => M[G <- kbxGroup(M, G)[K <- V]]
+
+endmodule
+"""
+
+
+def tag_rule(rule: KRule, rule_id: int | str, variant: str) -> KRule:
+    """
+    Tag the generated rule with the id of its unidirectional rule and its variant.
+    :param variant: `create_r`, `put_r`, `create_l`, `put_l` or `bx` for rules copied into both directions
+    """
+    return rule.let(att=rule.att.update([ATT_KBX_RULE(f'{rule_id}:{variant}')]))
+
+
+def tuple_key_label(arity: int) -> str:
+    return f'{TUPLE_KEY_PREFIX}{arity}'
+
+
+def complements_module(layout: ComplementLayout, kdef: KDefinition) -> str | None:
+    """
+    The K module with the syntax and functions the complements of the layout need, if any.
+    :param kdef: the generated definition, to find the arities of the tuple keys
+    """
+    match layout:
+        case ComplementLayout.FLAT:
+            return None
+        case ComplementLayout.NESTED:
+            return _NESTED_COMPLEMENTS_MODULE
+        case ComplementLayout.TUPLE:
+            arities: set[int] = set()
+
+            def _collect_arity(term: KInner) -> None:
+                if isinstance(term, KApply):
+                    match = re.fullmatch(TUPLE_KEY_PREFIX + r'(\d+)', term.label.name)
+                    if match:
+                        arities.add(int(match.group(1)))
+
+            for module in kdef.all_modules:
+                for sentence in module.sentences:
+                    if isinstance(sentence, KRule):
+                        collect(_collect_arity, sentence.body)
+            syntax = '\n\n    '.join(
+                f'syntax KbxKey ::= {tuple_key_label(n)}({", ".join(["Int"] + ["KItem"] * n)}) '
+                f'[symbol({tuple_key_label(n)})]'
+                for n in sorted(arities)
+            )
+            return f"module {COMPLEMENTS_MODULE_NAME}\n    imports DOMAINS\n\n    {syntax}\n\nendmodule\n"
+        case _:
+            raise ValueError(f"Unknown complement layout: {layout}")
+
+
+def add_required_modules(kdef: KDefinition, layout: ComplementLayout = ComplementLayout.FLAT) -> KDefinition:
+    """
+    Add the required modules `MAP`, `LIST`, `INT-SYNTAX` to the K definition,
+    and the module of the complement layout if it needs one.
     """
     modules = kdef.all_modules_dict
     has_domains = False
@@ -28,18 +135,35 @@ def add_required_modules(kdef: KDefinition) -> KDefinition:
     main_module = modules[kdef.main_module_name]
     if not has_domains:
         main_module = main_module.let(imports=[*main_module.imports, KImport('DOMAINS')])
+    requires = kdef.requires
+    if layout != ComplementLayout.FLAT:
+        main_module = main_module.let(imports=[*main_module.imports, KImport(COMPLEMENTS_MODULE_NAME)])
+        requires = [*requires, KRequire(COMPLEMENTS_MODULE_FILE)]
     modules[kdef.main_module_name] = main_module
-    return kdef.let(all_modules=[*modules.values()])
+    return kdef.let(all_modules=[*modules.values()], requires=requires)
 
 
-def vars2todos(rule: KRule, var_list: tuple[KInner, ...]) -> tuple[KRule, tuple[KInner, ...]]:
+def vars2todos(
+        rule: KRule,
+        var_list: tuple[KInner, ...],
+        name_prefix: str | None = None,
+) -> tuple[KRule, tuple[KInner, ...]]:
+    """
+    :param name_prefix: name the placeholders `?KbxGenTodo<prefix><n>`, counted within the rule;
+        by default, they are numbered across all rules
+    """
     body = rule.body
     requires = rule.requires
     ensures = rule.ensures
     todos = []
+    count = -1
 
     def _curr_todo() -> KVariable:
         global vars2todos_count
+        nonlocal count
+        if name_prefix is not None:
+            count += 1
+            return KVariable(GEN_TODO_NAME + name_prefix + str(count))
         vars2todos_count += 1
         return KVariable(GEN_TODO_NAME + str(vars2todos_count))
 
@@ -118,14 +242,32 @@ def lower_priority(rule: KRule) -> KRule:
         return rule.let(att=new_att)
 
 
+def complement_key(layout: ComplementLayout, common: tuple[KInner, ...]) -> KInner:
+    """
+    The key of a complement; for the nested layout, the key inside the map of the rule `common[0]`.
+    """
+    match layout:
+        case ComplementLayout.FLAT:
+            return list_of(common)
+        case ComplementLayout.NESTED:
+            return list_of(common[1:])
+        case ComplementLayout.TUPLE:
+            return KApply(tuple_key_label(len(common) - 1), common)
+        case _:
+            raise ValueError(f"Unknown complement layout: {layout}")
+
+
 def add_check_consistency(
         rule: KRule,
         common: tuple[KInner, ...],
         miss_r: tuple[KInner, ...],
-        miss_l: tuple[KInner, ...]
+        miss_l: tuple[KInner, ...],
+        layout: ComplementLayout = ComplementLayout.FLAT,
 ) -> KRule:
     map_var = DEFAULT_COMPLEMENTS_VAR
-    k = list_of(common)
+    if layout == ComplementLayout.NESTED:
+        map_var = KApply('kbxGroup', [map_var, common[0]])
+    k = complement_key(layout, common)
     v = list_of([list_of(miss_r), list_of(miss_l)])
     lookup = KApply('_[_]orDefault__MAP_KItem_Map_KItem_KItem', [map_var, k, list_empty()])
     constraint = KApply('_==K_', [lookup, list_empty()])
@@ -134,36 +276,65 @@ def add_check_consistency(
     return rule.let(requires=constraint)
 
 
+def content_of_present_complement(
+        common: tuple[KInner, ...],
+        miss_r: tuple[KInner, ...],
+        miss_l: tuple[KInner, ...],
+        layout: ComplementLayout = ComplementLayout.FLAT,
+) -> tuple[KInner, KInner | None]:
+    """
+    The content of the complements cell matching a stored complement equal to the one of a create rule.
+    Complements with existential variables (`?KbxGenTodo`) cannot be matched;
+    for them, the stored complement is bound to a variable and compared in the returned constraint.
+    :return: a tuple (content, constraint), the constraint is None if the complement is matched directly
+    """
+    k = complement_key(layout, common)
+    v = list_of([list_of(miss_r), list_of(miss_l)])
+    if any(isinstance(term, KVariable) and term.name.startswith('?') for term in (*miss_r, *miss_l)):
+        stored = KVariable('KbxComplement', 'List')
+        return _complement_item(layout, common, k, stored), KApply('_==K_', [stored, v])
+    return _complement_item(layout, common, k, v), None
+
+
+def _complement_item(layout: ComplementLayout, common: tuple[KInner, ...], k: KInner, v: KInner) -> KInner:
+    if layout == ComplementLayout.NESTED:
+        group = KApply('_Map_', [map_item(k, v), COMPLEMENTS_GROUP_VAR])
+        return map_item(common[0], KApply('#SemanticCastToMap', [group]))
+    return map_item(k, v)
+
+
 def content_of_c_holder(
         content_type: str,
         common: tuple[KInner, ...],
         miss_r: tuple[KInner, ...],
-        miss_l: tuple[KInner, ...]
+        miss_l: tuple[KInner, ...],
+        layout: ComplementLayout = ComplementLayout.FLAT,
 ) -> KInner:
+    k = complement_key(layout, common)
     match content_type:
         case 'create_r' | 'create_l':
             lhs = DEFAULT_COMPLEMENTS_VAR
-            k = list_of(common)
             v = list_of([list_of(miss_r), list_of(miss_l)])
-            rhs = KApply('Map:update', [DEFAULT_COMPLEMENTS_VAR, k, v])
+            if layout == ComplementLayout.NESTED:
+                rhs = KApply('kbxPutComplement', [DEFAULT_COMPLEMENTS_VAR, common[0], k, v])
+            else:
+                rhs = KApply('Map:update', [DEFAULT_COMPLEMENTS_VAR, k, v])
             return KRewrite(lhs, rhs)
         case 'put_r':
-            k = list_of(common)
             any_miss_r = [KVariable('_' + r.name, r.sort) for r in miss_r if isinstance(r, KVariable)]
             assert len(any_miss_r) == len(miss_r), 'Only variables are allowed in miss_r'
             v_old = list_of([list_of(any_miss_r), list_of(miss_l)])
             v_new = list_of([list_of(miss_r), list_of(miss_l)])
-            lhs = map_item(k, v_old)
-            rhs = map_item(k, v_new)
+            lhs = _complement_item(layout, common, k, v_old)
+            rhs = _complement_item(layout, common, k, v_new)
             return KRewrite(lhs, rhs)
         case 'put_l':
-            k = list_of(common)
             any_miss_l = [KVariable('_' + l.name, l.sort) for l in miss_l if isinstance(l, KVariable)]
             assert len(any_miss_l) == len(miss_l), 'Only variables are allowed in miss_l'
             v_old = list_of([list_of(miss_r), list_of(any_miss_l)])
             v_new = list_of([list_of(miss_r), list_of(miss_l)])
-            lhs = map_item(k, v_old)
-            rhs = map_item(k, v_new)
+            lhs = _complement_item(layout, common, k, v_old)
+            rhs = _complement_item(layout, common, k, v_new)
             return KRewrite(lhs, rhs)
         case _:
             raise ValueError(f"Unknown content type: {content_type}")
@@ -213,6 +384,37 @@ def add_c_holder_to_state(
     )
 
 
+def direction_cell(direction: str) -> KApply:
+    return KApply('<' + DIRECTION_CELL_NAME + '>',
+                  [KApply('#noDots'), intToken(DIRECTION_VALUES[direction]), KApply('#noDots')])
+
+
+def add_direction_to_rule(rule: KRule, direction: str) -> KRule:
+    """Guard the rule of one direction of the unified definition by the direction cell."""
+    body = rule.body
+    assert isinstance(body, KApply), 'Rule body must be a KApply'
+    if body.is_cell:
+        body = KApply('#cells', [body])
+    if body.label.name != '#cells':
+        raise ValueError("Expected a cell or #cells")
+    return rule.let(body=body.let(args=(*body.args, direction_cell(direction))))
+
+
+def add_direction_to_state(state: KConfiguration) -> KConfiguration:
+    """Add the direction cell, initialized by `$DIRECTION:Int`, to the configuration."""
+    direction = KConfiguration(
+        cell_name=DIRECTION_CELL_NAME,
+        content=KApply('#SemanticCastToInt', [KVariable(DIRECTION_VAR)]),
+    )
+    return KConfiguration(
+        cell_name=state.cell_name,
+        content=(*state.content, direction),
+        multiplicity=state.multiplicity,
+        multi_type=state.multi_type,
+        att=state.att
+    )
+
+
 def add_c_holder(
         state_or_rule: tuple[KConfiguration | KRule, str],
         content: KInner = None,
@@ -38,6 +38,7 @@ from pyk.kast.outer import (
 )
 
 from kbx.outer import KProductionsWithPriority, KProductionList, KConfiguration
+from kbx.prelude import ATT_KBX_RULE
 
 _LOGGER: Final = logging.getLogger(__name__)
 
@@ -212,7 +213,7 @@ class PrettyPrinterWithSugar(PrettyPrinter):
 
     def _print_katt(self, att: KAtt) -> str:
         att = att.drop_source()
-        att = att.discard([Atts.BRACKET_LABEL, Atts.KLABEL, Atts.PRODUCTION, Atts.LABEL])
+        att = att.discard([Atts.BRACKET_LABEL, Atts.KLABEL, Atts.PRODUCTION, Atts.LABEL, ATT_KBX_RULE])
         # todo: now is ok; more claver way to print the klabel
         if not att:
             return ''
@@ -0,0 +1,272 @@
+"""
+This module reassigns the priorities of the generated rules from a profile of their applications.
+The synthesis assigns priorities mechanically: create rules are `[owise]` and fall through every other rule, and
+the priorities of the unidirectional rules are kept, whether or not the rules can apply to the same configuration.
+The profile is the JSON rule statistics of representative synchronizations (`kbx.py trans --rule-stats`), which count
+the applications of every generated rule by its `kbx-rule` tag.
+The order of two rules only matters if both can apply to one configuration. Two rules certainly cannot if their
+left-hand sides clash: different constructors or tokens at the same position, e.g., different direction cells or
+different heads of the input list. All other pairs keep their order, and rules of the same priority that may overlap
+keep sharing one; the rules are then ordered by their applications within these constraints, so the most applied
+rules are tried first, and the create rules no longer wait behind every rule as `[owise]`.
+The priorities are levels that the rules share: each group of rules gets the level, after the groups it must follow,
+that adds the fewest attempts given the groups placed before it, so the rules without an order between them share a
+priority unless trying one first saves attempts, and the LLVM backend matches the rules of a level in one decision
+tree. The priorities skip the band from 50 to 150, which the LLVM backend reserves (see `lower_priority`).
+The expected saving is estimated as the rule attempts before each applied rule, with the rules tried in priority
+order; the decision trees of the LLVM backend test fewer rules, so it is an upper bound.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import json
+from collections import Counter
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Final, Iterable
+
+from pyk.kast.inner import KApply, KInner, KSequence, KToken, KVariable
+from pyk.kast.manip import extract_lhs
+from pyk.kast.outer import KRule
+
+from kbx.prelude import ATT_KBX_RULE
+from kbx.pruning import is_ordered, rule_priority
+
+PRIORITIES_FILE: Final = 'profile-priorities.json'
+# the priority of the first rules; the others follow level by level
+FIRST_PRIORITY: Final = 1
+# the priorities reserved by the LLVM backend
+RESERVED_PRIORITIES: Final = range(50, 151)
+# the labels whose arguments are not matched position by position
+_UNORDERED_LABELS: Final = frozenset({
+    '_Map_', '_|->_', '.Map', '_List_', 'ListItem', '.List', '_Set_', 'SetItem', '.Set', '#dots', '#noDots',
+})
+_CELLS_LABEL: Final = '#cells'
+
+
+@dataclass(frozen=True)
+class RulePriority:
+    """
+    :param rule: the `kbx-rule` tag of the rule
+    :param hits: the applications of the rule in the profile
+    :param old_priority: the priority of the rule as synthesized, 200 for `[owise]`
+    :param new_priority: the priority assigned from the profile
+    """
+    rule: str | None
+    module: str
+    hits: int
+    old_priority: int
+    new_priority: int
+
+
+@dataclass(frozen=True)
+class PriorityReport:
+    """
+    :param old_attempts: the rule attempts before the applied rules of the profile with the synthesized priorities
+    :param new_attempts: the rule attempts with the assigned priorities
+    """
+    definition: str
+    rules: list[RulePriority]
+    old_attempts: int
+    new_attempts: int
+
+    @property
+    def saving(self) -> float:
+        """The expected relative saving of rule attempts."""
+        return 1 - self.new_attempts / self.old_attempts if self.old_attempts else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), 'saving': self.saving}
+
+
+def load_profile(paths: Iterable[Path]) -> dict[str, Counter[str]]:
+    """The applications of the generated rules by definition and `kbx-rule` tag, summed over the statistics files."""
+    profile: dict[str, Counter[str]] = {}
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for stat in data['rules']:
+            if stat['rule_id'] is None or stat['variant'] is None:
+                continue
+            profile.setdefault(stat['definition'], Counter())[f"{stat['rule_id']}:{stat['variant']}"] += stat['count']
+    return profile
+
+
+def assign_priorities(
+        rules: list[tuple[KRule, str]],
+        hits: Counter[str],
+        definition: str,
+) -> tuple[dict[int, int], PriorityReport]:
+    """
+    Order the rules of one definition by their applications, keeping the order of every pair that may overlap.
+    :param hits: the applications by `kbx-rule` tag; the rules sharing a tag share its applications
+    :return: the assigned priorities by the index of the rule, and the report; rules whose priority does not order
+        them, e.g., simplifications, keep theirs
+    """
+    ordered = [idx for idx, (rule, _) in enumerate(rules) if is_ordered(rule)]
+    old = {idx: rule_priority(rules[idx][0]) for idx in ordered}
+    lhs = {idx: extract_lhs(rules[idx][0].body) for idx in ordered}
+    rule_hits = {idx: hits.get(rules[idx][0].att.get(ATT_KBX_RULE), 0) for idx in ordered}
+    # the rules of the same priority that may overlap are one group and keep sharing a priority
+    group = {idx: idx for idx in ordered}
+
+    def _find(idx: int) -> int:
+        while group[idx] != idx:
+            group[idx] = group[group[idx]]
+            idx = group[idx]
+        return idx
+
+    overlaps = []
+    for i, a in enumerate(ordered):
+        for b in ordered[i + 1:]:
+            if not may_overlap(lhs[a], lhs[b]):
+                continue
+            if old[a] == old[b]:
+                group[_find(a)] = _find(b)
+            else:
+                overlaps.append((a, b) if old[a] < old[b] else (b, a))
+    members: dict[int, list[int]] = {}
+    for idx in ordered:
+        members.setdefault(_find(idx), []).append(idx)
+    successors: dict[int, set[int]] = {root: set() for root in members}
+    predecessors = Counter()
+    for first, then in overlaps:
+        first, then = _find(first), _find(then)
+        if then not in successors[first]:
+            successors[first].add(then)
+            predecessors[then] += 1
+
+    # the ready group unlocking the most applications first: its own and those of the groups that must follow it;
+    # ties keep the synthesized order
+    def _key(root: int) -> tuple[int, int, int]:
+        unlocked = sum(rule_hits[idx] for group_root in _descendants(root) for idx in members[group_root])
+        return -unlocked, old[root], min(members[root])
+
+    def _descendants(root: int) -> set[int]:
+        seen = {root}
+        stack = [root]
+        while stack:
+            for successor in successors[stack.pop()]:
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return seen
+
+    ready = [_key(root) + (root,) for root in members if predecessors[root] == 0]
+    heapq.heapify(ready)
+    levels: dict[int, int] = {}
+    min_level = {root: 0 for root in members}
+    # the rules and their applications by level
+    level_rules: list[int] = []
+    level_hits: list[int] = []
+    while ready:
+        root = heapq.heappop(ready)[-1]
+        size, group_hits = len(members[root]), sum(rule_hits[idx] for idx in members[root])
+        level = levels[root] = _cheapest_level(level_rules, level_hits, min_level[root], size, group_hits)
+        if level == len(level_rules):
+            level_rules.append(0)
+            level_hits.append(0)
+        level_rules[level] += size
+        level_hits[level] += group_hits
+        for successor in successors[root]:
+            min_level[successor] = max(min_level[successor], level + 1)
+            predecessors[successor] -= 1
+            if predecessors[successor] == 0:
+                heapq.heappush(ready, _key(successor) + (successor,))
+    assert len(levels) == len(members), "Expected the overlapping rules to be ordered without cycles"
+    new = {idx: _level_priority(levels[_find(idx)]) for idx in ordered}
+    assert not any(priority in RESERVED_PRIORITIES for priority in new.values()), \
+        "Expected no priority reserved by the LLVM backend"
+
+    report = PriorityReport(
+        definition=definition,
+        rules=[RulePriority(rules[idx][0].att.get(ATT_KBX_RULE), rules[idx][1], rule_hits[idx], old[idx], new[idx])
+               for idx in ordered],
+        old_attempts=_attempts(old, rule_hits),
+        new_attempts=_attempts(new, rule_hits),
+    )
+    return new, report
+
+
+def write_report(path: Path, report: PriorityReport) -> None:
+    with open(path, 'w') as f:
+        json.dump(report.to_dict(), f, indent=4)
+
+
+def may_overlap(lhs: KInner, other: KInner) -> bool:
+    """Whether the left-hand sides may match one configuration; False only if they clash."""
+    stack = [(lhs, other)]
+    while stack:
+        a, b = stack.pop()
+        if isinstance(a, KVariable) or isinstance(b, KVariable):
+            continue
+        if isinstance(a, KToken) and isinstance(b, KToken):
+            if a != b:
+                return False
+        elif isinstance(a, KApply) and isinstance(b, KApply):
+            if a.label.name in _UNORDERED_LABELS or b.label.name in _UNORDERED_LABELS:
+                continue
+            if a.label.name == _CELLS_LABEL or b.label.name == _CELLS_LABEL:
+                cells_a, cells_b = _cells(a), _cells(b)
+                stack.extend((cells_a[name], cells_b[name]) for name in cells_a.keys() & cells_b.keys())
+            elif a.label.name != b.label.name or a.arity != b.arity:
+                return False
+            else:
+                stack.extend(zip(a.args, b.args))
+        elif isinstance(a, KSequence) and isinstance(b, KSequence):
+            if a.arity == b.arity:
+                stack.extend(zip(a.items, b.items))
+        elif isinstance(a, KToken) and isinstance(b, KApply) or isinstance(a, KApply) and isinstance(b, KToken):
+            app = a if isinstance(a, KApply) else b
+            if app.label.name not in _UNORDERED_LABELS:
+                return False
+    return True
+
+
+def _cells(term: KApply) -> dict[str, KInner]:
+    """The cells of a cell bag by name."""
+    cells = {}
+    stack: list[KInner] = [term]
+    while stack:
+        t = stack.pop()
+        if isinstance(t, KApply) and t.label.name == _CELLS_LABEL:
+            stack.extend(t.args)
+        elif isinstance(t, KApply):
+            cells[t.label.name] = t
+    return cells
+
+
+def _cheapest_level(level_rules: list[int], level_hits: list[int], min_level: int, size: int, hits: int) -> int:
+    """
+    The level of a group adding the fewest attempts: its applications try the rules below it, and the applications
+    above it try its rules; the lowest of equal levels.
+    :param level_rules: the rules placed by level
+    :param level_hits: the applications of the rules placed by level
+    """
+    below = sum(level_rules[:min_level])
+    above = sum(level_hits[min_level + 1:])
+    best, best_cost = min_level, None
+    for level in range(min_level, max(len(level_rules), min_level + 1)):
+        cost = hits * below + size * above
+        if best_cost is None or cost < best_cost:
+            best, best_cost = level, cost
+        if level < len(level_rules):
+            below += level_rules[level]
+        if level + 1 < len(level_hits):
+            above -= level_hits[level + 1]
+    return best
+
+
+def _level_priority(level: int) -> int:
+    """The priority of the level, skipping the reserved priorities."""
+    priority = FIRST_PRIORITY + level
+    if priority >= RESERVED_PRIORITIES.start:
+        priority += len(RESERVED_PRIORITIES)
+    return priority
+
+
+def _attempts(priorities: dict[int, int], hits: dict[int, int]) -> int:
+    """The rules tried before the applied rules: every rule of a lower priority, once per application."""
+    levels = sorted(priorities.values())
+    return sum(count * bisect.bisect_left(levels, priorities[idx]) for idx, count in hits.items())
@@ -0,0 +1,229 @@
+"""
+This module profiles the phases of the BX generation and of the synchronization.
+For every phase, the profiler records
+1. cProfile statistics, written as a `.pstats` file (inspect it with `python -m pstats` or snakeviz);
+2. the tracemalloc peak and the top allocation sites;
+3. the resource usage of the child processes (`kompile`, `krun`): CPU time and maximal RSS from `getrusage`.
+All phases are summarized in `profile.json` in the output directory.
+The phase a thread is in is kept per thread, so the phases of concurrent synchronizations (e.g., the slots of a worker)
+record their own child processes; a pool thread running on behalf of a phase joins it with `Profiler.joined`.
+The tracemalloc and `RUSAGE_CHILDREN` figures are those of the whole process, and overlap for concurrent phases.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import resource
+import signal
+import subprocess
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Callable, Final, Iterator, Sequence
+
+PROFILE_DIR_NAME: Final = 'profile'
+TOP_ALLOCATIONS: Final = 10
+
+
+@dataclass
+class ProcessUsage:
+    cmd: str
+    wall_s: float
+    user_cpu_s: float
+    system_cpu_s: float
+    max_rss_kb: int
+    returncode: int
+
+
+@dataclass
+class PhaseReport:
+    name: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    children_user_cpu_s: float = 0.0
+    children_system_cpu_s: float = 0.0
+    children_max_rss_kb: int = 0
+    tracemalloc_peak_bytes: int = 0
+    top_allocations: list[dict[str, Any]] = field(default_factory=list)
+    processes: list[ProcessUsage] = field(default_factory=list)
+    pstats: str | None = None
+
+
+def default_profile_dir(workspace: Path) -> Path:
+    """A fresh directory for the reports of one profiled run inside the workspace."""
+    return workspace / PROFILE_DIR_NAME / datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+
+
+class Profiler:
+    enabled: bool
+    output_dir: Path
+    phases: list[PhaseReport]
+
+    def __init__(self, output_dir: Path, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.phases = []
+        # the phase of each thread, as `current`
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # the open phases that started tracemalloc or found it started by one of them
+        self._tracing = 0
+        self._stop_tracing = False
+
+    @property
+    def current(self) -> PhaseReport | None:
+        """The phase of the calling thread."""
+        return getattr(self._local, 'current', None)
+
+    @contextmanager
+    def joined(self, phase: PhaseReport | None) -> Iterator[None]:
+        """Record the child processes of the enclosed block in the phase of another thread, e.g., in a pool thread."""
+        previous = self.current
+        self._local.current = phase
+        try:
+            yield
+        finally:
+            self._local.current = previous
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Profile the enclosed block as a phase.
+        Phases do not nest: a phase opened inside another one is merged into the outer phase.
+        """
+        if not self.enabled or self.current is not None:
+            yield
+            return
+        report = PhaseReport(name)
+        self._local.current = report
+        with self._lock:
+            if not self._tracing:
+                self._stop_tracing = not tracemalloc.is_tracing()
+                if self._stop_tracing:
+                    tracemalloc.start()
+            self._tracing += 1
+        tracemalloc.reset_peak()
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_before = time.process_time()
+        wall_before = time.perf_counter()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            report.wall_s = time.perf_counter() - wall_before
+            report.cpu_s = time.process_time() - cpu_before
+            children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            report.children_user_cpu_s = children_after.ru_utime - children_before.ru_utime
+            report.children_system_cpu_s = children_after.ru_stime - children_before.ru_stime
+            # ru_maxrss of RUSAGE_CHILDREN is the maximum over all children ever waited for, so it only tells
+            # something about this phase if it grew; the children run by `run` have their own usage
+            if report.processes:
+                report.children_max_rss_kb = max(p.max_rss_kb for p in report.processes)
+            elif children_after.ru_maxrss > children_before.ru_maxrss:
+                report.children_max_rss_kb = children_after.ru_maxrss
+            _, report.tracemalloc_peak_bytes = tracemalloc.get_traced_memory()
+            report.top_allocations = _top_allocations(tracemalloc.take_snapshot())
+            self._local.current = None
+            with self._lock:
+                self._tracing -= 1
+                if not self._tracing and self._stop_tracing:
+                    tracemalloc.stop()
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                pstats_path = self.output_dir / f'{len(self.phases):02d}-{name}.pstats'
+                profile.dump_stats(pstats_path)
+                report.pstats = pstats_path.name
+                self.phases.append(report)
+                self.write_report()
+
+    def run(self, cmd: Sequence[str | Path], **kwargs: Any) -> subprocess.CompletedProcess:
+        """
+        Run a child process like `subprocess.run` with captured output and record its own resource usage.
+        """
+        if not self.enabled:
+            return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+        result, usage = run_with_usage(cmd, **kwargs)
+        self._record(usage)
+        return result
+
+    def stream(self, cmd: Sequence[str | Path], consume: Callable[[IO[bytes]], Any],
+               **kwargs: Any) -> subprocess.CompletedProcess:
+        """
+        Run a child process whose stdout is handed to `consume` as it is written, see `stream_with_usage`,
+        and record its own resource usage.
+        """
+        result, usage = stream_with_usage(cmd, consume, **kwargs)
+        if self.enabled:
+            self._record(usage)
+        return result
+
+    def _record(self, usage: ProcessUsage) -> None:
+        phase = self.current
+        if phase is not None:
+            with self._lock:
+                phase.processes.append(usage)
+
+    def write_report(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.output_dir / 'profile.json', 'w') as f:
+            json.dump({'phases': [asdict(phase) for phase in self.phases]}, f, indent=4)
+
+
+def run_with_usage(cmd: Sequence[str | Path], **kwargs: Any) -> tuple[subprocess.CompletedProcess, ProcessUsage]:
+    """
+    Run a child process with captured output and return its own resource usage via `os.wait4`.
+    The stderr pipe is drained by a thread while stdout is read, so the child is reaped by `wait4`
+    instead of `communicate`.
+    """
+    return stream_with_usage(cmd, lambda stdout: stdout.read(), **kwargs)
+
+
+def stream_with_usage(cmd: Sequence[str | Path], consume: Callable[[IO[bytes]], Any],
+                      **kwargs: Any) -> tuple[subprocess.CompletedProcess, ProcessUsage]:
+    """
+    Run a child process like `run_with_usage`, but hand its stdout pipe to `consume` as the child writes it;
+    the result holds what `consume` returns as its stdout. What `consume` leaves unread is discarded.
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+    stderr: list[bytes] = []
+
+    def _drain() -> None:
+        stderr.append(proc.stderr.read())
+        proc.stderr.close()
+
+    reader = threading.Thread(target=_drain)
+    reader.start()
+    try:
+        stdout = consume(proc.stdout)
+    except BaseException:
+        # not `proc.kill`, which may reap the child by polling it before `wait4` does
+        os.kill(proc.pid, signal.SIGKILL)
+        raise
+    finally:
+        proc.stdout.close()
+        _, status, usage = os.wait4(proc.pid, 0)
+        reader.join()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    result = subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr[0])
+    return result, ProcessUsage(
+        cmd=' '.join(map(str, cmd)),
+        wall_s=time.perf_counter() - start,
+        user_cpu_s=usage.ru_utime,
+        system_cpu_s=usage.ru_stime,
+        max_rss_kb=usage.ru_maxrss,
+        returncode=proc.returncode,
+    )
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot) -> list[dict[str, Any]]:
+    return [
+        {'location': str(stat.traceback), 'size_bytes': stat.size, 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+    ]
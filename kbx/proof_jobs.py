@@ -0,0 +1,268 @@
+"""
+This module defers the proof-hint runs of the synchronizations of a BX workspace.
+With deferred proof hints, a synchronization does not wait for the instrumented `krun` runs; it records every one
+of them as an immutable job in `proof-jobs/` and returns as soon as its result is written.
+A job holds everything the run depends on:
+1. the `krun` command without its input;
+2. a copy of the exact input, e.g., the KORE of the configuration a continue run started from;
+3. the hash of the kompiled definition the synchronization ran.
+A worker runs the job later, and refuses to if the definition changed since, so the proof hints are those of the
+synchronization; rerunning a finished job checks that it reproduces the recorded proof hints.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from enum import Enum
+from functools import lru_cache
+from pathlib import Path
+from typing import Final, Iterable
+
+PROOF_JOBS_DIR: Final = 'proof-jobs'
+JOB_FILE: Final = 'job.json'
+STATUS_FILE: Final = 'status.json'
+INPUT_FILE: Final = 'input'
+_LOCK_FILE: Final = 'lock'
+
+
+class JobState(Enum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+@dataclass(frozen=True)
+class ProofJob:
+    """
+    :param cmd: the `krun --proof-hint` command, without the input
+    :param input_hash: the hash of the input of the command, copied into the job
+    :param definition_hash: the hash of the `definition.kore` of the kompiled definition the command runs
+    :param depth: the `--depth` of the run, -1 for none
+    :param phase: the phase of the synchronization, e.g., `create` or `continue`
+    :param proof_path: the file the proof hints are written to
+    :param created: the time the job was recorded
+    """
+    cmd: tuple[str, ...]
+    input_hash: str
+    definition_hash: str
+    depth: int
+    phase: str
+    proof_path: str
+    created: float
+
+    @property
+    def id(self) -> str:
+        data = json.dumps([self.cmd, self.input_hash, self.definition_hash, self.depth, self.proof_path])
+        return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+    @property
+    def kompiled(self) -> Path:
+        return Path(self.cmd[self.cmd.index('--definition') + 1])
+
+    @staticmethod
+    def from_dict(data: dict) -> ProofJob:
+        return ProofJob(**{**data, 'cmd': tuple(data['cmd'])})
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    """
+    :param output_hash: the hash of the proof hints of the last successful run
+    :param error: why the last run failed
+    """
+    state: JobState
+    started: float | None = None
+    finished: float | None = None
+    output_hash: str | None = None
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), 'state': self.state.value}
+
+    @staticmethod
+    def from_dict(data: dict) -> JobStatus:
+        return JobStatus(**{**data, 'state': JobState(data['state'])})
+
+
+class ProofJobError(Exception):
+    """A proof job that cannot be run faithfully, e.g., because its definition was rekompiled."""
+
+
+class ProofJobQueue:
+    directory: Path
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def record(self, cmd: list[str], input_path: str | Path, depth: int, phase: str,
+               proof_path: str | Path) -> ProofJob:
+        """Record the proof-hint run of the command on the input; the input is copied, it may change afterwards."""
+        with open(input_path, 'rb') as f:
+            content = f.read()
+        job = ProofJob(
+            cmd=tuple(map(str, cmd)),
+            input_hash=hashlib.sha256(content).hexdigest(),
+            definition_hash=definition_hash(Path(cmd[cmd.index('--definition') + 1])),
+            depth=depth,
+            phase=phase,
+            proof_path=str(proof_path),
+            created=time.time(),
+        )
+        job_dir = self.directory / job.id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        _write_atomic(job_dir / INPUT_FILE, content)
+        self._set_status(job.id, JobStatus(JobState.PENDING))
+        # the job is listed once its file exists
+        _write_atomic(job_dir / JOB_FILE, json.dumps(asdict(job), indent=4).encode())
+        return job
+
+    def job(self, job_id: str) -> ProofJob:
+        path = self.directory / job_id / JOB_FILE
+        if not path.exists():
+            raise ProofJobError(f"There is no proof job '{job_id}'.")
+        with open(path) as f:
+            return ProofJob.from_dict(json.load(f))
+
+    def jobs(self) -> list[ProofJob]:
+        """The recorded jobs, oldest first."""
+        if not self.directory.exists():
+            return []
+        jobs = [self.job(path.name) for path in self.directory.iterdir() if (path / JOB_FILE).exists()]
+        return sorted(jobs, key=lambda job: job.created)
+
+    def status(self, job_id: str) -> JobStatus:
+        """The status of the job; a job whose worker died while running it is pending again."""
+        path = self.directory / job_id / STATUS_FILE
+        if not path.exists():
+            raise ProofJobError(f"There is no proof job '{job_id}'.")
+        with open(path) as f:
+            status = JobStatus.from_dict(json.load(f))
+        if status.state == JobState.RUNNING and not self._is_locked(job_id):
+            return JobStatus(JobState.PENDING, error=status.error, output_hash=status.output_hash)
+        return status
+
+    def run(self, job_id: str, force: bool = False) -> JobStatus:
+        """
+        Run the job, unless it is done or running in another worker.
+        :param force: run a finished job again; its proof hints must be the recorded ones
+        """
+        status = self.status(job_id)
+        if status.state == JobState.DONE and not force:
+            return status
+        if not self._lock(job_id):
+            return self.status(job_id)
+        job_dir = self.directory / job_id
+        try:
+            job = self.job(job_id)
+            started = time.time()
+            self._set_status(job_id, JobStatus(JobState.RUNNING, started, output_hash=status.output_hash))
+            try:
+                output = self._execute(job)
+            except ProofJobError as e:
+                failed = JobStatus(JobState.FAILED, started, time.time(), status.output_hash, str(e))
+                self._set_status(job_id, failed)
+                return failed
+            output_hash = hashlib.sha256(output).hexdigest()
+            if status.output_hash is not None and status.output_hash != output_hash:
+                error = f'The proof hints differ from those of the previous run ({status.output_hash[:12]}).'
+                failed = JobStatus(JobState.FAILED, started, time.time(), status.output_hash, error)
+                self._set_status(job_id, failed)
+                return failed
+            _write_atomic(Path(job.proof_path), output)
+            done = JobStatus(JobState.DONE, started, time.time(), output_hash)
+            self._set_status(job_id, done)
+            return done
+        finally:
+            (job_dir / _LOCK_FILE).unlink(missing_ok=True)
+
+    def run_pending(self, workers: int = 1, job_ids: Iterable[str] | None = None,
+                    force: bool = False) -> dict[str, JobStatus]:
+        """
+        Run the given jobs, or all pending and failed jobs, with a pool of workers; oldest first.
+        :return: the statuses of the run jobs by id
+        """
+        if job_ids is None:
+            job_ids = [job.id for job in self.jobs()
+                       if self.status(job.id).state in (JobState.PENDING, JobState.FAILED)]
+        job_ids = list(job_ids)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            statuses = list(pool.map(lambda job_id: self.run(job_id, force), job_ids))
+        return dict(zip(job_ids, statuses))
+
+    def remove(self, job_id: str) -> None:
+        shutil.rmtree(self.directory / job_id, ignore_errors=True)
+
+    def _execute(self, job: ProofJob) -> bytes:
+        input_path = self.directory / job.id / INPUT_FILE
+        with open(input_path, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != job.input_hash:
+                raise ProofJobError('The recorded input of the job is corrupted.')
+        if definition_hash(job.kompiled) != job.definition_hash:
+            raise ProofJobError(f"The definition '{job.kompiled}' changed since the job was recorded; "
+                                f"its proof hints cannot be reproduced.")
+        result = subprocess.run([*job.cmd, str(input_path)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode or result.stderr:
+            raise ProofJobError(result.stderr.decode(errors='replace') or f'krun exited with {result.returncode}')
+        return result.stdout
+
+    def _set_status(self, job_id: str, status: JobStatus) -> None:
+        _write_atomic(self.directory / job_id / STATUS_FILE, json.dumps(status.to_dict(), indent=4).encode())
+
+    def _lock(self, job_id: str) -> bool:
+        """Claim the job for this process; the lock of a dead process is taken over."""
+        path = self.directory / job_id / _LOCK_FILE
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._is_locked(job_id):
+                    return False
+                path.unlink(missing_ok=True)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def _is_locked(self, job_id: str) -> bool:
+        try:
+            pid = int((self.directory / job_id / _LOCK_FILE).read_text() or 0)
+        except (FileNotFoundError, ValueError):
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+
+@lru_cache(maxsize=None)
+def _definition_hash(path: Path, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def definition_hash(kompiled: Path) -> str:
+    """The hash of the content of the `definition.kore` of the kompiled definition; rehashed only if it changed."""
+    path = kompiled / 'definition.kore'
+    stat = path.stat()
+    return _definition_hash(path, stat.st_size, stat.st_mtime_ns)
+
+
+def _write_atomic(path: Path, content: bytes) -> None:
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
@@ -0,0 +1,184 @@
+"""
+This module finds the generated rules that can never apply.
+The synthesis emits a create and a put variant of every rule with complements and inverts every unidirectional
+rule for the backward transformation; some of the results are dead:
+- an unreachable rule: its side condition is `false`;
+- a subsumed rule: a rule of a strictly higher priority matches every configuration it matches, and its side
+  condition holds whenever the side condition of the rule does, e.g., the create rule matching a stored complement
+  of the `matching` consistency check under the put rule of the same unidirectional rule;
+- a duplicate rule: a rule of the same priority is the same rule up to the names of its variables.
+The analysis is syntactic: a left-hand side subsumes another if it matches it, with every variable bound to a term
+of its sort, and the side conditions are compared conjunct by conjunct. It misses rules that are only shadowed
+semantically, but every rule it finds is dead, so dropping it does not change the transformation.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Final
+
+from pyk.kast import Atts
+from pyk.kast.inner import KInner, KSort, KVariable, Subst, collect
+from pyk.kast.manip import extract_lhs, flatten_label
+from pyk.kast.outer import KDefinition, KRule
+from pyk.prelude.kbool import FALSE, TRUE
+
+from kbx.prelude import ATT_KBX_RULE
+
+PRUNING_FILE: Final = 'pruned-rules.json'
+DEFAULT_PRIORITY: Final = 50
+OWISE_PRIORITY: Final = 200
+# the rules whose priority does not order them against the others
+_UNORDERED_ATTS: Final = (Atts.SIMPLIFICATION, Atts.ANYWHERE, Atts.MACRO, Atts.MACRO_REC, Atts.ALIAS, Atts.ALIAS_REC)
+
+
+class PruneMode(Enum):
+    """
+    What the generator does with the dead rules it finds.
+    - OFF: no analysis
+    - REPORT: keep the rules, and write why they are dead to `pruned-rules.json` of the definition
+    - DROP: leave the rules out of the definition, and write the report
+    """
+    OFF = 'off'
+    REPORT = 'report'
+    DROP = 'drop'
+
+
+class PruneReason(Enum):
+    UNREACHABLE = 'unreachable'
+    SUBSUMED = 'subsumed'
+    DUPLICATE = 'duplicate'
+
+
+@dataclass(frozen=True)
+class PrunedRule:
+    """
+    :param rule: the `kbx-rule` tag of the dead rule, e.g., `3:create_r`
+    :param by: the tag of the rule that subsumes or duplicates it
+    """
+    rule: str | None
+    module: str
+    location: tuple[int, int, int, int] | None
+    reason: PruneReason
+    by: str | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            'rule': self.rule,
+            'module': self.module,
+            'location': list(self.location) if self.location else None,
+            'reason': self.reason.value,
+            'by': self.by,
+        }
+
+
+def rule_priority(rule: KRule) -> int:
+    if Atts.OWISE in rule.att:
+        return OWISE_PRIORITY
+    return int(rule.att.get(Atts.PRIORITY, DEFAULT_PRIORITY))
+
+
+def is_ordered(rule: KRule) -> bool:
+    """Whether the priority of the rule orders it against the other rules."""
+    return not any(att in rule.att for att in _UNORDERED_ATTS)
+
+
+def find_dead_rules(rules: list[tuple[KRule, str]], kdef: KDefinition) -> dict[int, PrunedRule]:
+    """
+    Find the dead rules of one definition.
+    A rule is only compared with the live rules, which are checked first: a rule subsumed by a dead rule is
+    subsumed by the live rule subsuming that one.
+    :param kdef: the definition to sort the terms bound by the variables with
+    :return: the dead rules by their index in the rules
+    """
+    dead: dict[int, PrunedRule] = {}
+    live: list[KRule] = []
+    order = sorted(range(len(rules)), key=lambda index: (rule_priority(rules[index][0]), index))
+    for index in order:
+        rule, module_name = rules[index]
+        if not is_ordered(rule):
+            continue
+        found = _dead_reason(rule, live, kdef)
+        if found is None:
+            live.append(rule)
+            continue
+        reason, by = found
+        dead[index] = PrunedRule(rule.att.get(ATT_KBX_RULE), module_name, rule.att.get(Atts.LOCATION), reason,
+                                 by.att.get(ATT_KBX_RULE) if by is not None else None)
+    return dict(sorted(dead.items()))
+
+
+def write_report(path: Path, pruned: list[PrunedRule], dropped: bool) -> None:
+    with open(path, 'w') as f:
+        json.dump({'dropped': dropped, 'rules': [rule.to_dict() for rule in pruned]}, f, indent=4)
+
+
+def _dead_reason(rule: KRule, live: list[KRule], kdef: KDefinition) -> tuple[PruneReason, KRule | None] | None:
+    if FALSE in _conjuncts(rule.requires):
+        return PruneReason.UNREACHABLE, None
+    priority = rule_priority(rule)
+    for other in live:
+        if rule_priority(other) < priority and _subsumes(other, rule, kdef):
+            return PruneReason.SUBSUMED, other
+        if rule_priority(other) == priority and _is_duplicate(other, rule):
+            return PruneReason.DUPLICATE, other
+    return None
+
+
+def _subsumes(general: KRule, specific: KRule, kdef: KDefinition) -> bool:
+    """The general rule applies to every configuration the specific rule applies to."""
+    lhs, specific_lhs = extract_lhs(general.body), extract_lhs(specific.body)
+    subst = lhs.match(specific_lhs)
+    # the matching ignores the sorts of the tokens
+    if subst is None or subst(lhs) != specific_lhs or not _well_sorted(lhs, subst, kdef):
+        return False
+    conditions = set(_conjuncts(specific.requires))
+    return all(subst(conjunct) in conditions for conjunct in _conjuncts(general.requires))
+
+
+def _is_duplicate(rule: KRule, other: KRule) -> bool:
+    """The rules are the same up to a renaming of their variables."""
+    subst = rule.body.match(other.body)
+    if subst is None:
+        return False
+    sorts = _variable_sorts(rule.body)
+    values = list(subst.values())
+    if not all(isinstance(value, KVariable) and value.sort == sorts.get(name) for name, value in subst.items()):
+        return False
+    if len({value.name for value in values}) != len(values):
+        return False
+    requires = [subst(conjunct) for conjunct in _conjuncts(rule.requires)]
+    return requires == _conjuncts(other.requires) and subst(rule.ensures or TRUE) == (other.ensures or TRUE)
+
+
+def _well_sorted(pattern: KInner, subst: Subst, kdef: KDefinition) -> bool:
+    """Every sorted variable of the pattern is bound to a term of its sort or a subsort of it."""
+    for name, sort in _variable_sorts(pattern).items():
+        if sort is None or name not in subst or sort == KSort('K'):
+            continue
+        try:
+            term_sort = kdef.sort(subst[name])
+        except (KeyError, ValueError):
+            return False
+        if term_sort is None or term_sort != sort and term_sort not in kdef.subsorts(sort):
+            return False
+    return True
+
+
+def _variable_sorts(term: KInner) -> dict[str, KSort | None]:
+    sorts: dict[str, KSort | None] = {}
+
+    def _collect(_term: KInner) -> None:
+        if isinstance(_term, KVariable) and sorts.get(_term.name) is None:
+            sorts[_term.name] = _term.sort
+
+    collect(_collect, term)
+    return sorts
+
+
+def _conjuncts(requires: KInner | None) -> list[KInner]:
+    if requires is None:
+        return []
+    return [conjunct for conjunct in flatten_label('_andBool_', requires) if conjunct != TRUE]
@@ -0,0 +1,128 @@
+"""
+This module caches the results of the synchronizations in a BX workspace.
+A synchronization is determined by its direction, the two models, their complements and the kompiled definitions;
+the cache maps a key of the paths of the models and of the hashes of their contents to the file the synchronization
+wrote, and keeps a copy of that output in the `results/` directory named by its hash.
+A repeated synchronization of an unchanged pair then only hashes the models, and rewrites the output if it changed.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final
+
+RESULTS_DIR: Final = 'results'
+INDEX_FILE: Final = 'index.json'
+MAX_RESULTS: Final = 64
+
+
+@dataclass(frozen=True)
+class ResultKey:
+    """
+    :param direction: `forward` or `backward`
+    :param source_path: the real path of the changed model
+    :param target_path: the real path of the model to update
+    :param source_hash: the hash of the changed model
+    :param target_hash: the hash of the model to update
+    :param complement_hash: the hash of the contents of the complements stored for both models
+    :param definition_hash: the hash of the kompiled definitions and the synchronization definition
+    """
+    direction: str
+    source_path: str
+    target_path: str
+    source_hash: str
+    target_hash: str
+    complement_hash: str
+    definition_hash: str
+
+    @property
+    def digest(self) -> str:
+        parts = (self.direction, self.source_path, self.target_path, self.source_hash, self.target_hash,
+                 self.complement_hash, self.definition_hash)
+        return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    """
+    :param written_path: the file the synchronization wrote
+    :param output_hash: the hash of what it wrote; its copy is named by it
+    """
+    written_path: Path
+    output_hash: str
+
+
+class ResultCache:
+    directory: Path
+    max_entries: int
+
+    def __init__(self, directory: Path, max_entries: int = MAX_RESULTS) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+
+    @property
+    def index_file(self) -> Path:
+        return self.directory / INDEX_FILE
+
+    def load_index(self) -> dict[str, dict]:
+        if not self.index_file.exists():
+            return {}
+        with open(self.index_file) as f:
+            return json.load(f)
+
+    def save_index(self, index: dict[str, dict]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_file.with_name(self.index_file.name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=4)
+        os.replace(tmp, self.index_file)
+
+    def get(self, key: ResultKey) -> CachedResult | None:
+        """The result recorded for the key, marked as used; None if there is none or its copy is missing."""
+        index = self.load_index()
+        entry = index.get(key.digest)
+        if entry is None or not (self.directory / entry['output_hash']).exists():
+            return None
+        entry['last_used'] = time.time()
+        self.save_index(index)
+        return CachedResult(Path(entry['written_path']), entry['output_hash'])
+
+    def put(self, key: ResultKey, written_path: Path, output: bytes) -> CachedResult:
+        """Record the output the synchronization wrote, and evict the least recently used results beyond the limit."""
+        output_hash = hashlib.sha256(output).hexdigest()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_if_changed(self.directory / output_hash, output)
+        index = self.load_index()
+        index[key.digest] = {'written_path': str(written_path), 'output_hash': output_hash, 'last_used': time.time()}
+        if len(index) > self.max_entries:
+            by_use = sorted(index, key=lambda digest: index[digest]['last_used'])
+            for digest in by_use[:len(index) - self.max_entries]:
+                del index[digest]
+        self.save_index(index)
+        referenced = {entry['output_hash'] for entry in index.values()}
+        for path in self.directory.iterdir():
+            if path.name != INDEX_FILE and path.name not in referenced:
+                path.unlink(missing_ok=True)
+        return CachedResult(written_path, output_hash)
+
+    def restore(self, result: CachedResult) -> bool:
+        """Write the recorded output back to the file it was written to; return whether the file changed."""
+        return write_if_changed(result.written_path, (self.directory / result.output_hash).read_bytes())
+
+
+def write_if_changed(path: Path, content: bytes) -> bool:
+    """
+    Replace the file with the content through a temporary file, unless it already holds that content;
+    return whether the file was written.
+    """
+    if path.exists() and path.stat().st_size == len(content) and path.read_bytes() == content:
+        return False
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return True
@@ -0,0 +1,117 @@
+"""
+This module caches the synthesized rules of the BX generator, rule by rule.
+A unidirectional rule is identified by the hash of its sugared KAST and its module, without its location:
+an edit elsewhere in the definition moves the rule but does not change it.
+The `?KbxGenTodo` placeholders of a rule are named by that hash, so an unchanged rule synthesizes to the same rules,
+the cache can return them, and the `default_value` of its placeholders stays valid.
+The rule id (the index of the rule in the definition) is not part of the cached rules: they hold a placeholder that
+`retag` replaces, so a rule inserted or deleted before a rule does not invalidate it; its id still changes.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Final
+
+from pyk.kast import Atts
+from pyk.kast.inner import KInner, KToken, bottom_up
+from pyk.kast.outer import KRule
+from pyk.prelude.kint import intToken
+
+from kbx.prelude import ATT_KBX_RULE, tag_rule
+
+RULE_CACHE_FILE: Final = 'rule-cache.json'
+# the length of the hash prefix naming the placeholders of a rule
+TODO_HASH_LENGTH: Final = 8
+# the rule id in the cached rules, in their complements and in their `kbx-rule` attribute
+RULE_ID_PLACEHOLDER: Final = KToken('kbxRuleId', 'Int')
+_VERSION: Final = 2
+
+SynthesizedRules = tuple[list[tuple[KRule, str]], list[tuple[KRule, str]]]
+
+
+def rule_hash(rule: KRule, module_name: str) -> str:
+    """The hash of the rule and its module, independent of where the rule is in the file."""
+    rule = rule.let(att=rule.att.discard([Atts.LOCATION, Atts.SOURCE]))
+    data = json.dumps({'module': module_name, 'rule': rule.to_dict()}, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def todo_prefix(digest: str) -> str:
+    """The prefix of the names of the placeholders of the rule of the hash, e.g., `3fa2b1c0_`."""
+    return digest[:TODO_HASH_LENGTH] + '_'
+
+
+def retag(rule: KRule, rule_id: int) -> KRule:
+    """The cached rule with the id of its unidirectional rule in place of the placeholder."""
+    def _replace(term: KInner) -> KInner:
+        return intToken(rule_id) if term == RULE_ID_PLACEHOLDER else term
+    variant = rule.att[ATT_KBX_RULE].split(':')[1]
+    rule = rule.let(body=bottom_up(_replace, rule.body), requires=bottom_up(_replace, rule.requires),
+                    ensures=bottom_up(_replace, rule.ensures))
+    return tag_rule(rule, rule_id, variant)
+
+
+def relocate(rule: KRule, source: KRule) -> KRule:
+    """The cached rule with the location of the unidirectional rule it is synthesized from."""
+    locations = [att(source.att[att]) for att in (Atts.LOCATION, Atts.SOURCE) if att in source.att]
+    return rule.let(att=rule.att.update(locations))
+
+
+class RuleCache:
+    """
+    The rules synthesized from each unidirectional rule, by its hash, with the placeholder rule id.
+    The cache is only valid for the generator options it was written with.
+    """
+    path: Path
+    options: str
+    hits: int
+    misses: int
+
+    def __init__(self, path: Path, options: str) -> None:
+        self.path = path
+        self.options = options
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, dict] = {}
+        self._used: dict[str, dict] = {}
+
+    @staticmethod
+    def load(path: Path, options: str) -> RuleCache:
+        cache = RuleCache(path, options)
+        if path.exists():
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == _VERSION and data.get('options') == options:
+                cache._entries = data['rules']
+        return cache
+
+    def save(self) -> None:
+        """Write the entries used since the cache was loaded; the entries of removed or edited rules are dropped."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'version': _VERSION, 'options': self.options, 'rules': self._used}, f)
+        os.replace(tmp, self.path)
+
+    def get(self, digest: str) -> SynthesizedRules | None:
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[digest] = entry
+        return _from_json(entry['forward']), _from_json(entry['backward'])
+
+    def put(self, digest: str, rules: SynthesizedRules) -> None:
+        self._used[digest] = self._entries[digest] = {'forward': _to_json(rules[0]), 'backward': _to_json(rules[1])}
+
+
+def _to_json(rules: list[tuple[KRule, str]]) -> list[dict]:
+    return [{'rule': rule.to_dict(), 'module': module_name} for rule, module_name in rules]
+
+
+def _from_json(entries: list[dict]) -> list[tuple[KRule, str]]:
+    return [(KRule.from_dict(entry['rule']), entry['module']) for entry in entries]
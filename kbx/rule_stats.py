@@ -0,0 +1,228 @@
+"""
+This module counts how many times each rewrite rule fired during a synchronization.
+The counts come from the LLVM proof-hint stream (`kompile --llvm-proof-hint-instrumentation`, `krun --proof-hint`):
+every rule event carries the ordinal of the applied axiom of the kompiled definition.
+Each axiom is attributed back to its generated rule and, through the rule index written by `BXGenerator`,
+to the unidirectional rule and the variant (`create_r`, `put_r`, `create_l`, `put_l`) it was generated from.
+For axioms outside the rule index, the rule id is read from the first complement key, as `bx_synthesis` embeds it.
+"""
+from __future__ import annotations
+
+import json
+import re
+import subprocess
+from collections import Counter
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Final, Iterable
+
+from pyk.kore.parser import KoreParser
+from pyk.kore.syntax import App, Axiom, DV, Definition, Pattern, Rewrites, String
+
+from kbx.prelude import COMPLEMENTS_CELL_NAME, RULE_INDEX_FILE
+
+HEADER_FILE: Final = 'header.bin'
+SORT_KEYS: Final = ('count', 'ordinal', 'rule')
+_LOCATION_ATT: Final = "org'Stop'kframework'Stop'attributes'Stop'Location"
+_SOURCE_ATT: Final = "org'Stop'kframework'Stop'attributes'Stop'Source"
+_COMPLEMENTS_SYMBOL: Final = f"Lbl'-LT-'{COMPLEMENTS_CELL_NAME}'-GT-'"
+# the symbols a create rule stores its complement with, per complement layout
+_CREATE_SYMBOLS: Final = ("LblMap'Coln'update", 'LblkbxPutComplement')
+
+
+@dataclass(frozen=True)
+class RuleStat:
+    """
+    The execution statistics of one axiom of the kompiled definition.
+    :param definition: the direction of the definition, `forward` or `backward`
+    :param ordinal: the ordinal of the axiom in `definition.kore`
+    :param count: how many times the axiom was applied
+    :param rule_id: the index of the unidirectional rule, None for rules not generated from one
+    :param variant: `create_r`, `put_r`, `create_l`, `put_l`, `bx`, or None
+    :param source_location: the location of the unidirectional rule
+    :param generated_location: the location of the rule in the generated definition
+    :param owise: whether the rule is an `[owise]` rule
+    :param label: the label of the axiom, if any
+    """
+    definition: str
+    ordinal: int
+    count: int
+    rule_id: int | None
+    variant: str | None
+    source_location: tuple[int, ...] | None
+    generated_location: tuple[int, ...] | None
+    owise: bool
+    label: str | None
+
+
+def kore_header(kompiled_dir: Path) -> Path:
+    """Create the binary KORE header needed to parse the proof hints of the definition, once."""
+    header = kompiled_dir / HEADER_FILE
+    if not header.exists():
+        result = subprocess.run(['kore-rich-header', str(kompiled_dir / 'definition.kore')],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        header.write_bytes(result.stdout)
+    return header
+
+
+def count_rule_ordinals(hints: bytes, kompiled_dir: Path) -> Counter[int]:
+    """Count the applications of each axiom (by ordinal) in a proof-hint stream."""
+    # the LLVM bindings are only needed (and only available) for definitions kompiled with proof hints
+    from pyk.kllvm.hints.prooftrace import KoreHeader, LLVMRewriteTrace, LLVMRuleEvent
+
+    trace = LLVMRewriteTrace.parse(hints, KoreHeader.create(kore_header(kompiled_dir)))
+    counts: Counter[int] = Counter()
+    for argument in trace.pre_trace + trace.trace:
+        if argument.is_step_event() and isinstance(argument.step_event, LLVMRuleEvent):
+            counts[argument.step_event.rule_ordinal] += 1
+    return counts
+
+
+def rule_stats(counts: Counter[int], kompiled_dir: Path, generated_k: Path) -> list[RuleStat]:
+    """
+    Attribute the counts of the axioms to the generated rules.
+    :param counts: the applications of each axiom by ordinal
+    :param kompiled_dir: the `llvm-kompiled` directory of the generated definition
+    :param generated_k: the generated K definition, next to its rule index
+    """
+    with open(kompiled_dir / 'definition.kore') as f:
+        definition: Definition = KoreParser(f.read()).definition()
+    axioms = definition.axioms
+    direction = generated_k.parent.name
+    rule_lines = _rule_lines(generated_k)
+    index = _load_rule_index(generated_k.parent / RULE_INDEX_FILE)
+    stats = []
+    for ordinal, count in counts.items():
+        axiom = axioms[ordinal]
+        atts = {att.symbol: att for att in axiom.attrs}
+        location = _location(atts)
+        entry = None
+        source = _att_str(atts, _SOURCE_ATT)
+        if location and source and Path(source[len('Source('):-1]).name == generated_k.name:
+            entry = index.get(rule_lines.get(location[0], -1))
+        if entry is not None:
+            rule_id = entry['rule_id']
+            variant = entry['variant']
+            source_location = tuple(entry['source_location']) if entry['source_location'] else None
+        else:
+            rule_id, variant = _rule_from_complements(axiom)
+            if variant is not None:
+                variant += '_r' if direction == 'forward' else '_l'
+            source_location = None
+        stats.append(RuleStat(
+            definition=direction,
+            ordinal=ordinal,
+            count=count,
+            rule_id=rule_id,
+            variant=variant,
+            source_location=source_location,
+            generated_location=location,
+            owise='owise' in atts,
+            label=_att_str(atts, 'label'),
+        ))
+    return stats
+
+
+def sort_stats(stats: Iterable[RuleStat], key: str = 'count') -> list[RuleStat]:
+    match key:
+        case 'count':
+            return sorted(stats, key=lambda s: (-s.count, s.ordinal))
+        case 'ordinal':
+            return sorted(stats, key=lambda s: (s.definition, s.ordinal))
+        case 'rule':
+            return sorted(stats, key=lambda s: (s.rule_id is None, s.rule_id or 0, s.variant or '', s.ordinal))
+        case _:
+            raise ValueError(f"Unknown sort key: {key}, should be one of {', '.join(SORT_KEYS)}")
+
+
+def format_table(stats: Iterable[RuleStat]) -> str:
+    rows = [('count', 'rule', 'variant', 'owise', 'source', 'generated', 'definition', 'ordinal')]
+    for s in stats:
+        rows.append((
+            str(s.count),
+            '-' if s.rule_id is None else str(s.rule_id),
+            s.variant or '-',
+            'yes' if s.owise else '',
+            _format_location(s.source_location),
+            _format_location(s.generated_location),
+            s.definition,
+            str(s.ordinal),
+        ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def write_stats(path: Path, stats: Iterable[RuleStat]) -> None:
+    """Write the statistics as JSON if the path ends with `.json`, as a table otherwise."""
+    stats = list(stats)
+    with open(path, 'w') as f:
+        if path.suffix == '.json':
+            json.dump({'total': sum(s.count for s in stats), 'rules': [asdict(s) for s in stats]}, f, indent=4)
+        else:
+            f.write(format_table(stats) + '\n')
+
+
+def _rule_lines(generated_k: Path) -> dict[int, int]:
+    """Map the line of each printed `rule` to its position among the printed rules."""
+    result = {}
+    with open(generated_k) as f:
+        for line_no, line in enumerate(f, start=1):
+            if re.match(r'\s*rule\s', line):
+                result[line_no] = len(result)
+    return result
+
+
+def _load_rule_index(path: Path) -> dict[int, dict]:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return dict(enumerate(json.load(f)['rules']))
+
+
+def _att_str(atts: dict[str, App], symbol: str) -> str | None:
+    att = atts.get(symbol)
+    if att is None or not att.args or not isinstance(att.args[0], String):
+        return None
+    return att.args[0].value
+
+
+def _location(atts: dict[str, App]) -> tuple[int, ...] | None:
+    value = _att_str(atts, _LOCATION_ATT)
+    if value is None:
+        return None
+    return tuple(int(n) for n in re.findall(r'\d+', value))
+
+
+def _rule_from_complements(axiom: Axiom) -> tuple[int | None, str | None]:
+    """
+    Read the rule id from the first complement key of the axiom.
+    Create rules update the complements map with `Map:update` (or `kbxPutComplement` for the nested layout);
+    put rules match an existing entry.
+    """
+    if not any(isinstance(p, Rewrites) for p in _iter(axiom.pattern)):
+        return None, None
+    rule_id = None
+    is_create = False
+    for p in _iter(axiom.pattern):
+        if isinstance(p, App) and p.symbol in _CREATE_SYMBOLS:
+            is_create = True
+        if rule_id is None and isinstance(p, App) and p.symbol == _COMPLEMENTS_SYMBOL:
+            rule_id = next((int(q.value.value) for q in _iter(p)
+                            if isinstance(q, DV) and q.sort.name == 'SortInt'), None)
+    if rule_id is None:
+        return None, None
+    return rule_id, 'create' if is_create else 'put'
+
+
+def _iter(pattern: Pattern) -> Iterable[Pattern]:
+    stack = [pattern]
+    while stack:
+        p = stack.pop()
+        yield p
+        stack.extend(reversed(p.patterns))
+
+
+def _format_location(location: tuple[int, ...] | None) -> str:
+    if not location:
+        return '-'
+    return f'{location[0]}:{location[1]}'
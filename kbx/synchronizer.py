@@ -0,0 +1,899 @@
+"""
+This module is the runtime of a generated BX workspace.
+A `Synchronizer` is loaded from a workspace path and synchronizes pairs of models with the kompiled interpreters;
+the generated `kbx.py` is a command line wrapper around it.
+In-process callers can keep one `Synchronizer` for many synchronizations: the kompiled definition is loaded once,
+and the thread pool overlapping the interpreter runs is reused.
+"""
+from __future__ import annotations
+
+import codecs
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cached_property
+from pathlib import Path
+from typing import IO, Any, Callable, Final, Iterator
+
+from pyk.kast.inner import KInner
+from pyk.kast.outer import KDefinition, read_kast_definition
+from pyk.konvert import kore_to_kast
+from pyk.kore.syntax import DV, App, Pattern, SortApp, String
+
+from kbx.compaction import MAP_ITEM, build_map, compact_complements_kore
+from kbx.complements import ComplementStore, GCReport
+from kbx.formatter import IterativeFormatter
+from kbx.kompile import BuildProfile, KompileSource
+from kbx.kore import KoreReader, parse_pattern, read_cell, replace_cell, write_pattern
+from kbx.native_lists import find_user_lists, from_native_list
+from kbx.prelude import DIRECTION_CELL_NAME, DIRECTION_VALUES, DIRECTION_VAR, SOURCE_VAR, TARGET_VAR
+from kbx.profiling import Profiler
+from kbx.proof_jobs import PROOF_JOBS_DIR, JobStatus, ProofJobQueue
+from kbx.results import RESULTS_DIR, ResultCache, ResultKey, write_if_changed
+from kbx.rule_stats import count_rule_ordinals, rule_stats, sort_stats, write_stats
+from kbx.tracing import Tracer, pattern_size
+from kbx.unparsing import FRAGMENT_SORT, UNPARSING_DIR, FragmentCache, cons_symbols, fragment_cache_path, \
+    split_elements
+from kbx.watch import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, Watcher
+from kbx.workspace import SYNC_FILE, ComplementLimits, SyncDefinition, WorkspaceConfig
+
+_LOGGER: Final = logging.getLogger(__name__)
+
+DIRECTIONS: Final = ('forward', 'backward')
+HASH_FILE: Final = 'file_hashes.json'
+COMPLEMENTS_DIR: Final = 'complements'
+TEMP_FILE: Final = 'temp.kore'
+SYNCHRONIZED_SUFFIX: Final = '.synchronized'
+# at most: the prefetched parse, a create or continue run, and its proof-hint run
+_MAX_WORKERS: Final = 4
+
+
+class SyncError(Exception):
+    """A synchronization that cannot proceed, e.g., a missing model or a failing interpreter."""
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    """
+    :param direction: `forward` or `backward`
+    :param input_path: the changed model
+    :param output_path: the model to update
+    :param written_path: the file the result was written to:
+        the model to update if it did not exist, its `.synchronized` sibling otherwise
+    :param timings: the wall-clock seconds of the phases
+    :param cached: the models were unchanged since their last synchronization, and its result was reused
+    :param proof_jobs: the ids of the proof-hint runs deferred to the proof job queue
+    """
+    direction: str
+    input_path: Path
+    output_path: Path
+    written_path: Path
+    timings: dict[str, float] = field(default_factory=dict)
+    cached: bool = False
+    proof_jobs: list[str] = field(default_factory=list)
+
+    @property
+    def created(self) -> bool:
+        return self.written_path == self.output_path
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.timings.values())
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    """
+    One synchronization of a batch of `kbx.py serve`; every job runs the interpreters on its own pair of models.
+    :param direction: `forward` or `backward`
+    :param input_path: the changed model
+    :param output_path: the model to update
+    """
+    direction: str
+    input_path: Path
+    output_path: Path
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """
+    :param results: the results of the synchronizations that succeeded, in the order of their jobs
+    :param failures: the jobs that failed, with their errors
+    :param wall_time: the wall-clock seconds of the whole batch
+    """
+    results: list[SyncResult]
+    failures: list[tuple[BatchJob, str]]
+    wall_time: float
+
+
+@dataclass(frozen=True)
+class InitResult:
+    build_profile: BuildProfile
+    proof_hints: bool
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+class Synchronizer:
+    workspace: Path
+    definition: SyncDefinition
+    config: WorkspaceConfig
+    store: ComplementStore
+    results: ResultCache
+    proof_jobs: ProofJobQueue
+    tracer: Tracer
+    profiler: Profiler
+    # {kompiled directory: {axiom ordinal: applications}}, collected from the proof hints if not None
+    rule_counts: dict[str, Counter] | None
+
+    def __init__(
+            self,
+            workspace: Path,
+            *,
+            sequential: bool = False,
+            tracer: Tracer | None = None,
+            profiler: Profiler | None = None,
+    ) -> None:
+        """
+        :param workspace: the BX workspace written by `BXGenerator.generate`
+        :param sequential: run the interpreters one after the other instead of overlapping independent runs
+        """
+        self.workspace = workspace.resolve()
+        self.definition = SyncDefinition.load(self.workspace)
+        self.config = WorkspaceConfig.load(self.workspace)
+        self.store = ComplementStore(self.workspace / COMPLEMENTS_DIR, self.workspace / HASH_FILE,
+                                     self.config.complements)
+        self.results = ResultCache(self.workspace / RESULTS_DIR)
+        self.proof_jobs = ProofJobQueue(self.workspace / PROOF_JOBS_DIR)
+        self.tracer = tracer if tracer is not None else Tracer(enabled=False)
+        self.profiler = profiler if profiler is not None else Profiler(self.workspace, enabled=False)
+        self.rule_counts = None
+        self._sequential = sequential
+        self._executor: ThreadPoolExecutor | None = None
+        # the synchronizations of a batch run in threads; they share the indexes of the stores
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._fragment_caches: dict[Path, FragmentCache] = {}
+        # {real path of a model: (its content hash, the direction of the run that left its stored complement)}
+        self._complement_runs: dict[str, tuple[str, str]] = {}
+
+    def __enter__(self) -> Synchronizer:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def definition_dirs(self) -> tuple[str, ...]:
+        """The directories of the generated definitions in the workspace, each kompiled by `init`."""
+        return (KompileSource.UNIFIED.value,) if self.definition.unified else DIRECTIONS
+
+    def k_def_path(self, direction: str) -> Path:
+        return self.workspace / self._definition_dir(direction) / self.definition.bx_def
+
+    def kompiled_path(self, direction: str) -> Path:
+        return self.workspace / self._definition_dir(direction) / 'llvm-kompiled'
+
+    def _definition_dir(self, direction: str) -> str:
+        return KompileSource.UNIFIED.value if self.definition.unified else direction
+
+    def krun_command(self, direction: str) -> list[str]:
+        return ['krun', '--definition', str(self.kompiled_path(direction)), '-o', 'kore']
+
+    @cached_property
+    def kdef(self) -> KDefinition:
+        with self.tracer.span('load-definition'), self.profiler.phase('load-definition'):
+            return read_kast_definition(self.kompiled_path('forward') / 'compiled.json')
+
+    @cached_property
+    def formatter(self) -> IterativeFormatter:
+        return IterativeFormatter(self.kdef)
+
+    @cached_property
+    def cons_symbols(self) -> frozenset[str]:
+        """The KORE symbols of the cons productions of the user lists of the definition."""
+        return cons_symbols([user_list.cons for user_list in find_user_lists(self.kdef).values()])
+
+    @cached_property
+    def definition_hash(self) -> str:
+        """The hash of the size and modification time of the kompiled definitions and the synchronization definition."""
+        paths = [*(self.workspace / name / 'llvm-kompiled' / 'definition.kore' for name in self.definition_dirs),
+                 self.workspace / SYNC_FILE]
+        stats = [(str(path), path.stat().st_size, path.stat().st_mtime_ns) if path.exists() else (str(path),)
+                 for path in paths]
+        return hashlib.sha256(repr(stats).encode()).hexdigest()
+
+    def init(self, allow_proof_hints: bool = False, build_profile: BuildProfile | None = None) -> InitResult:
+        """
+        Kompile the interpreters of both directions and record the build profile in the workspace.
+        :param allow_proof_hints: instrument the interpreters for proof hints whatever the profile
+        :param build_profile: the profile to build with; the recorded one if None
+        """
+        build_profile = build_profile if build_profile is not None else self.config.build_profile
+        with open(self.k_def_path('backward')) as f:
+            if '?KbxGenTodo' in f.read():
+                raise SyncError(f"Please complete the transformation definition in '{self.k_def_path('backward')}'"
+                                f" with default values.")
+        flags = build_profile.kompile_flags()
+        if allow_proof_hints and not build_profile.proof_hints:
+            flags.append('--llvm-proof-hint-instrumentation')
+        timings = {}
+        for name in self.definition_dirs:
+            kompiled = self.workspace / name / 'llvm-kompiled'
+            if kompiled.exists():
+                shutil.rmtree(kompiled)
+            _LOGGER.info(f'Running kompile command for the definition of {name} transformation '
+                         f'({build_profile.value} profile)...')
+            started = time.perf_counter()
+            with self.profiler.phase(f'kompile-{name}'):
+                k_def_path = self.workspace / name / self.definition.bx_def
+                cmd = ['kompile', str(k_def_path), *flags, '-o', str(kompiled), '--emit-json']
+                result = self.profiler.run(cmd)
+            timings[f'kompile-{name}'] = time.perf_counter() - started
+            if result.stderr and b'Error' in result.stderr:
+                raise SyncError(result.stderr.decode())
+        self.config.build_profile = build_profile
+        self.config.save(self.workspace)
+        self.__dict__.pop('kdef', None)
+        self.__dict__.pop('formatter', None)
+        self.__dict__.pop('definition_hash', None)
+        return InitResult(build_profile, allow_proof_hints or build_profile.proof_hints, timings)
+
+    def forward(self, source: str | Path, target: str | Path, proof_hints: bool = False) -> SyncResult:
+        return self.trans('forward', source, target, proof_hints)
+
+    def backward(self, source: str | Path, target: str | Path, proof_hints: bool = False) -> SyncResult:
+        return self.trans('backward', source, target, proof_hints)
+
+    def trans(self, direction: str, input_path: str | Path, output_path: str | Path,
+              proof_hints: bool = False, use_cache: bool = True, defer_hints: bool = False,
+              reuse_complements: bool = False) -> SyncResult:
+        """
+        Synchronize the model to update with the changed model.
+        :param direction: `forward` if the changed model is the source of the unidirectional transformation
+        :param proof_hints: write the proof hints of every interpreter run next to the model it ran on
+        :param use_cache: reuse the result of the last synchronization of the same models, complements and
+            definitions; runs with proof hints, runs reusing stored complements, and runs creating the model to
+            update, are never cached
+        :param defer_hints: record the proof-hint runs in the proof job queue instead of waiting for them;
+            the rule statistics need the proof hints right away, and are never deferred
+        :param reuse_complements: start from the stored complement of the model to update if a run of this
+            synchronizer left it for its current content, instead of creating the complements of both models again
+        """
+        if direction not in DIRECTIONS:
+            raise SyncError(f"Invalid transformation direction '{direction}', should be 'forward' or 'backward'.")
+        input_path = os.path.abspath(input_path)
+        output_path = os.path.abspath(output_path)
+        if not os.path.isfile(input_path):
+            raise SyncError(f"Input file '{input_path}' does not exist.")
+        proof_hints = proof_hints or self.rule_counts is not None
+        use_cache = use_cache and not proof_hints and not reuse_complements and os.path.exists(output_path)
+        if use_cache:
+            key = self._result_key(direction, input_path, output_path)
+            with self._lock:
+                cached = self.results.get(key)
+            if cached is not None:
+                timings: dict[str, float] = {}
+                with self._phase('restore-result', direction, timings):
+                    rewritten = self.results.restore(cached)
+                _LOGGER.info('The models are unchanged since their last synchronization'
+                             + (f"; restored '{cached.written_path}'." if rewritten else '.'))
+                return SyncResult(direction, Path(input_path), Path(output_path), cached.written_path, timings,
+                                  cached=True)
+        in_cell, out_cell = self.definition.in_cell_name, self.definition.out_cell_name
+        timings = {}
+        # the proof-hint runs of this synchronization are recorded as jobs if this is a list
+        self._local.deferred_jobs = [] if proof_hints and defer_hints and self.rule_counts is None else None
+        try:
+            with self.tracer.span('trans', direction=direction, input=input_path, output=output_path):
+                if direction == 'forward':
+                    # the parse of the input for the synchronization depends on nothing; start it right away
+                    parsed_input = None
+                    if os.path.exists(output_path):
+                        parsed_input = self._submit(self._parse_cell, 'forward', input_path, in_cell)
+                    with self._phase('create-complements', direction, timings):
+                        reused = self._create_complements(proof_hints, input_path, output_path, direction,
+                                                          reuse_complements)
+                    with self._phase('synchronize', direction, timings):
+                        written = self._synchronize(proof_hints, 'forward', input_path, output_path, in_cell,
+                                                    out_cell, self.definition.out_deletes, parsed_input, reused)
+                else:
+                    with self._phase('create-complements', direction, timings):
+                        self._create_complements(proof_hints, output_path, input_path, direction, reuse_complements)
+                    with self._phase('synchronize', direction, timings):
+                        written = self._synchronize(proof_hints, 'backward', input_path, output_path, out_cell,
+                                                    in_cell, self.definition.in_deletes)
+        finally:
+            deferred = self._local.deferred_jobs
+            del self._local.deferred_jobs
+        if use_cache:
+            # the key of the state the synchronization leaves: synchronizing it again writes the same output
+            key = self._result_key(direction, input_path, output_path)
+            with self._lock:
+                self.results.put(key, Path(written), Path(written).read_bytes())
+        if deferred:
+            _LOGGER.info(f'Deferred {len(deferred)} proof-hint runs to the proof job queue.')
+        return SyncResult(direction, Path(input_path), Path(output_path), Path(written), timings,
+                          proof_jobs=deferred or [])
+
+    def trans_job(self, job: BatchJob, slot: int | str, proof_hints: bool = False, use_cache: bool = True,
+                  defer_hints: bool = False) -> SyncResult:
+        """
+        Run one synchronization of a batch in the calling thread, concurrently with the other slots:
+        its interpreters run one after the other, the batch overlaps the pairs instead,
+        and its temporary file is the one of its slot.
+        """
+        self._local.sequential = True
+        self._local.temp_file = f'temp.{slot}.kore'
+        try:
+            return self.trans(job.direction, job.input_path, job.output_path, proof_hints, use_cache, defer_hints)
+        finally:
+            (self.workspace / self._local.temp_file).unlink(missing_ok=True)
+            del self._local.temp_file
+            del self._local.sequential
+
+    def watch(
+            self,
+            source: str | Path,
+            target: str | Path,
+            proof_hints: bool = False,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+            debounce: float = DEFAULT_DEBOUNCE,
+            on_result: Callable[[SyncResult], None] | None = None,
+    ) -> None:
+        """
+        Synchronize the models whenever one of them changes, until interrupted;
+        the synchronized model replaces the other model.
+        The complements stay warm: the configuration a synchronization writes the other model from is stored as the
+        complement of both models, and the next synchronization starts from it instead of creating the complements
+        of both models again.
+        """
+        source_path, target_path = os.path.abspath(source), os.path.abspath(target)
+        watcher = Watcher([Path(source_path), Path(target_path)], poll_interval, debounce)
+
+        def _sync(direction: str, changed_path: str, other_path: str) -> None:
+            try:
+                result = self.trans(direction, changed_path, other_path, proof_hints, reuse_complements=True)
+                # replace the other model with its synchronized version, and ignore the change made by that
+                if not result.created:
+                    os.replace(result.written_path, other_path)
+                watcher.expect(Path(other_path))
+                self._share_complement(changed_path, other_path)
+                self.store.evict()
+            except SyncError as e:
+                _LOGGER.error(f'Error: {e}')
+                _LOGGER.warning('Synchronization failed; waiting for the next change...')
+                return
+            except Exception:
+                _LOGGER.exception('Unexpected error')
+                _LOGGER.warning('Synchronization failed; waiting for the next change...')
+                return
+            if on_result is not None:
+                on_result(result)
+
+        if os.path.exists(source_path) and not os.path.exists(target_path):
+            _sync('forward', source_path, target_path)
+        _LOGGER.info(f"Watching '{source_path}' and '{target_path}' for changes (press Ctrl+C to stop)...")
+        try:
+            for changed in watcher.changes():
+                if str(changed) == source_path:
+                    _LOGGER.info(f"'{source_path}' changed, synchronizing forward...")
+                    _sync('forward', source_path, target_path)
+                else:
+                    _LOGGER.info(f"'{target_path}' changed, synchronizing backward...")
+                    _sync('backward', target_path, source_path)
+        except KeyboardInterrupt:
+            _LOGGER.info('Stopped watching.')
+
+    def gc(self, limits: ComplementLimits | None = None, dry_run: bool = False) -> GCReport:
+        return self.store.gc(limits, dry_run)
+
+    def run_proof_jobs(self, job_ids: list[str] | None = None, workers: int = 1,
+                       force: bool = False) -> dict[str, JobStatus]:
+        """
+        Generate the deferred proof hints: run the given proof jobs, or all pending and failed ones.
+        :param force: run finished jobs again, and check that they reproduce their proof hints
+        """
+        with self.tracer.span('proof-jobs', workers=workers), self.profiler.phase('proof-jobs'):
+            return self.proof_jobs.run_pending(workers, job_ids, force)
+
+    def spawn_proof_worker(self, job_ids: list[str], workers: int = 1) -> subprocess.Popen:
+        """
+        Run the proof jobs in a detached `kbx.py hints run` process, which outlives this one;
+        its output is appended to `worker.log` in the proof job queue.
+        """
+        self.proof_jobs.directory.mkdir(parents=True, exist_ok=True)
+        cmd = [sys.executable, str(self.workspace / 'kbx.py'), 'hints', 'run', '--workers', str(workers), *job_ids]
+        with open(self.proof_jobs.directory / 'worker.log', 'ab') as log:
+            return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                    start_new_session=True)
+
+    def write_rule_stats(self, output: Path, sort_key: str) -> None:
+        """Write the statistics of the rule applications collected in `rule_counts`."""
+        stats = []
+        for kompiled, counts in (self.rule_counts or {}).items():
+            direction = 'forward' if Path(kompiled) == self.kompiled_path('forward') else 'backward'
+            stats.extend(rule_stats(counts, Path(kompiled), self.k_def_path(direction)))
+        write_stats(output, sort_stats(stats, sort_key))
+
+    def proof_rule_stats(self, direction: str, proof_path: Path, output: Path, sort_key: str) -> None:
+        """Write the rule statistics of a recorded proof hint file."""
+        kompiled = self.kompiled_path(direction)
+        with open(proof_path, 'rb') as f:
+            self.rule_counts = {str(kompiled): count_rule_ordinals(f.read(), kompiled)}
+        self.write_rule_stats(output, sort_key)
+
+    @contextmanager
+    def _phase(self, name: str, direction: str, timings: dict[str, float]) -> Iterator[None]:
+        """A phase of a synchronization: traced, profiled, and timed into the result."""
+        started = time.perf_counter()
+        with self.tracer.span(name, direction=direction), self.profiler.phase(name):
+            try:
+                yield
+            finally:
+                timings[name] = time.perf_counter() - started
+
+    def _submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Run the function in the thread pool, or right away in the sequential mode."""
+        if self._sequential or getattr(self._local, 'sequential', False):
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS)
+        # the function runs on behalf of this thread, e.g., with its temporary file, deferred proof jobs and phase
+        local = dict(vars(self._local))
+        phase = self.profiler.current
+
+        def _run() -> Any:
+            vars(self._local).update(local)
+            try:
+                with self.profiler.joined(phase):
+                    return fn(*args, **kwargs)
+            finally:
+                vars(self._local).clear()
+        return self._executor.submit(_run)
+
+    def _file_hash(self, path: str | Path) -> str:
+        with self.tracer.span('hash', path=str(path)) as span:
+            with open(path, 'rb') as f:
+                buffer = f.read()
+            span.set(bytes=len(buffer))
+            return hashlib.sha256(buffer).hexdigest()
+
+    def _result_key(self, direction: str, input_path: str, output_path: str) -> ResultKey:
+        index = self.store.load_index()
+        complements = []
+        for path in (input_path, output_path):
+            content_hash = index.get(os.path.realpath(path))
+            complement = self.store.complement_path(path, content_hash) if content_hash is not None else None
+            complements.append(self._file_hash(complement) if complement is not None and complement.exists() else '')
+        complement_hash = hashlib.sha256(','.join(complements).encode()).hexdigest()
+        return ResultKey(direction, os.path.realpath(input_path), os.path.realpath(output_path),
+                         self._file_hash(input_path), self._file_hash(output_path), complement_hash,
+                         self.definition_hash)
+
+    def _update_complement(self, path: str, complement: bytes, direction: str) -> None:
+        """
+        :param direction: the direction of the run the complement is the configuration of
+        """
+        current_hash = self._file_hash(path)
+        with self.tracer.span('write-complement', bytes=len(complement)) as span:
+            with self._lock:
+                span.set(path=str(self.store.put(path, current_hash, complement)))
+                self._complement_runs[os.path.realpath(path)] = (current_hash, direction)
+
+    def _stored_complement(self, path: str, direction: str) -> str | None:
+        """The stored complement of the model, if a run of the direction left it for the current content."""
+        current_hash = self._file_hash(path)
+        with self._lock:
+            if self._complement_runs.get(os.path.realpath(path)) != (current_hash, direction):
+                return None
+            complement_path = self.store.lookup(path, current_hash)
+        return str(complement_path) if complement_path is not None else None
+
+    def _share_complement(self, path: str, other_path: str) -> None:
+        """
+        Store the complement of the model as the complement of the other model too,
+        e.g., after the other model was replaced by the result written from that complement.
+        """
+        current_hash = self._file_hash(path)
+        with self._lock:
+            run = self._complement_runs.get(os.path.realpath(path))
+            complement_path = self.store.lookup(path, current_hash)
+        if run is None or run[0] != current_hash or complement_path is None:
+            return
+        self._update_complement(other_path, complement_path.read_bytes(), run[1])
+
+    def _compact(self, complement: bytes) -> bytes:
+        """
+        Drop the complement entries of deleted elements from a configuration continuing a stored complement,
+        if the workspace compacts them; only the holder cell is parsed and rewritten.
+        """
+        if not self.config.compact_complements:
+            return complement
+        with self.tracer.span('compact-complements', bytes=len(complement)) as span:
+            complement, report = compact_complements_kore(complement)
+            span.set(kept=report.kept, dropped=report.dropped)
+        if report.dropped:
+            _LOGGER.info(f'Dropped {report.dropped} complement entries of deleted elements.')
+        return complement
+
+    def _complement_of(self, path: str) -> str:
+        complement_path = self.store.lookup(path)
+        if complement_path is None:
+            raise SyncError(f"There is no complement for '{path}'.")
+        return str(complement_path)
+
+    def _parse_kore(self, kore: bytes) -> Pattern:
+        return self._read_kore(io.BytesIO(kore), len(kore))
+
+    def _read_kore(self, stream: IO[bytes], size: int) -> Pattern:
+        with self.tracer.span('parse-kore', bytes=size) as span:
+            pattern = KoreReader(stream).pattern()
+            if self.tracer.enabled:
+                span.set(term_size=pattern_size(pattern))
+            return pattern
+
+    def _read_kore_file(self, path: str) -> Pattern:
+        with open(path, 'rb') as f:
+            return self._read_kore(f, os.path.getsize(path))
+
+    def _find_cell(self, stream: IO[bytes], cell_name: str) -> Pattern | None:
+        """The cell of a configuration, if it has one; the rest of the configuration is skipped without being parsed."""
+        with self.tracer.span('read-cell', cell=cell_name) as span:
+            cell = read_cell(stream, _cell_symbol(cell_name))
+            if cell is not None and self.tracer.enabled:
+                span.set(term_size=pattern_size(cell))
+            return cell
+
+    def _read_cell(self, stream: IO[bytes], cell_name: str) -> Pattern:
+        cell = self._find_cell(stream, cell_name)
+        if cell is None:
+            raise SyncError(f'The configuration has no <{cell_name}> cell.')
+        return cell
+
+    def _read_cell_file(self, path: str, cell_name: str) -> Pattern:
+        with open(path, 'rb') as f:
+            return self._read_cell(f, cell_name)
+
+    def _parse_cell(self, direction: str, path: str, cell_name: str) -> Pattern:
+        """
+        Parse the model with a `--depth 0` run of the direction and return the cell holding it;
+        the cell is read from the pipe while `krun` writes the configuration.
+        """
+        cmd = self.krun_command(direction) + ['--depth', '0']
+        if self.definition.unified:
+            init = self._write_temp(self._init_term(direction, path), f'parse-{direction}')
+            cmd += ['--term', '--parser', 'cat', init]
+        else:
+            cmd.append(path)
+
+        def _consume(stdout: IO[bytes]) -> Pattern | ValueError | None:
+            # a failing krun writes no or a truncated configuration, which is only reported if krun succeeded
+            try:
+                return self._find_cell(stdout, cell_name)
+            except ValueError as err:
+                return err
+
+        with self.tracer.span('krun', phase='parse', cmd=' '.join(map(str, cmd))):
+            result = self.profiler.stream(cmd, _consume)
+        if result.returncode or result.stderr:
+            raise SyncError(result.stderr.decode() or f'krun exited with {result.returncode}.')
+        if isinstance(result.stdout, ValueError):
+            raise result.stdout
+        if result.stdout is None:
+            raise SyncError(f'The configuration has no <{cell_name}> cell.')
+        return result.stdout
+
+    def _run_model(self, print_hints: bool, direction: str, path: str, phase: str) -> bytes:
+        """Run the interpreter of the direction on the model."""
+        cmd = self.krun_command(direction)
+        if not self.definition.unified:
+            return self._run_cmd(print_hints, cmd, path, phase=phase)
+        init = self._write_temp(self._init_term(direction, path), f'{phase}-{direction}')
+        return self._run_cmd(print_hints, cmd, init, -1, True, phase=phase, model=path)
+
+    def _run_config(self, print_hints: bool, direction: str, config: Pattern, phase: str = 'continue') -> bytes:
+        """Run the interpreter of the direction on the configuration."""
+        if self.definition.unified:
+            config = self._replace_cell(config, _direction_cell(direction), DIRECTION_CELL_NAME)
+        return self._run_cmd(print_hints, self.krun_command(direction), self._write_temp(config), -1, True,
+                             phase=phase)
+
+    def _init_term(self, direction: str, path: str) -> Pattern:
+        """
+        The initial configuration of the unified definition for the model, as `krun` would build it:
+        the configuration variables map the model to update to its end state or initial content,
+        and the direction to 0 (forward) or 1 (backward).
+        """
+        definition = self.definition
+        if direction == 'forward':
+            source, target = self._parse_model(path, definition.source_sort), parse_pattern(definition.target_init)
+        else:
+            source, target = parse_pattern(definition.source_init), self._parse_model(path, definition.target_sort)
+        variables = [
+            (SOURCE_VAR, definition.source_sort, source),
+            (TARGET_VAR, definition.target_sort, target),
+            (DIRECTION_VAR, 'Int', _int(DIRECTION_VALUES[direction])),
+        ]
+        items = [App(MAP_ITEM, (), (_inj('KConfigVar', DV(SortApp('SortKConfigVar'), String(name))),
+                                    _inj(sort, value)))
+                 for name, sort, value in variables]
+        return App('LblinitGeneratedTopCell', (), (build_map(items),))
+
+    def _parse_model(self, path: str, sort: str) -> Pattern:
+        cmd = ['kast', '--definition', str(self.kompiled_path('forward')), '--sort', sort, '--output', 'kore', path]
+        with self.tracer.span('kast', cmd=' '.join(cmd)) as span:
+            result = self.profiler.run(cmd)
+            span.set(stdout_bytes=len(result.stdout))
+        if result.returncode:
+            raise SyncError(result.stderr.decode())
+        return self._parse_kore(result.stdout)
+
+    def _run_cmd(self, print_hints: bool, cmd: list[str], path: str, depth: int = -1, is_kore: bool = False,
+                 phase: str = 'krun', model: str | None = None) -> bytes:
+        """
+        :param model: the model the proof hints are written next to; `path` if None
+        """
+        hint_cmd = []
+        if print_hints:
+            hint_cmd = cmd + ['--proof-hint']
+        if depth >= 0:
+            cmd = cmd + ['--depth', str(depth)]
+            hint_cmd = hint_cmd + ['--depth', str(depth)]
+        if is_kore:
+            cmd = cmd + ['--term', '--parser', 'cat']
+            hint_cmd = hint_cmd + ['--term', '--parser', 'cat']
+        hints = None
+        deferred = getattr(self._local, 'deferred_jobs', None)
+        if print_hints and deferred is not None:
+            with self.tracer.span('record-proof-job', phase=phase):
+                job = self.proof_jobs.record(hint_cmd, path, depth, phase, _proof_path(model or path, depth))
+            deferred.append(job.id)
+        elif print_hints:
+            hints = self._submit(self._run_hints, hint_cmd + [path], model or path, depth, phase)
+        cmd = cmd + [path]
+        with self.tracer.span('krun', phase=phase, cmd=' '.join(map(str, cmd))) as span:
+            result = self.profiler.run(cmd)
+            span.set(stdout_bytes=len(result.stdout))
+        if hints is not None:
+            hints.result()
+        if result.stderr:
+            raise SyncError(result.stderr.decode())
+        return result.stdout
+
+    def _run_hints(self, hint_cmd: list[str], path: str, depth: int, phase: str) -> None:
+        with self.tracer.span('krun-proof-hints', phase=phase, cmd=' '.join(map(str, hint_cmd))) as span:
+            result = self.profiler.run(hint_cmd)
+            span.set(stdout_bytes=len(result.stdout))
+        if result.stderr:
+            raise SyncError(result.stderr.decode())
+        with open(_proof_path(path, depth), 'wb') as f:
+            f.write(result.stdout)
+        if self.rule_counts is not None:
+            with self.tracer.span('count-rules', phase=phase):
+                kompiled = hint_cmd[hint_cmd.index('--definition') + 1]
+                counts = count_rule_ordinals(result.stdout, Path(kompiled))
+                with self._lock:
+                    self.rule_counts.setdefault(kompiled, Counter()).update(counts)
+
+    def _replace_cell(self, origin: Pattern, replaced: Pattern, cell_name: str) -> Pattern:
+        with self.tracer.span('replace-cell', cell=cell_name):
+            return replace_cell(origin, _cell_symbol(cell_name), replaced)
+
+    def _write_temp(self, kore: Pattern, kind: str | None = None) -> str:
+        """
+        :param kind: tells apart the temporary files of runs that can overlap, e.g., `parse-forward`
+        """
+        name = getattr(self._local, 'temp_file', TEMP_FILE)
+        if kind is not None:
+            name = name.replace('.kore', f'.{kind}.kore')
+        path = str(self.workspace / name)
+        with self.tracer.span('write-temp', path=path) as span:
+            with open(path, 'w') as f:
+                write_pattern(kore, f)
+            span.set(bytes=os.path.getsize(path))
+        return path
+
+    def _create_complements(self, proof_hints: bool, path1: str, path2: str, direction: str,
+                            reuse: bool = False) -> bool:
+        """
+        Create the complements of both models; the create run on the source continues with the target.
+        :param direction: the direction of the synchronization; the model to update is unchanged
+        :param reuse: start from the stored complement of the model to update where a run of this synchronizer left
+            it; the synchronization then sees the complements of the last synchronization of the pair
+        :return: whether a stored complement was continued; it may hold the entries of deleted elements
+        """
+        cell2 = self.definition.out_cell_name
+        if not os.path.exists(path1) and not os.path.exists(path2):
+            raise SyncError('Both input and output files do not exist.')
+        if not os.path.exists(path1):
+            create_result = self._run_model(proof_hints, 'backward', path2, 'create')
+            self._update_complement(path2, create_result, 'backward')
+            _LOGGER.info('Finished creating the complement for the input file...')
+            return False
+        if not os.path.exists(path2):
+            create_result = self._run_model(proof_hints, 'forward', path1, 'create')
+            self._update_complement(path1, create_result, 'forward')
+            _LOGGER.info('Finished creating the complement for the output file...')
+            return False
+        if reuse and direction == 'forward':
+            # the put run continues a configuration of a backward run
+            if self._stored_complement(path2, 'backward') is not None:
+                _LOGGER.info('Reusing the complement of the output file...')
+                return True
+            # the configuration the target was written from holds it already
+            stored = self._stored_complement(path2, 'forward')
+            if stored is not None:
+                continue_result = self._run_config(proof_hints, 'backward', self._read_kore_file(stored))
+                self._update_complement(path2, continue_result, 'backward')
+                _LOGGER.info('Finished continuing the complement of the output file...')
+                return True
+        stored = self._stored_complement(path1, 'forward') if reuse and direction == 'backward' else None
+        # the create run on path1, or the read of its stored complement, and the parse of path2 are independent
+        if stored is not None:
+            create_future = self._submit(self._read_kore_file, stored)
+        else:
+            create_future = self._submit(self._run_model, proof_hints, 'forward', path1, 'create')
+        path2_kore = self._parse_cell('backward', path2, cell2)
+        create_kore = create_future.result()
+        if stored is None:
+            create_kore = self._parse_kore(create_kore)
+        continue_kore = self._replace_cell(create_kore, path2_kore, cell2)
+        continue_result = self._run_config(proof_hints, 'backward', continue_kore)
+        if stored is not None:
+            # the backward synchronization reads this complement; there is no put run to compact it after
+            continue_result = self._compact(continue_result)
+        self._update_complement(path2, continue_result, 'backward')
+        self._update_complement(path1, continue_result, 'backward')
+        _LOGGER.info('Finished creating the complement...' if stored is None
+                     else 'Finished continuing the complement of the output file...')
+        return stored is not None
+
+    def _synchronize(self, proof_hints: bool, direction: str, input_path: str, output_path: str,
+                     in_cell_name: str, out_cell_name: str, to_delete: list[str],
+                     parsed_input: Future | None = None, compact: bool = False) -> str:
+        """
+        Run the put rules on the complement of the models, and write the result; return the written path.
+        :param compact: drop the complement entries of deleted elements from the complement the put run leaves
+        """
+        if not os.path.exists(output_path):
+            out_cell = self._read_cell_file(self._complement_of(input_path), out_cell_name)
+            written = output_path
+            self._write_output(written, self._print_result(out_cell, out_cell_name, to_delete, output_path))
+        elif out_cell_name == self.definition.in_cell_name:
+            out_cell = self._read_cell_file(self._complement_of(input_path), out_cell_name)
+            written = output_path + SYNCHRONIZED_SUFFIX
+            self._write_output(written, self._print_result(out_cell, out_cell_name, to_delete, output_path))
+        else:
+            continue_future = self._submit(self._read_kore_file, self._complement_of(output_path))
+            if parsed_input is None:
+                parsed_input = self._submit(self._parse_cell, direction, input_path, in_cell_name)
+            input_kore = parsed_input.result()
+            continue_kore = self._replace_cell(continue_future.result(), input_kore, in_cell_name)
+            continue_result = self._run_config(proof_hints, direction, continue_kore)
+            self._update_complement(input_path, self._compact(continue_result) if compact else continue_result,
+                                    direction)
+            written = output_path + SYNCHRONIZED_SUFFIX
+            out_cell = self._read_cell(io.BytesIO(continue_result), out_cell_name)
+            self._write_output(written, self._print_result(out_cell, out_cell_name, to_delete, output_path))
+        _LOGGER.info('Finished synchronization...')
+        return written
+
+    def _print_result(self, cell: Pattern, out_cell_name: str, to_delete: list[str], model: str | None = None) -> str:
+        """
+        :param model: the model the result is written for; the elements of its last result are not formatted again
+        """
+        content = cell.patterns[0]
+        native = out_cell_name in self.definition.native_lists
+        fragments = None
+        if model is not None and self.config.incremental_unparsing:
+            with self.tracer.span('split-elements') as span:
+                content, elements = split_elements(content, self.cons_symbols, native)
+                span.set(elements=len(elements))
+            if elements:
+                fragments = self._format_elements(model, elements)
+        with self.tracer.span('kore-to-kast'):
+            term: KInner = kore_to_kast(self.kdef, content)
+        if native:
+            with self.tracer.span('from-native-list'):
+                term = from_native_list(term, *self.definition.native_lists[out_cell_name])
+        with self.tracer.span('format') as span:
+            text = self.formatter.format(term, fragments, FRAGMENT_SORT)
+            text = codecs.escape_decode(text)[0].decode('utf-8')
+            span.set(bytes=len(text))
+        with self.tracer.span('remove-pattern-text', patterns=len(to_delete)):
+            return remove_pattern_text(text, to_delete)
+
+    def _format_elements(self, model: str, elements: list[Pattern]) -> list[str]:
+        """The texts of the list elements of a result, formatted only if they are not in the last result."""
+        path = fragment_cache_path(self.workspace / UNPARSING_DIR, model)
+        with self._lock:
+            cache = self._fragment_caches.get(path)
+            if cache is None:
+                cache = self._fragment_caches[path] = FragmentCache(path, self.definition_hash)
+        with self.tracer.span('format-elements', elements=len(elements)) as span:
+            hits = cache.hits
+            texts = cache.render(elements, lambda element: self.formatter.format(kore_to_kast(self.kdef, element)))
+            span.set(reused=cache.hits - hits)
+        return texts
+
+    def _write_output(self, path: str, text: str) -> None:
+        """Write the result atomically, and only if it differs from what the file holds."""
+        with self.tracer.span('write-output', path=path, bytes=len(text)) as span:
+            span.set(written=write_if_changed(Path(path), text.encode()))
+
+
+def _proof_path(model: str, depth: int) -> str:
+    """The file the proof hints of a run on the model are written to, next to the model."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return str(model) + '.proof' + ('' if not depth else f'.{depth}') + f'.{timestamp}'
+
+
+def _cell_symbol(cell_name: str) -> str:
+    return f"Lbl'-LT-'{cell_name}'-GT-'"
+
+
+def _int(value: int) -> DV:
+    return DV(SortApp('SortInt'), String(str(value)))
+
+
+def _inj(sort: str, pattern: Pattern) -> App:
+    return App('inj', (SortApp('Sort' + sort), SortApp('SortKItem')), (pattern,))
+
+
+def _direction_cell(direction: str) -> App:
+    return App(_cell_symbol(DIRECTION_CELL_NAME), (), (_int(DIRECTION_VALUES[direction]),))
+
+
+def check_independent(jobs: list[BatchJob]) -> None:
+    """Fail unless every model occurs in one synchronization of the batch at most."""
+    paths = Counter(os.path.realpath(path) for job in jobs for path in (job.input_path, job.output_path))
+    shared = sorted(path for path, count in paths.items() if count > 1)
+    if shared:
+        raise SyncError(f'The models {shared} occur in more than one synchronization of the batch.')
+
+
+def read_batch_manifest(path: Path) -> list[BatchJob]:
+    """
+    Read the jobs of a batch, one `<direction> <input> <output>` line per synchronization;
+    blank lines and lines starting with `#` are skipped, relative paths are relative to the manifest.
+    """
+    jobs = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) != 3 or fields[0] not in DIRECTIONS:
+                raise SyncError(f"{path}:{number}: expected '<forward|backward> <input> <output>', found: {line!r}")
+            direction, input_path, output_path = fields
+            jobs.append(BatchJob(direction, path.parent / input_path, path.parent / output_path))
+    return jobs
+
+
+def remove_pattern_text(text: str, replaced: list[str]) -> str:
+    """Remove the patterns from the printed model, and its blank lines."""
+    for r in replaced:
+        text = re.sub(r, '', text)
+    return '\n'.join(line for line in text.split('\n') if line.strip())
@@ -1,265 +1,58 @@
-
-SYNC_TEMPLATE = """#!/usr/bin/env python3
+SYNC_TEMPLATE = r"""#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+# The command line of the BX workspace; the synchronization itself is `kbx.synchronizer.Synchronizer`.
 import argparse
-import subprocess
+import logging
 import os
 import sys
-import hashlib
-import json
 from pathlib import Path
-from datetime import datetime
-import tempfile
-from pyk.kast.formatter import Formatter
-from pyk.konvert import kore_to_kast
-from pyk.kore.parser import KoreParser
-from pyk.kore.syntax import App, Pattern
-from pyk.kast.pretty import PrettyPrinter
-from pyk.kast.outer import read_kast_definition
-import codecs
-import re
 
-sys.setrecursionlimit(100000)
+# this script is named like the `kbx` package; import the package, not the script
+sys.path = [p for p in sys.path if os.path.realpath(p or '.') != os.path.dirname(os.path.realpath(__file__))]
+from kbx.distributed import DEFAULT_HOST, DEFAULT_QUEUE_SIZE, DEFAULT_RETRIES, TOKEN_ENV, Coordinator, \
+    DistributedError
+from kbx.kompile import BuildProfile
+from kbx.profiling import Profiler, default_profile_dir
+from kbx.proof_jobs import JobState, ProofJobError
+from kbx.rule_stats import SORT_KEYS
+from kbx.synchronizer import Synchronizer, SyncError, read_batch_manifest
+from kbx.tracing import Tracer, TRACE_FORMATS
+from kbx.watch import DEFAULT_POLL_INTERVAL, DEFAULT_DEBOUNCE
+from kbx.workspace import ComplementLimits, WorkspaceConfig
 
 CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
-BX_DEF = "${bx_def}"
-forward_k_def = os.path.join(CURRENT_DIR, 'forward', BX_DEF)
-backward_k_def = os.path.join(CURRENT_DIR, 'backward', BX_DEF)
-forward_kompiled = os.path.join(CURRENT_DIR, 'forward', 'llvm-kompiled')
-bakcward_kompiled = os.path.join(CURRENT_DIR, 'backward', 'llvm-kompiled')
-kompile_forward = ['kompile', forward_k_def, '-O3', '--gen-glr-bison-parser', '-o', forward_kompiled, '--emit-json']
-kompile_backward = ['kompile', backward_k_def, '-O3', '--gen-glr-bison-parser', '-o', bakcward_kompiled, '--emit-json']
-krun_forward = ['krun', '--definition', forward_kompiled, '-o', 'kore']
-krun_backward = ['krun', '--definition', bakcward_kompiled, '-o', 'kore']
-HASH_FILE = os.path.join(CURRENT_DIR, 'file_hashes.json')
-COMPLEMENTS_DIR = os.path.join(CURRENT_DIR, 'complements')
-F_IN_CELL_NAME = '${f_in_cell_name}'
-F_OUT_CELL_NAME = '${f_out_cell_name}'
-F_IN_DELETE = ${f_in_delete}
-F_OUT_DELETE = ${f_out_delete}
-TEMP_PATH = os.path.join(CURRENT_DIR, 'temp.kore')
-
-
-def calculate_file_hash(path: Path) -> str:
-    hasher = hashlib.sha256()
-    with open(path, 'rb') as file:
-        buffer = file.read()
-        hasher.update(buffer)
-    return hasher.hexdigest()
-
-
-def load_hashes() -> dict:
-    if Path(HASH_FILE).exists():
-        with open(HASH_FILE, 'r') as f:
-            return json.load(f)
-    return {}
-
-
-def save_hashes(hashes: dict) -> None:
-    with open(HASH_FILE, 'w') as f:
-        json.dump(hashes, f, indent=4)
-
-
-def has_file_changed(path: Path) -> bool:
-    stored_hashes = load_hashes()
-    current_hash = calculate_file_hash(path)
-    if stored_hashes.get(str(path)) != current_hash:
-        stored_hashes[str(path)] = current_hash
-        save_hashes(stored_hashes)
-        return True
-    return False
-
-
-def update_complements(path: Path, complement: str) -> None:
-    stored_hashes = load_hashes()
-    current_hash = calculate_file_hash(path)
-    prev_hash = stored_hashes.get(str(path))
-    if prev_hash:
-        prev_complement_path = os.path.join(COMPLEMENTS_DIR, prev_hash)
-        if os.path.exists(prev_complement_path):
-            os.remove(prev_complement_path)
-    complement_path = os.path.join(COMPLEMENTS_DIR, current_hash)
-    with open(complement_path, 'w') as f:
-        f.write(complement)
-    stored_hashes[str(path)] = current_hash
-    save_hashes(stored_hashes)
-
-
-def init(allow_proof_hints: bool):
-    # read the backward_k_def
-    with open(backward_k_def, 'r') as f:
-        content = f.read()
-        # Check if there is '?KbxGenTodo' in the content
-        if '?KbxGenTodo' in content:
-            print(f"Error: Please complete the transformation definition in '{backward_k_def}' with default values.")
-            sys.exit(1)
-    # Delete the forward_kompiled and backward_kompiled directories
-    if os.path.exists(forward_kompiled):
-        subprocess.run(['rm', '-rf', forward_kompiled])
-    if os.path.exists(bakcward_kompiled):
-        subprocess.run(['rm', '-rf', bakcward_kompiled])
-    # Run the kompile command
-    print("Running kompile command for the definition of forward transformation...")
-    if allow_proof_hints:
-        kompile_forward.append('--llvm-proof-hint-instrumentation')
-        kompile_backward.append('--llvm-proof-hint-instrumentation')
-    result = subprocess.run(kompile_forward, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.stderr and b"Error" in result.stderr:
-        print(f"Error: {result.stderr.decode()}")
-        sys.exit(1)
-    print("Running kompile command for the definition of backward transformation...")
-    result = subprocess.run(kompile_backward, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.stderr and b"Error" in result.stderr:
-        print(f"Error: {result.stderr.decode()}")
-        sys.exit(1)
-    print("Initialization operation performed.")
-
-
-def get_cell_by_symbol(pat: Pattern, symbol) -> Pattern | None:
-    result = None
-
-    def _get_cell_by_symbol(p: Pattern) -> Pattern:
-        nonlocal result
-        if isinstance(p, App) and p.symbol == symbol:
-            result = p
-        return p
+CONFIG = WorkspaceConfig.load(Path(CURRENT_DIR))
 
-    pat.top_down(_get_cell_by_symbol)
-    return result
 
+def gc(sync, limits, dry_run):
+    report = sync.gc(limits, dry_run)
+    for path in report.dropped_paths:
+        print(f"Dropped the complement reference of the missing model '{path}'.")
+    action = 'Would remove' if dry_run else 'Removed'
+    print(f"{action} {len(report.removed)} complements ({report.freed_bytes} bytes).")
 
-def remove_pattern_text(text, replaced):
-    result = []
-    for r in replaced:
-        text = re.sub(r, '', text)
-    lines = text.split('\\n')
-    for line in lines:
-        if line.strip():
-            result.append(line)
-    return '\\n'.join(result)
 
+def deferred_hints(sync, job_ids, background, workers):
+    if not job_ids:
+        return
+    if background:
+        worker = sync.spawn_proof_worker(job_ids, workers)
+        print(f"Generating {len(job_ids)} deferred proof hints in the background (pid {worker.pid}).")
+    else:
+        print(f"Deferred {len(job_ids)} proof-hint runs; generate them with 'kbx.py hints run'.")
 
-def trans(proof_hints, trans_type, input_path, output_path):
-    input_path = os.path.abspath(input_path)
-    output_path = os.path.abspath(output_path)
-    kdef = read_kast_definition(os.path.join(forward_kompiled, 'compiled.json'))
-    formatter = Formatter(kdef)
-    if not os.path.isfile(input_path):
-        print(f"Error: Input file '{input_path}' does not exist.")
-        sys.exit(1)
-
-    def _run_cmd(print_hints, cmd, path, depth=-1, is_kore=False):
-        hint_cmd = []
-        if print_hints:
-            hint_cmd = cmd + ['--proof-hint']
-        if depth >= 0:
-            cmd = cmd + ['--depth', str(depth)]
-            hint_cmd = hint_cmd + ['--depth', str(depth)]
-        if is_kore:
-            cmd = cmd + ['--term', '--parser', 'cat']
-            hint_cmd = hint_cmd + ['--term', '--parser', 'cat']
-        cmd = cmd + [path]
-        hint_cmd = hint_cmd + [path]
-        if print_hints:
-            result = subprocess.run(hint_cmd,stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if result.stderr:
-                print(f"Error: {result.stderr.decode()}")
-                sys.exit(1)
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            proof_path = str(path) + '.proof' + ('' if not depth else f'.{depth}') + f'.{timestamp}'
-            with open(proof_path, 'w') as f:
-                f.write(str(result.stdout))
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.stderr:
-            print(f"Error: {result.stderr.decode()}")
-            sys.exit(1)
-        return result.stdout.decode()
-
-    def _extract_cell(kore, cell_name) -> Pattern:
-        kore = KoreParser(kore).pattern()
-        cell = get_cell_by_symbol(kore, f"Lbl'-LT-'{cell_name}'-GT-'")
-        return cell
-
-    def _replace_cell(origin: Pattern, replaced: Pattern, cell_name: str) -> Pattern:
-        def _replace_cell_aux(p: Pattern) -> Pattern:
-            nonlocal replaced
-            if isinstance(p, App) and p.symbol == f"Lbl'-LT-'{cell_name}'-GT-'":
-                return replaced
-            return p
-        return origin.top_down(_replace_cell_aux)
-
-    def _run_create_complements(path1, cmd1, path2, cmd2, cell2):
-        if not os.path.exists(COMPLEMENTS_DIR):
-            os.makedirs(COMPLEMENTS_DIR)
-        if not os.path.exists(path1) and not os.path.exists(path2):
-            raise Exception("Error: Both input and output files do not exist.")
-        if not os.path.exists(path1):
-            create_result = _run_cmd(proof_hints, cmd2, path2)
-            update_complements(path2, create_result)
-            print("Finished creating the complement for the input file...")
-            return
-        if not os.path.exists(path2):
-            create_result = _run_cmd(proof_hints, cmd1, path1)
-            update_complements(path1, create_result)
-            print("Finished creating the complement for the output file...")
-            return
-        create_result = _run_cmd(proof_hints, cmd1, path1)
-        create_kore = KoreParser(create_result).pattern()
-        path2_kore = _run_cmd(False, cmd2, path2, 0)
-        path2_kore = _extract_cell(path2_kore, cell2)
-        continue_kore = _replace_cell(create_kore, path2_kore, cell2)
-        with open(TEMP_PATH, 'w') as f:
-            continue_kore.write(f)
-        continue_result = _run_cmd(proof_hints, cmd2, TEMP_PATH, -1, True)
-        update_complements(path2, continue_result)
-        update_complements(path1, continue_result)
-        print("Finished creating the complement...")
-
-    def _run_krun(cmd1, in_cell_name, out_cell_name, to_delete):
-
-        def _print_result(p: Pattern):
-            cell = get_cell_by_symbol(p, f"Lbl'-LT-'{out_cell_name}'-GT-'")
-            cell = kore_to_kast(kdef, cell.args[0])
-            final_print = formatter.format(cell)
-            final_print = codecs.escape_decode(final_print)[0].decode('utf-8')
-            final_print = remove_pattern_text(final_print, to_delete)
-            return final_print
-
-        if not os.path.exists(output_path):
-            with open(output_path, 'w') as f:
-                complement_path = os.path.join(COMPLEMENTS_DIR, load_hashes().get(input_path))
-                create_kore = KoreParser(open(complement_path).read()).pattern()
-                f.write(_print_result(create_kore))
-        elif out_cell_name == F_IN_CELL_NAME:
-            complement_path = os.path.join(COMPLEMENTS_DIR, load_hashes().get(input_path))
-            put_kore = KoreParser(open(complement_path).read()).pattern()
-            new_output_path = output_path + '.synchronized'
-            with open(new_output_path, 'w') as f:
-                f.write(_print_result(put_kore))
-        else:
-            create_result = _run_cmd(False, cmd1, input_path, 0)
-            input_kore = _extract_cell(create_result, in_cell_name)
-            complement_path = os.path.join(COMPLEMENTS_DIR, load_hashes().get(output_path))
-            continue_kore = KoreParser(open(complement_path).read()).pattern()
-            continue_kore = _replace_cell(continue_kore, input_kore, in_cell_name)
-            with open(TEMP_PATH, 'w') as f:
-                continue_kore.write(f)
-            continue_result = _run_cmd(proof_hints, cmd1, TEMP_PATH, -1, True)
-            update_complements(input_path, continue_result)
-            new_output_path = output_path + '.synchronized'
-            with open(new_output_path, 'w') as f:
-                f.write(_print_result(KoreParser(continue_result).pattern()))
-        print("Finished synchronization...")
 
-    if trans_type == 'forward':
-        _run_create_complements(input_path, krun_forward, output_path, krun_backward, F_OUT_CELL_NAME)
-        _run_krun(krun_forward, F_IN_CELL_NAME, F_OUT_CELL_NAME, F_OUT_DELETE)
-    elif trans_type == 'backward':
-        _run_create_complements(output_path, krun_forward, input_path, krun_backward, F_OUT_CELL_NAME)
-        _run_krun(krun_backward, F_OUT_CELL_NAME, F_IN_CELL_NAME, F_IN_DELETE)
-    else:
-        print(f"Error: Invalid transformation direction '{trans_type}', should be 'forward' or 'backward'.")
+def hints_status(sync, job_ids):
+    jobs = [sync.proof_jobs.job(job_id) for job_id in job_ids] if job_ids else sync.proof_jobs.jobs()
+    counts = {state: 0 for state in JobState}
+    for job in jobs:
+        status = sync.proof_jobs.status(job.id)
+        counts[status.state] += 1
+        line = f"{job.id}  {status.state.value:<8} {job.phase:<9} {job.proof_path}"
+        if status.error:
+            line += f"  ({status.error.strip().splitlines()[0]})"
+        print(line)
+    print(', '.join(f"{count} {state.value}" for state, count in counts.items()))
 
 
 def main():
@@ -269,26 +62,186 @@ def main():
     # Subparser for the 'init' command
     init_parser = subparsers.add_parser('init', help='Initialization operation')
     init_parser.add_argument('--allow-proof-hints', action='store_true', help='Allow proof hints to be generated')
+    init_parser.add_argument('--build-profile', choices=[p.value for p in BuildProfile],
+                             default=CONFIG.build_profile.value,
+                             help='Kompile options of the interpreters: dev (fast kompile), release (fast runs), '
+                                  'or hints (release with proof-hint instrumentation); recorded in the workspace')
+    init_parser.add_argument('--profile', action='store_true',
+                             help='Write cProfile, tracemalloc and child resource usage reports to the workspace')
 
     # Subparser for the 'trans' command
     trans_parser = subparsers.add_parser('trans', help='Transform operation')
     trans_parser.add_argument('--proof-hints', action='store_true', help='Generate proof hints')
+    trans_parser.add_argument('--profile', action='store_true',
+                              help='Write cProfile, tracemalloc and child resource usage reports to the workspace')
     trans_parser.add_argument('transformation_direction', type=str,
                               help='Direction of transformation: forward or backward')
     trans_parser.add_argument('input_path', type=str, help='Path to the input file')
     trans_parser.add_argument('output_path', type=str, help='Path to the output file')
+    trans_parser.add_argument('--rule-stats', type=str, default=None,
+                              help='Write how many times each generated rule fired to this file (JSON if it ends '
+                                   'with .json, a table otherwise); implies --proof-hints')
+    trans_parser.add_argument('--rule-stats-sort', choices=SORT_KEYS, default='count',
+                              help='Sort order of the rule statistics')
+    trans_parser.add_argument('--sequential', action='store_true',
+                              help='Run the interpreters one after the other instead of overlapping independent runs')
+    trans_parser.add_argument('--no-cache', action='store_true',
+                              help='Synchronize even if the models are unchanged since their last synchronization')
+    trans_parser.add_argument('--trace', type=str, default=None,
+                              help='Write the spans of the synchronization phases to this file')
+    trans_parser.add_argument('--trace-format', choices=TRACE_FORMATS, default='chrome',
+                              help='Format of the trace: Chrome-trace/Perfetto JSON or JSON lines')
+    trans_parser.add_argument('--defer-hints', action='store_true',
+                              help="Record the proof-hint runs as jobs instead of waiting for them, to be run by "
+                                   "'hints run'; implies --proof-hints")
+    trans_parser.add_argument('--background-hints', action='store_true',
+                              help='Run the deferred proof-hint jobs in a detached background process')
+    trans_parser.add_argument('--hint-workers', type=int, default=1,
+                              help='Number of proof-hint jobs the background process runs at once')
+
+    # Subparser for the 'serve' command
+    serve_parser = subparsers.add_parser('serve', help='Distribute the synchronizations of a batch to workers')
+    serve_parser.add_argument('manifest', type=str,
+                              help='File with one "<forward|backward> <input> <output>" line per synchronization')
+    serve_parser.add_argument('--host', type=str, default=DEFAULT_HOST, help='Address to listen on')
+    serve_parser.add_argument('--port', type=int, default=0, help='Port to listen on (default: a free port)')
+    serve_parser.add_argument('--local-workers', type=int, default=0,
+                              help='Number of worker processes to start on this host')
+    serve_parser.add_argument('--slots', type=int, default=1, help='Number of jobs each local worker runs at once')
+    serve_parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                              help='Number of jobs waiting for a worker at most')
+    serve_parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                              help='Number of times the job of a lost worker is requeued')
+    serve_parser.add_argument('--no-cache', action='store_true',
+                              help='Synchronize even if the models did not change since their last synchronization')
+    serve_parser.add_argument('--token', type=str, default=os.environ.get(TOKEN_ENV),
+                              help=f'Token the workers must present; required unless the host is a loopback address '
+                                   f'(default: ${TOKEN_ENV})')
+
+    # Subparser for the 'hints' command
+    hints_parser = subparsers.add_parser('hints', help='Deferred proof-hint jobs')
+    hints_subparsers = hints_parser.add_subparsers(dest='hints_command', required=True)
+    hints_status_parser = hints_subparsers.add_parser('status', help='The state of the proof-hint jobs')
+    hints_status_parser.add_argument('job_ids', nargs='*', help='Ids of the jobs (default: all jobs)')
+    hints_run_parser = hints_subparsers.add_parser('run', help='Generate the proof hints of the jobs')
+    hints_run_parser.add_argument('job_ids', nargs='*', help='Ids of the jobs (default: all pending and failed jobs)')
+    hints_run_parser.add_argument('--workers', type=int, default=1, help='Number of jobs run at once')
+    hints_run_parser.add_argument('--force', action='store_true',
+                                  help='Run finished jobs again and check that they reproduce their proof hints')
+
+    # Subparser for the 'watch' command
+    watch_parser = subparsers.add_parser('watch', help='Synchronize the models whenever one of them changes')
+    watch_parser.add_argument('source_path', type=str, help='Path to the source model')
+    watch_parser.add_argument('target_path', type=str, help='Path to the target model')
+    watch_parser.add_argument('--proof-hints', action='store_true', help='Generate proof hints')
+    watch_parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                              help='Seconds between two checks of the models')
+    watch_parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                              help='Seconds a changed model must stay unchanged before it is synchronized')
+    watch_parser.add_argument('--sequential', action='store_true',
+                              help='Run the interpreters one after the other instead of overlapping independent runs')
+
+    # Subparser for the 'gc' command
+    gc_parser = subparsers.add_parser('gc', help='Remove unreferenced complements and enforce the store limits')
+    gc_parser.add_argument('--max-entries', type=int, default=CONFIG.complements.max_entries,
+                           help='Maximal number of stored complements')
+    gc_parser.add_argument('--max-bytes', type=int, default=CONFIG.complements.max_bytes,
+                           help='Maximal total size of the stored complements')
+    gc_parser.add_argument('--max-age-days', type=float, default=CONFIG.complements.max_age_days,
+                           help='Evict complements not used for this many days')
+    gc_parser.add_argument('--save', action='store_true',
+                           help='Save the limits to the workspace configuration; they are enforced after every trans')
+    gc_parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+
+    # Subparser for the 'stats' command
+    stats_parser = subparsers.add_parser('stats', help='Rule statistics of a recorded proof hint file')
+    stats_parser.add_argument('transformation_direction', choices=['forward', 'backward'],
+                              help='Direction of the transformation that produced the proof hints')
+    stats_parser.add_argument('proof_path', type=str, help='Path to the proof hint file')
+    stats_parser.add_argument('--output', type=str, default='rule-stats.json',
+                              help='Output file, JSON if it ends with .json, a table otherwise')
+    stats_parser.add_argument('--sort', choices=SORT_KEYS, default='count', help='Sort order of the statistics')
 
     args = parser.parse_args()
-
-    if args.command == 'init':
-        init(args.allow_proof_hints)
-    elif args.command == 'trans':
-        trans(args.proof_hints, args.transformation_direction, args.input_path, args.output_path)
-    else:
-        parser.print_help()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    profiler = Profiler(Path(CURRENT_DIR), enabled=False)
+    if getattr(args, 'profile', False):
+        profiler.enabled = True
+        profiler.output_dir = default_profile_dir(Path(CURRENT_DIR))
+        print(f"Writing profiling reports to '{profiler.output_dir}'...")
+    tracer = Tracer(enabled=getattr(args, 'trace', None) is not None)
+    sync = Synchronizer(Path(CURRENT_DIR), sequential=getattr(args, 'sequential', False), tracer=tracer,
+                        profiler=profiler)
+
+    try:
+        if args.command == 'init':
+            sync.init(args.allow_proof_hints, BuildProfile(args.build_profile))
+            print("Initialization operation performed.")
+        elif args.command == 'trans':
+            if args.rule_stats is not None:
+                sync.rule_counts = {}
+            try:
+                result = sync.trans(args.transformation_direction, args.input_path, args.output_path,
+                                    args.proof_hints or args.defer_hints, use_cache=not args.no_cache,
+                                    defer_hints=args.defer_hints)
+            finally:
+                if tracer.enabled:
+                    tracer.write(Path(args.trace), args.trace_format)
+            deferred_hints(sync, result.proof_jobs, args.background_hints, args.hint_workers)
+            if args.rule_stats is not None:
+                sync.write_rule_stats(Path(args.rule_stats), args.rule_stats_sort)
+                print(f"Rule statistics are written to '{args.rule_stats}'.")
+            evicted = sync.store.evict()
+            if evicted:
+                print(f"Evicted {len(evicted)} complements beyond the limits of the complement store.")
+        elif args.command == 'serve':
+            jobs = read_batch_manifest(Path(args.manifest))
+            with Coordinator(sync, args.host, args.port, args.queue_size, args.retries,
+                             not args.no_cache, token=args.token) as coordinator:
+                host, port = coordinator.address
+                print(f"Serving {len(jobs)} synchronizations on {host}:{port}; "
+                      f"start workers with 'python -m kbx worker {host}:{port}'.")
+                local_workers = coordinator.spawn_local_workers(args.local_workers, slots=args.slots)
+                batch = coordinator.run_batch(jobs)
+            for worker in local_workers:
+                worker.wait()
+            for job, error in batch.failures:
+                print(f"Failed to synchronize '{job.input_path}' {job.direction}: {error}")
+            print(f"Synchronized {len(batch.results)} of {len(jobs)} model pairs on the workers "
+                  f"in {batch.wall_time:.2f}s.")
+            if batch.failures:
+                sys.exit(1)
+        elif args.command == 'hints':
+            if args.hints_command == 'status':
+                hints_status(sync, args.job_ids)
+            else:
+                statuses = sync.run_proof_jobs(args.job_ids or None, args.workers, args.force)
+                failed = {job_id: status for job_id, status in statuses.items() if status.state == JobState.FAILED}
+                for job_id, status in failed.items():
+                    print(f"Proof job {job_id} failed: {status.error}")
+                print(f"Generated the proof hints of {len(statuses) - len(failed)} of {len(statuses)} jobs.")
+                if failed:
+                    sys.exit(1)
+        elif args.command == 'watch':
+            sync.watch(args.source_path, args.target_path, args.proof_hints, args.poll_interval, args.debounce)
+        elif args.command == 'gc':
+            limits = ComplementLimits(args.max_entries, args.max_bytes, args.max_age_days)
+            if args.save:
+                sync.config.complements = limits
+                sync.config.save(sync.workspace)
+            gc(sync, limits, args.dry_run)
+        elif args.command == 'stats':
+            sync.proof_rule_stats(args.transformation_direction, Path(args.proof_path), Path(args.output), args.sort)
+            print(f"Rule statistics are written to '{args.output}'.")
+        else:
+            parser.print_help()
+    except (SyncError, ProofJobError, DistributedError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        sync.close()
 
 
 if __name__ == '__main__':
     main()
-    
-"""
\ No newline at end of file
+"""
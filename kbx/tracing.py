@@ -0,0 +1,133 @@
+"""
+This module provides lightweight tracing spans for the phases of a synchronization run.
+The spans are exported as a Chrome-trace/Perfetto JSON file (open it in `chrome://tracing` or https://ui.perfetto.dev)
+or as JSON lines, one span per line.
+A disabled tracer records nothing, so the spans can stay in the synchronizer at no cost.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Final, Iterator
+
+from pyk.kore.syntax import Pattern
+
+TRACE_FORMATS: Final = ('chrome', 'jsonl')
+
+
+@dataclass
+class Span:
+    name: str
+    start_ns: int
+    end_ns: int = 0
+    depth: int = 0
+    thread_id: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'duration_ns': self.duration_ns,
+            'depth': self.depth,
+            'thread_id': self.thread_id,
+            'attributes': self.attributes,
+        }
+
+    def to_chrome_event(self, pid: int) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'cat': 'kbx',
+            'ph': 'X',
+            'ts': self.start_ns / 1000,
+            'dur': self.duration_ns / 1000,
+            'pid': pid,
+            'tid': self.thread_id,
+            'args': self.attributes,
+        }
+
+
+class _NoSpan(Span):
+    """The span handed out by a disabled tracer; attributes set on it are dropped."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NO_SPAN: Final = _NoSpan('', 0)
+
+
+class Tracer:
+    enabled: bool
+    spans: list[Span]
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.spans = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Trace the enclosed block as a span.
+        :param name: the name of the phase
+        :param attributes: attributes of the span, e.g., byte sizes, term sizes and subprocess commands;
+            more attributes can be set on the yielded span
+        """
+        if not self.enabled:
+            yield _NO_SPAN
+            return
+        depth = getattr(self._local, 'depth', 0)
+        span = Span(name, time.perf_counter_ns(), depth=depth, thread_id=threading.get_ident(),
+                    attributes=attributes)
+        self._local.depth = depth + 1
+        try:
+            yield span
+        finally:
+            span.end_ns = time.perf_counter_ns()
+            self._local.depth = depth
+            with self._lock:
+                self.spans.append(span)
+
+    def write(self, path: Path, fmt: str = 'chrome') -> None:
+        """
+        Export the recorded spans.
+        :param path: the path of the trace file
+        :param fmt: `chrome` for a Chrome-trace/Perfetto JSON file, `jsonl` for JSON lines
+        """
+        spans = sorted(self.spans, key=lambda s: s.start_ns)
+        with open(path, 'w') as f:
+            match fmt:
+                case 'chrome':
+                    pid = os.getpid()
+                    json.dump({'traceEvents': [span.to_chrome_event(pid) for span in spans],
+                               'displayTimeUnit': 'ms'}, f)
+                case 'jsonl':
+                    for span in spans:
+                        f.write(json.dumps(span.to_dict()) + '\n')
+                case _:
+                    raise ValueError(f"Unknown trace format: {fmt}, should be one of {', '.join(TRACE_FORMATS)}")
+
+
+def pattern_size(pattern: Pattern) -> int:
+    """Count the nodes of a KORE pattern without recursion; user lists nest as deep as the model is long."""
+    size = 0
+    stack = [pattern]
+    while stack:
+        p = stack.pop()
+        size += 1
+        stack.extend(p.patterns)
+    return size
@@ -0,0 +1,186 @@
+"""
+This module prints the output cell of a synchronization incrementally.
+The output of a synchronization is a user list (`List{Person, ","}`), or the `List` backing it, whose elements mostly
+stay the same from one synchronization of a model to the next; formatting them is most of the printing time.
+The printer keeps the formatted text of every element of the last output of a model, by the hash of the KORE of
+the element, in the `unparsing/` directory of the workspace.
+Only new or changed elements are converted to KAST and formatted; the list itself is formatted with a placeholder
+per element, and the placeholders are replaced by the texts of the elements, indented as the formatter would.
+An element is formatted without the list around it: the elements of a list never need brackets, so the text is
+that of a full print.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+from typing import Callable, Final
+
+from pyk.konvert import munge
+from pyk.kore.syntax import DV, App, Pattern, SortApp, String
+
+from kbx.kore import write_pattern
+
+UNPARSING_DIR: Final = 'unparsing'
+# the sort of the placeholders of the elements; the formatter replaces their tokens by the element texts
+FRAGMENT_SORT: Final = 'KbxFragment'
+_INJ: Final = 'inj'
+_KSEQ: Final = 'kseq'
+_LIST_CONCAT: Final = "Lbl'Unds'List'Unds'"
+_LIST_ITEM: Final = 'LblListItem'
+_LIST_UNIT: Final = "Lbl'Stop'List"
+
+
+def cons_symbols(labels: list[str]) -> frozenset[str]:
+    """The KORE symbols of the cons labels of user lists."""
+    return frozenset('Lbl' + munge(label) for label in labels)
+
+
+def split_elements(content: Pattern, conses: frozenset[str], native: bool = False) -> tuple[Pattern, list[Pattern]]:
+    """
+    Replace the elements of the list the content holds (through injections and a K sequence) by placeholders.
+    :param native: the content is a `List` converted back to the user list after printing; the `List` is rebuilt
+        right-associative, which the conversion does not tell apart
+    :return: the content with the placeholders, and the replaced elements in order; no elements if it is no list
+    """
+    # the path from the content to the list: [(application, index of the argument on the path)]
+    path: list[tuple[App, int]] = []
+    term = content
+    while isinstance(term, App) and (term.symbol == _INJ or term.symbol == _KSEQ and term.args):
+        path.append((term, 0))
+        term = term.args[0]
+    if not isinstance(term, App):
+        return content, []
+    if term.symbol in conses:
+        skeleton, elements = _split_cons(term, conses)
+    elif native and term.symbol in (_LIST_CONCAT, _LIST_ITEM, _LIST_UNIT):
+        skeleton, elements = _split_list(term)
+    else:
+        return content, []
+    for parent, index in reversed(path):
+        args = list(parent.args)
+        args[index] = skeleton
+        skeleton = parent.let(args=args)
+    return skeleton, elements
+
+
+def _split_cons(term: App, conses: frozenset[str]) -> tuple[Pattern, list[Pattern]]:
+    spine: list[App] = []
+    tail: Pattern = term
+    while isinstance(tail, App) and tail.symbol in conses:
+        spine.append(tail)
+        tail = _strip_inj(tail.args[1])
+    elements = [cons.args[0] for cons in spine]
+    result: Pattern = spine[-1].args[1]
+    for index in range(len(spine) - 1, -1, -1):
+        cons = spine[index]
+        rest = result if index == len(spine) - 1 else _with_inj(cons.args[1], result)
+        result = cons.let(args=[_placeholder(index), rest])
+    return result, elements
+
+
+def _split_list(term: App) -> tuple[Pattern, list[Pattern]]:
+    """The elements of a `List` are the arguments of its `ListItem`s, in order."""
+    items: list[App] = []
+    stack: list[Pattern] = [term]
+    while stack:
+        p = stack.pop()
+        if isinstance(p, App) and p.symbol == _LIST_CONCAT:
+            stack.extend(reversed(p.args))
+        elif isinstance(p, App) and p.symbol == _LIST_ITEM:
+            items.append(p)
+    elements = [item.args[0] for item in items]
+    if not items:
+        return term, []
+    result: Pattern = items[-1].let(args=[_placeholder(len(items) - 1)])
+    for index in range(len(items) - 2, -1, -1):
+        result = App(_LIST_CONCAT, (), (items[index].let(args=[_placeholder(index)]), result))
+    return result, elements
+
+
+def _placeholder(index: int) -> DV:
+    return DV(SortApp('Sort' + FRAGMENT_SORT), String(str(index)))
+
+
+def _strip_inj(pattern: Pattern) -> Pattern:
+    while isinstance(pattern, App) and pattern.symbol == _INJ:
+        pattern = pattern.args[0]
+    return pattern
+
+
+def _with_inj(value: Pattern, replacement: Pattern) -> Pattern:
+    """The value with the pattern it injects replaced."""
+    if isinstance(value, App) and value.symbol == _INJ:
+        return value.let(args=[_with_inj(value.args[0], replacement)])
+    return replacement
+
+
+def element_hash(element: Pattern) -> str:
+    output = io.StringIO()
+    write_pattern(element, output)
+    return hashlib.sha256(output.getvalue().encode()).hexdigest()
+
+
+class FragmentCache:
+    """
+    The formatted texts of the elements of the last output of one model, by the hash of their KORE.
+    The cache is only valid for the definition it was written with.
+    """
+    path: Path
+    definition_hash: str
+    hits: int
+    misses: int
+
+    def __init__(self, path: Path, definition_hash: str) -> None:
+        self.path = path
+        self.definition_hash = definition_hash
+        self.hits = 0
+        self.misses = 0
+        self._fragments: dict[str, str] | None = None
+
+    def render(self, elements: list[Pattern], fmt: Callable[[Pattern], str]) -> list[str]:
+        """
+        The texts of the elements, formatted with `fmt` unless cached;
+        the cache then holds exactly the texts of these elements.
+        """
+        fragments = self._load()
+        texts = []
+        used = {}
+        for element in elements:
+            digest = element_hash(element)
+            text = fragments.get(digest)
+            if text is None:
+                self.misses += 1
+                text = fmt(element)
+            else:
+                self.hits += 1
+            used[digest] = text
+            texts.append(text)
+        self._fragments = used
+        self._save()
+        return texts
+
+    def _load(self) -> dict[str, str]:
+        if self._fragments is None:
+            self._fragments = {}
+            if self.path.exists():
+                with open(self.path) as f:
+                    data = json.load(f)
+                if data.get('definition_hash') == self.definition_hash:
+                    self._fragments = data['fragments']
+        return self._fragments
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'definition_hash': self.definition_hash, 'fragments': self._fragments}, f)
+        os.replace(tmp, self.path)
+
+
+def fragment_cache_path(directory: Path, model: str | Path) -> Path:
+    """The cache of the outputs written for the model, named by the hash of its real path."""
+    digest = hashlib.sha256(os.path.realpath(model).encode()).hexdigest()[:16]
+    return directory / f'{digest}.json'
@@ -0,0 +1,87 @@
+"""
+This module watches the models of a synchronization for changes by polling.
+Polling two files with `os.stat` is cheap and needs no platform-specific notification API.
+A change is reported once the file has stayed unchanged for the debounce period, so that editors writing a file
+in several steps trigger one synchronization; a change is only reported if the content hash differs from the
+last known content, which also suppresses the events of files written by the synchronization itself.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final, Iterator
+
+DEFAULT_POLL_INTERVAL: Final = 0.2
+DEFAULT_DEBOUNCE: Final = 0.5
+
+
+@dataclass(frozen=True)
+class _Stat:
+    mtime_ns: int
+    size: int
+
+
+class Watcher:
+    paths: tuple[Path, ...]
+    poll_interval: float
+    debounce: float
+
+    def __init__(self, paths: list[Path], poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 debounce: float = DEFAULT_DEBOUNCE) -> None:
+        self.paths = tuple(paths)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._stats = {path: _stat(path) for path in self.paths}
+        self._hashes = {path: _hash(path) for path in self.paths}
+        # {path: time of the last observed modification}, for the changes still settling
+        self._pending: dict[Path, float] = {}
+
+    def expect(self, path: Path) -> None:
+        """Accept the current content of the path as known, e.g., after the synchronization wrote it."""
+        self._stats[path] = _stat(path)
+        self._hashes[path] = _hash(path)
+        self._pending.pop(path, None)
+
+    def poll(self) -> list[Path]:
+        """Check the paths once and return those whose content changed and settled since the last check."""
+        now = time.monotonic()
+        changed = []
+        for path in self.paths:
+            stat = _stat(path)
+            if stat != self._stats[path]:
+                self._stats[path] = stat
+                self._pending[path] = now
+                continue
+            if path in self._pending and now - self._pending[path] >= self.debounce:
+                del self._pending[path]
+                content_hash = _hash(path)
+                if content_hash != self._hashes[path]:
+                    self._hashes[path] = content_hash
+                    if content_hash is not None:
+                        changed.append(path)
+        return changed
+
+    def changes(self) -> Iterator[Path]:
+        """Yield the changed paths, forever."""
+        while True:
+            yield from self.poll()
+            time.sleep(self.poll_interval)
+
+
+def _stat(path: Path) -> _Stat | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _Stat(stat.st_mtime_ns, stat.st_size)
+
+
+def _hash(path: Path) -> str | None:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,579 @@
+"""
+This module generates synthetic models for the Families & Persons and HCSP & PlantUML evaluations.
+The hand-written examples in `evaluation/` are too small to study how synchronization and complements scale,
+so the generator produces reproducible models of arbitrary size with a controllable shape:
+1. Families: number of families, family sizes and the share of `Nothing` parents;
+2. HCSP: number of processes and statements, nesting depth of `CSPProcess` and number of interrupts.
+Both kinds of models can be rendered to the source and the target syntax of the transformation,
+and seeded edit scripts produce "modified" versions of a model for synchronization runs.
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import random
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Final, Iterable, Iterator
+
+FAMILY_NAMES: Final = ('Smith', 'Collie', 'Miller', 'Taylor', 'Brown', 'Walker', 'Clark', 'Hill', 'Baker', 'Wood')
+MALE_NAMES: Final = ('John', 'Petar', 'Kevin', 'Paul', 'Mark', 'Adam', 'Luke', 'Owen', 'Ivan', 'Hugo')
+FEMALE_NAMES: Final = ('Mary', 'Claire', 'Katie', 'Anna', 'Emma', 'Lena', 'Nora', 'Ruth', 'Iris', 'Zoe')
+SENDER_PROCESS: Final = 'Env'
+
+
+@dataclass(frozen=True)
+class FamiliesShape:
+    """
+    The shape of a generated Families model.
+    :param families: number of families
+    :param max_sons: maximal number of sons per family
+    :param max_daughters: maximal number of daughters per family
+    :param nothing_ratio: share of families with at least one `Nothing` parent (these have no children)
+    """
+    families: int = 1000
+    max_sons: int = 2
+    max_daughters: int = 2
+    nothing_ratio: float = 0.2
+
+
+@dataclass(frozen=True)
+class HCSPShape:
+    """
+    The shape of a generated HCSP model.
+    :param processes: number of processes, without the processes sending on the interrupt channels
+    :param statements: number of top-level statements per process
+    :param max_depth: maximal nesting depth of `CSPProcess` inside loops, guards and interrupts
+    :param interrupts: number of communication interrupts in the whole model
+    :param branches: number of branches per communication interrupt
+    """
+    processes: int = 10
+    statements: int = 100
+    max_depth: int = 2
+    interrupts: int = 10
+    branches: int = 1
+
+
+@dataclass(frozen=True)
+class Family:
+    name: str
+    father: str | None
+    mother: str | None
+    sons: tuple[str, ...] = ()
+    daughters: tuple[str, ...] = ()
+
+    @property
+    def size(self) -> int:
+        return 1 + (self.father is not None) + (self.mother is not None) + len(self.sons) + len(self.daughters)
+
+
+@dataclass(frozen=True)
+class Statement:
+    """
+    A statement of a HCSP process.
+    :param kind: one of `assign`, `log-assign`, `log-hybrid`, `wait`, `guard`, `loop`, `interrupts` and `send`
+    :param args: the tokens of the statement, e.g., variable names, texts and constants
+    :param body: the nested processes, i.e., the guarded statement, the loop body or the interrupt branches
+    """
+    kind: str
+    args: tuple[str, ...] = ()
+    body: tuple[tuple[Statement, ...], ...] = ()
+
+    @property
+    def size(self) -> int:
+        return 1 + sum(statement.size for process in self.body for statement in process)
+
+
+@dataclass(frozen=True)
+class Process:
+    name: str
+    statements: tuple[Statement, ...]
+
+    @property
+    def size(self) -> int:
+        return 1 + sum(statement.size for statement in self.statements)
+
+
+@dataclass(frozen=True)
+class Edit:
+    """
+    An edit operation applied to a generated model.
+    :param op: the name of the operation
+    :param target: the name of the edited family or process
+    :param detail: what was changed
+    """
+    op: str
+    target: str
+    detail: str = ''
+
+
+@dataclass
+class _Names:
+    """Unique name supply; every name gets a numeric suffix so that generated models never collide."""
+    counter: dict[str, int] = field(default_factory=dict)
+
+    def fresh(self, base: str) -> str:
+        count = self.counter.get(base, 0)
+        self.counter[base] = count + 1
+        return f'{base}{count}'
+
+
+# ---------------------------------------------------------------------------
+# Families & Persons
+# ---------------------------------------------------------------------------
+
+def generate_families(shape: FamiliesShape, seed: int = 0) -> list[Family]:
+    """
+    Generate a Families model.
+    Families with a `Nothing` parent have no children; otherwise the forward transformation gets stuck.
+    """
+    rng = random.Random(seed)
+    names = _Names()
+    return [_random_family(rng, names, shape) for _ in range(shape.families)]
+
+
+def _random_family(rng: random.Random, names: _Names, shape: FamiliesShape) -> Family:
+    name = names.fresh(rng.choice(FAMILY_NAMES))
+    father: str | None = rng.choice(MALE_NAMES)
+    mother: str | None = rng.choice(FEMALE_NAMES)
+    if rng.random() < shape.nothing_ratio:
+        match rng.randrange(3):
+            case 0:
+                father = None
+            case 1:
+                mother = None
+            case _:
+                father, mother = None, None
+        return Family(name, father, mother)
+    sons = tuple(rng.choice(MALE_NAMES) for _ in range(rng.randint(0, shape.max_sons)))
+    daughters = tuple(rng.choice(FEMALE_NAMES) for _ in range(rng.randint(0, shape.max_daughters)))
+    return Family(name, father, mother, sons, daughters)
+
+
+def iter_families_text(families: Iterable[Family]) -> Iterator[str]:
+    """Render the Families model in the format of `example.family`."""
+    def _member(first_name: str | None) -> str:
+        return 'Nothing' if first_name is None else f'{{ firstName = {first_name} }}'
+
+    def _members(first_names: tuple[str, ...]) -> str:
+        return ', '.join(_member(first_name) for first_name in first_names)
+
+    for idx, family in enumerate(families):
+        yield (('' if idx == 0 else ',\n')
+               + f'Family{{\nfamilyName={family.name},\n'
+               + f'  father={_member(family.father)},\n'
+               + f'  mother={_member(family.mother)},\n'
+               + f'  sons={_members(family.sons)},\n'
+               + f'  daughters={_members(family.daughters)}\n}}')
+
+
+def iter_persons_text(families: Iterable[Family], seed: int = 0) -> Iterator[str]:
+    """
+    Render the Persons model corresponding to the Families model in the format of `example.person`.
+    The persons are ordered as the forward transformation produces them.
+    The birthday of a person only depends on the seed and on its family and role, so the birthdays of the persons
+    an edit script does not touch are the same in the modified model.
+    """
+    persons: list[str] = []
+    for family in families:
+        members = ([('Female', f'daughter{idx}', daughter) for idx, daughter in enumerate(family.daughters)]
+                   + [('Male', f'son{idx}', son) for idx, son in enumerate(family.sons)]
+                   + ([('Female', 'mother', family.mother)] if family.mother is not None else [])
+                   + ([('Male', 'father', family.father)] if family.father is not None else []))
+        for gender, role, first_name in members:
+            birthday = _birthday(seed, family.name, role)
+            persons.append(f'{gender} {{ fullName = {family.name} {first_name} , birthday = "{birthday}" }}')
+    for idx, person in enumerate(reversed(persons)):
+        yield ('' if idx == 0 else ',\n') + person
+
+
+def _birthday(seed: int, family_name: str, role: str) -> str:
+    rng = random.Random(f'{seed}:{family_name}:{role}')
+    return f'{rng.randint(1940, 2020)}/{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}'
+
+
+def edit_families(families: list[Family], edits: int, seed: int = 0) -> tuple[list[Family], list[Edit]]:
+    """
+    Apply a seeded edit script to the Families model.
+    :return: the modified model and the applied edits
+    """
+    rng = random.Random(seed)
+    names = _Names({base: len(families) for base in FAMILY_NAMES})
+    result = list(families)
+    script: list[Edit] = []
+    for _ in range(edits):
+        if not result:
+            family = _random_family(rng, names, FamiliesShape())
+            result.append(family)
+            script.append(Edit('insert-family', family.name))
+            continue
+        idx = rng.randrange(len(result))
+        family = result[idx]
+        has_parents = family.father is not None and family.mother is not None
+        match rng.choice(('rename-member', 'add-child', 'remove-child', 'drop-parent', 'insert-family',
+                          'delete-family')):
+            case 'rename-member' if family.father is not None:
+                new_name = rng.choice(MALE_NAMES)
+                result[idx] = replace(family, father=new_name)
+                script.append(Edit('rename-member', family.name, f'father={new_name}'))
+            case 'add-child' if has_parents:
+                new_name = rng.choice(FEMALE_NAMES)
+                result[idx] = replace(family, daughters=(*family.daughters, new_name))
+                script.append(Edit('add-child', family.name, f'daughter={new_name}'))
+            case 'remove-child' if family.sons:
+                result[idx] = replace(family, sons=family.sons[:-1])
+                script.append(Edit('remove-child', family.name, f'son={family.sons[-1]}'))
+            case 'drop-parent' if family.mother is not None and not family.sons and not family.daughters:
+                result[idx] = replace(family, mother=None)
+                script.append(Edit('drop-parent', family.name, 'mother=Nothing'))
+            case 'delete-family':
+                del result[idx]
+                script.append(Edit('delete-family', family.name))
+            case _:
+                new_family = _random_family(rng, names, FamiliesShape())
+                result.insert(idx, new_family)
+                script.append(Edit('insert-family', new_family.name))
+    return result, script
+
+
+# ---------------------------------------------------------------------------
+# HCSP & PlantUML
+# ---------------------------------------------------------------------------
+
+def generate_hcsp(shape: HCSPShape, seed: int = 0) -> list[Process]:
+    """
+    Generate a HCSP model.
+    Every receive of a communication interrupt is matched by an extra process `Env<n>` sending on its channel only.
+    The senders follow the other processes, in the order their channels are received, so the model never deadlocks,
+    and, as the forward transformation spawns a process only when no thread can move, one thread at most can move
+    at any time: the interleaving of the transformation is determined, see `iter_plantuml_text`.
+    """
+    rng = random.Random(seed)
+    names = _Names()
+    process_names = [names.fresh('P') for _ in range(shape.processes)]
+    # distribute the interrupts over the processes; they are placed at the top level of the process
+    interrupt_slots: dict[str, list[int]] = {name: [] for name in process_names}
+    for _ in range(shape.interrupts if process_names else 0):
+        interrupt_slots[rng.choice(process_names)].append(rng.randrange(max(shape.statements, 1)))
+    channels: list[str] = []
+    processes = []
+    for name in process_names:
+        slots = sorted(interrupt_slots[name])
+        statements: list[Statement] = []
+        for idx in range(shape.statements):
+            while slots and slots[0] == idx:
+                slots.pop(0)
+                statements.append(_random_interrupts(rng, names, shape, channels))
+            statements.append(_random_statement(rng, names, shape, shape.max_depth))
+        processes.append(Process(name, tuple(statements)))
+    for channel in channels:
+        processes.append(Process(names.fresh(SENDER_PROCESS), (Statement('send', (channel, '0')),)))
+    return processes
+
+
+def _random_statement(rng: random.Random, names: _Names, shape: HCSPShape, depth: int) -> Statement:
+    var = f'v{rng.randrange(10)}'
+    kinds = ['assign', 'log-assign', 'log-hybrid', 'wait', 'guard']
+    if depth > 0:
+        kinds.append('loop')
+    match rng.choice(kinds):
+        case 'assign':
+            return Statement('assign', (var, str(rng.randint(0, 100))))
+        case 'log-assign':
+            return Statement('log-assign', (names.fresh('step '), var, str(rng.randint(0, 100))))
+        case 'log-hybrid':
+            return Statement('log-hybrid', (names.fresh('flow '), var, str(rng.randint(1, 5)), str(rng.randint(1, 100))))
+        case 'wait':
+            return Statement('wait', (str(rng.randint(1, 60)),))
+        case 'guard':
+            # the guarded statement must be handled on its own by the transformation
+            guarded = rng.choice((Statement('assign', (var, str(rng.randint(0, 100)))),
+                                  Statement('wait', (str(rng.randint(1, 60)),))))
+            return Statement('guard', (var, str(rng.randint(0, 100))), ((guarded,),))
+        case _:
+            body = tuple(_random_statement(rng, names, shape, depth - 1) for _ in range(rng.randint(1, 3)))
+            condition = () if rng.random() < 0.5 else (var, str(rng.randint(0, 100)))
+            return Statement('loop', condition, (body,))
+
+
+def _random_interrupts(rng: random.Random, names: _Names, shape: HCSPShape, channels: list[str]) -> Statement:
+    args = []
+    bodies = []
+    for _ in range(max(shape.branches, 1)):
+        channel = names.fresh('ch')
+        channels.append(channel)
+        args.extend([channel, f'v{rng.randrange(10)}'])
+        depth = max(shape.max_depth - 1, 0)
+        bodies.append(tuple(_random_statement(rng, names, shape, depth) for _ in range(rng.randint(1, 3))))
+    return Statement('interrupts', tuple(args), tuple(bodies))
+
+
+def _hcsp_statement(statement: Statement, indent: str) -> str:
+    args = statement.args
+    match statement.kind:
+        case 'assign':
+            return f'{args[0]} := {args[1]}'
+        case 'log-assign':
+            return f'log("{args[0]}");\n{indent}{args[1]} := {args[2]}'
+        case 'log-hybrid':
+            return f'log("{args[0]}");\n{indent}<{args[1]}\' = {args[2]} & {args[1]} < {args[3]}>'
+        case 'wait':
+            return f'wait({args[0]})'
+        case 'send':
+            return f'{args[0]} ! {args[1]}'
+        case 'guard':
+            return f'{args[0]} < {args[1]} -> {_hcsp_statement(statement.body[0][0], indent)}'
+        case 'loop':
+            body = _hcsp_process(statement.body[0], indent + '  ')
+            condition = '' if not args else f'{{{args[0]} < {args[1]}}}'
+            return f'(\n{indent}  {body};\n{indent}){condition}**'
+        case 'interrupts':
+            branches = []
+            for idx, body in enumerate(statement.body):
+                process = _hcsp_process(body, indent + '  ')
+                branches.append(f'{args[2 * idx]} ? {args[2 * idx + 1]} -->\n{indent}  {process};')
+            return '(' + f'\n{indent}$ '.join(branches) + ')'
+        case _:
+            raise ValueError(f'Unknown statement kind: {statement.kind}')
+
+
+def _hcsp_process(statements: Iterable[Statement], indent: str) -> str:
+    return f';\n{indent}'.join(_hcsp_statement(statement, indent) for statement in statements)
+
+
+def iter_hcsp_text(processes: Iterable[Process]) -> Iterator[str]:
+    """Render the HCSP model in the format of `example.hcsp`."""
+    for process in processes:
+        yield f'{process.name} ::=\n  {_hcsp_process(process.statements, "  ")}\n;\n'
+
+
+def _uml_events(statement: Statement, process: str) -> Iterator[tuple[str, str]]:
+    """
+    The events of a statement in the order the forward transformation records them: a `line`, `open` or `close` of
+    the sequence diagram, or a `send` or `receive` of `channel:value`, on which the thread waits for its peer.
+    """
+    args = statement.args
+    match statement.kind:
+        case 'assign':
+            yield 'line', f"' {process} \"Initialize\""
+        case 'log-assign' | 'log-hybrid':
+            yield 'line', f'{process} -[ #black ]> {process} : "{args[0]}"'
+        case 'wait':
+            yield 'line', f'{process} -[ #black ]> {process} :waiting {args[0]}'
+        case 'send':
+            yield 'send', f'{args[0]}:{args[1]}'
+        case 'guard':
+            yield 'open', f'alt {args[0]} < {args[1]}'
+            yield from _uml_events(statement.body[0][0], process)
+            yield 'close', ''
+        case 'loop':
+            yield 'open', 'loop ' + ('true' if not args else f'{args[0]} < {args[1]}')
+            for nested in statement.body[0]:
+                yield from _uml_events(nested, process)
+            yield 'close', ''
+        case 'interrupts':
+            for idx, body in enumerate(statement.body):
+                yield 'open', 'opt'
+                yield 'receive', f'{args[2 * idx]}:{args[2 * idx + 1]}'
+                for nested in body:
+                    yield from _uml_events(nested, process)
+                yield 'close', ''
+        case _:
+            raise ValueError(f'Unknown statement kind: {statement.kind}')
+
+
+def _process_events(process: Process) -> Iterator[tuple[str, str]]:
+    for statement in process.statements:
+        yield from _uml_events(statement, process.name)
+
+
+def iter_plantuml_text(processes: Iterable[Process]) -> Iterator[str]:
+    """
+    Render the PlantUML sequence diagram the forward transformation produces for the HCSP model,
+    in the format of `example.plantuml`.
+    The transformation spawns the next process only when no thread can move, runs a thread until it waits on a channel,
+    and closes the innermost open `opt`, `loop` or `alt` at the end of a block, whatever thread opened it;
+    a thread that ends is joined before the thread it communicated with moves on.
+    The interleaving is only determined if one thread at most can move at a time, as in the models of `generate_hcsp`.
+    """
+    to_spawn = list(processes)[::-1]
+    # the threads waiting on a channel: {channel: (process, the value sent or the variable received, its events)}
+    waiting: dict[str, dict[str, tuple[str, str, Iterator[tuple[str, str]]]]] = {'send': {}, 'receive': {}}
+    running: list[tuple[str, Iterator[tuple[str, str]]]] = []
+    depth = 0
+    first = True
+
+    def _line(text: str) -> str:
+        nonlocal first
+        line = ('' if first else '\n') + '  ' * depth + text
+        first = False
+        return line
+
+    while running or to_spawn:
+        if not running:
+            process = to_spawn.pop()
+            running.append((process.name, _process_events(process)))
+        name, events = running.pop()
+        event = next(events, None)
+        if event is None:
+            yield _line(f"' process {name}")
+            continue
+        kind, arg = event
+        match kind:
+            case 'line':
+                yield _line(arg)
+                running.append((name, events))
+            case 'open':
+                yield _line(arg)
+                depth += 1
+                running.append((name, events))
+            case 'close':
+                depth -= 1
+                yield _line('end')
+                running.append((name, events))
+            case _:
+                channel, value = arg.split(':')
+                peer_kind = 'receive' if kind == 'send' else 'send'
+                if channel not in waiting[peer_kind]:
+                    waiting[kind][channel] = name, value, events
+                    continue
+                peer, peer_value, peer_events = waiting[peer_kind].pop(channel)
+                threads = [(name, events), (peer, peer_events)]
+                (sender, expression), (receiver, var) = ((name, value), (peer, peer_value)) if kind == 'send' \
+                    else ((peer, peer_value), (name, value))
+                yield _line(f'{sender} -[ #black ]> {receiver} : {var} := {expression}')
+                for thread, thread_events in threads:
+                    following = next(thread_events, None)
+                    if following is None:
+                        yield _line(f"' process {thread}")
+                    else:
+                        running.append((thread, itertools.chain([following], thread_events)))
+                if len(running) > 1:
+                    raise ValueError(f'Both {sender} and {receiver} can move after communicating on {channel}, '
+                                     'the interleaving of the transformation is not determined.')
+    blocked = sorted({*waiting['send'], *waiting['receive']})
+    if blocked:
+        raise ValueError(f'The model deadlocks on the channels: {", ".join(blocked)}.')
+
+
+def edit_hcsp(processes: list[Process], edits: int, seed: int = 0) -> tuple[list[Process], list[Edit]]:
+    """
+    Apply a seeded edit script to the top-level statements of the HCSP model.
+    Sends and communication interrupts are never edited, so the channels stay matched.
+    :return: the modified model and the applied edits
+    """
+    rng = random.Random(seed)
+    names = _Names({'step ': 1 << 30, 'flow ': 1 << 30})
+    result = list(processes)
+    candidates = [idx for idx, process in enumerate(result) if not process.name.startswith(SENDER_PROCESS)]
+    script: list[Edit] = []
+    for _ in range(edits if candidates else 0):
+        idx = rng.choice(candidates)
+        process = result[idx]
+        statements = list(process.statements)
+        editable = [pos for pos, statement in enumerate(statements)
+                    if statement.kind not in ('interrupts', 'send')]
+        op = rng.choice(('change-text', 'change-constant', 'insert-statement', 'delete-statement'))
+        if not editable or (op == 'delete-statement' and len(statements) <= 1):
+            op = 'insert-statement'
+        match op:
+            case 'insert-statement':
+                pos = rng.randint(0, len(statements))
+                statement = _random_statement(rng, names, HCSPShape(), 0)
+                statements.insert(pos, statement)
+                detail = f'{pos}:{statement.kind}'
+            case 'delete-statement':
+                pos = rng.choice(editable)
+                detail = f'{pos}:{statements.pop(pos).kind}'
+            case 'change-text':
+                pos = rng.choice(editable)
+                statement = statements[pos]
+                if statement.kind in ('log-assign', 'log-hybrid'):
+                    statement = replace(statement, args=(names.fresh('step '), *statement.args[1:]))
+                else:
+                    statement = _random_statement(rng, names, HCSPShape(), 0)
+                statements[pos] = statement
+                detail = f'{pos}:{statement.kind}'
+            case _:
+                pos = rng.choice(editable)
+                statement = statements[pos]
+                if statement.kind in ('assign', 'wait'):
+                    statement = replace(statement, args=(*statement.args[:-1], str(rng.randint(0, 100))))
+                statements[pos] = statement
+                detail = f'{pos}:{statement.kind}'
+        result[idx] = replace(process, statements=tuple(statements))
+        script.append(Edit(op, process.name, detail))
+    return result, script
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+def write_model(path: Path, chunks: Iterable[str]) -> int:
+    """
+    Write the rendered model chunk by chunk, so that large models are never held as one string.
+    :return: the number of written characters
+    """
+    size = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def write_edit_script(path: Path, edits: Iterable[Edit], seed: int) -> None:
+    with open(path, 'w') as f:
+        json.dump({'seed': seed, 'edits': [edit.__dict__ for edit in edits]}, f, indent=4)
+
+
+def write_families_workload(
+        output_dir: Path,
+        shape: FamiliesShape,
+        seed: int = 0,
+        edits: int = 0,
+        stem: str = 'generated',
+) -> list[Path]:
+    """
+    Write a Families model, the corresponding Persons model and, if `edits > 0`, modified versions of both.
+    :return: the written paths
+    """
+    families = generate_families(shape, seed)
+    paths = [output_dir / f'{stem}.family', output_dir / f'{stem}.person']
+    write_model(paths[0], iter_families_text(families))
+    write_model(paths[1], iter_persons_text(families, seed))
+    if edits > 0:
+        modified, script = edit_families(families, edits, seed)
+        paths += [output_dir / f'{stem}.modified.family', output_dir / f'{stem}.modified.person',
+                  output_dir / f'{stem}.edits.json']
+        write_model(paths[2], iter_families_text(modified))
+        write_model(paths[3], iter_persons_text(modified, seed))
+        write_edit_script(paths[4], script, seed)
+    return paths
+
+
+def write_hcsp_workload(
+        output_dir: Path,
+        shape: HCSPShape,
+        seed: int = 0,
+        edits: int = 0,
+        stem: str = 'generated',
+) -> list[Path]:
+    """
+    Write a HCSP model, the corresponding PlantUML model and, if `edits > 0`, modified versions of both.
+    :return: the written paths
+    """
+    processes = generate_hcsp(shape, seed)
+    paths = [output_dir / f'{stem}.hcsp', output_dir / f'{stem}.plantuml']
+    write_model(paths[0], iter_hcsp_text(processes))
+    write_model(paths[1], iter_plantuml_text(processes))
+    if edits > 0:
+        modified, script = edit_hcsp(processes, edits, seed)
+        paths += [output_dir / f'{stem}.modified.hcsp', output_dir / f'{stem}.modified.plantuml',
+                  output_dir / f'{stem}.edits.json']
+        write_model(paths[2], iter_hcsp_text(modified))
+        write_model(paths[3], iter_plantuml_text(modified))
+        write_edit_script(paths[4], script, seed)
+    return paths
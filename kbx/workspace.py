@@ -0,0 +1,109 @@
+"""
+This module contains the configuration of a generated BX workspace, stored as `config.json` in the workspace.
+The generated `kbx.py` reads it on every run; missing keys take their defaults.
+The generator also describes the generated definitions for the runtime in `synchronization.json`.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Final
+
+from kbx.kompile import BuildProfile
+
+CONFIG_FILE: Final = 'config.json'
+SYNC_FILE: Final = 'synchronization.json'
+
+
+@dataclass
+class ComplementLimits:
+    """
+    The caps of the complement store; None means unbounded.
+    :param max_entries: the maximal number of stored complements
+    :param max_bytes: the maximal total size of the stored complements
+    :param max_age_days: complements not used for longer are evicted
+    """
+    max_entries: int | None = None
+    max_bytes: int | None = None
+    max_age_days: float | None = None
+
+    @property
+    def bounded(self) -> bool:
+        return self.max_entries is not None or self.max_bytes is not None or self.max_age_days is not None
+
+
+@dataclass
+class WorkspaceConfig:
+    """
+    :param complements: the limits of the complement store
+    :param build_profile: the build profile of the interpreters, selected at generation and `init` time
+    :param compact_complements: drop the complement entries of deleted elements from the complements continued by a
+        synchronization, e.g., in `watch`
+    :param incremental_unparsing: format only the list elements of a result that its last result did not have
+    """
+    complements: ComplementLimits = field(default_factory=ComplementLimits)
+    build_profile: BuildProfile = BuildProfile.RELEASE
+    compact_complements: bool = True
+    incremental_unparsing: bool = True
+
+    @staticmethod
+    def load(workspace: Path) -> WorkspaceConfig:
+        path = workspace / CONFIG_FILE
+        if not path.exists():
+            return WorkspaceConfig()
+        with open(path) as f:
+            data: dict[str, Any] = json.load(f)
+        return WorkspaceConfig(
+            complements=ComplementLimits(**data.get('complements', {})),
+            build_profile=BuildProfile(data.get('build_profile', BuildProfile.RELEASE.value)),
+            compact_complements=data.get('compact_complements', True),
+            incremental_unparsing=data.get('incremental_unparsing', True),
+        )
+
+    def save(self, workspace: Path) -> None:
+        data = asdict(self)
+        data['build_profile'] = self.build_profile.value
+        with open(workspace / CONFIG_FILE, 'w') as f:
+            json.dump(data, f, indent=4)
+
+
+@dataclass
+class SyncDefinition:
+    """
+    What the runtime needs to know about the generated definitions.
+    :param bx_def: the file name of the generated definitions in `forward/` and `backward/`, or in `unified/`
+    :param in_cell_name: the cell of the source model
+    :param out_cell_name: the cell of the target model
+    :param in_deletes: the patterns removed from a printed source model
+    :param out_deletes: the patterns removed from a printed target model
+    :param native_lists: the cons and nil labels of the cells backed by `List`, by cell name
+    :param unified: both directions are one definition in `unified/`, started with the configuration variables
+        `$SOURCE`, `$TARGET` and `$DIRECTION` instead of `$PGM`
+    :param source_sort: the sort of the source models, for the unified definition
+    :param target_sort: the sort of the target models, for the unified definition
+    :param source_init: the KORE of the source in the configurations of the backward transformation
+    :param target_init: the KORE of the target in the configurations of the forward transformation
+    """
+    bx_def: str
+    in_cell_name: str
+    out_cell_name: str
+    in_deletes: list[str] = field(default_factory=list)
+    out_deletes: list[str] = field(default_factory=list)
+    native_lists: dict[str, tuple[str, str]] = field(default_factory=dict)
+    unified: bool = False
+    source_sort: str = ''
+    target_sort: str = ''
+    source_init: str = ''
+    target_init: str = ''
+
+    @staticmethod
+    def load(workspace: Path) -> SyncDefinition:
+        with open(workspace / SYNC_FILE) as f:
+            data: dict[str, Any] = json.load(f)
+        data['native_lists'] = {cell: tuple(labels) for cell, labels in data.get('native_lists', {}).items()}
+        return SyncDefinition(**data)
+
+    def save(self, workspace: Path) -> None:
+        with open(workspace / SYNC_FILE, 'w') as f:
+            json.dump(asdict(self), f, indent=4)
@@ -0,0 +1,101 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from kbx.complements import ComplementStore
+from kbx.workspace import ComplementLimits
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> ComplementStore:
+    return ComplementStore(tmp_path / 'complements', tmp_path / 'file_hashes.json')
+
+
+@pytest.fixture
+def models(tmp_path: Path) -> list[Path]:
+    paths = [tmp_path / f'model{idx}' for idx in range(3)]
+    for path in paths:
+        path.write_text('model')
+    return paths
+
+
+def _age(path: Path, seconds: float) -> None:
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_models_of_equal_content_have_their_own_complements(store: ComplementStore, models: list[Path]) -> None:
+    first = store.put(models[0], 'same', b'first')
+    second = store.put(models[1], 'same', b'second')
+    assert first != second
+    assert store.lookup(models[0]).read_bytes() == b'first'
+    assert store.lookup(models[1]).read_bytes() == b'second'
+    assert [entry.refs for entry in store.entries()] == [1, 1]
+
+
+def test_lookup_of_other_content_misses(store: ComplementStore, models: list[Path]) -> None:
+    store.put(models[0], 'v1', b'complement')
+    assert store.lookup(models[0], 'v1') is not None
+    assert store.lookup(models[0], 'v2') is None
+    assert store.lookup(models[1]) is None
+
+
+def test_spellings_of_a_path_share_the_complement(store: ComplementStore, models: list[Path]) -> None:
+    link = models[0].with_name('link')
+    link.symlink_to(models[0])
+    store.put(link, 'v1', b'complement')
+    assert store.lookup(models[0], 'v1') == store.complement_path(models[0], 'v1')
+
+
+def test_new_content_replaces_the_complement(store: ComplementStore, models: list[Path]) -> None:
+    old = store.put(models[0], 'v1', b'old')
+    new = store.put(models[0], 'v2', b'new')
+    assert not old.exists()
+    assert store.lookup(models[0]) == new
+    assert len(store.entries()) == 1
+
+
+def test_gc_removes_unreferenced_complements(store: ComplementStore, models: list[Path]) -> None:
+    kept = store.put(models[0], 'v1', b'kept')
+    deleted = store.put(models[1], 'v1', b'of a deleted model')
+    orphan = store.directory / 'orphan'
+    orphan.write_bytes(b'no path references it')
+    (store.directory / 'interrupted.tmp').write_bytes(b'')
+    models[1].unlink()
+    assert store.gc(dry_run=True).dropped_paths == [str(models[1].resolve())]
+    assert deleted.exists()
+    report = store.gc()
+    assert sorted(entry.path for entry in report.removed) == sorted([deleted, orphan])
+    assert report.freed_bytes == len(b'of a deleted model') + len(b'no path references it')
+    assert sorted(store.directory.iterdir()) == [kept]
+    assert store.load_index() == {str(models[0].resolve()): 'v1'}
+
+
+def test_evict_least_recently_used_beyond_max_entries(store: ComplementStore, models: list[Path]) -> None:
+    paths = [store.put(model, 'v1', b'complement') for model in models]
+    for idx, path in enumerate(paths):
+        _age(path, 100 - idx)
+    # using the oldest complement makes the second one the least recently used
+    store.lookup(models[0])
+    evicted = store.evict(ComplementLimits(max_entries=2))
+    assert [entry.path for entry in evicted] == [paths[1]]
+    assert store.lookup(models[1]) is None
+    assert str(models[1].resolve()) not in store.load_index()
+    assert store.lookup(models[0]) is not None and store.lookup(models[2]) is not None
+
+
+def test_evict_beyond_max_bytes_and_max_age(store: ComplementStore, models: list[Path]) -> None:
+    paths = [store.put(model, 'v1', b'x' * 10) for model in models]
+    for idx, path in enumerate(paths):
+        _age(path, (3 - idx) * 86400)
+    # the complement unused for three days expires, then the oldest one goes to fit ten bytes
+    evicted = store.evict(ComplementLimits(max_bytes=10, max_age_days=2.5))
+    assert [entry.path for entry in evicted] == paths[:2]
+    assert [entry.path for entry in store.entries()] == paths[2:]
+
+
+def test_unbounded_store_evicts_nothing(store: ComplementStore, models: list[Path]) -> None:
+    store.put(models[0], 'v1', b'complement')
+    assert store.evict() == []
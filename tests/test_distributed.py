@@ -0,0 +1,164 @@
+import hashlib
+import socket
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+
+from kbx.distributed import Artifact, Coordinator, DistributedError, Worker, _Connection, _JobQueue, _Task, \
+    PROTOCOL_VERSION, check_artifact, check_file_name
+from kbx.synchronizer import SYNCHRONIZED_SUFFIX, BatchJob, SyncError, SyncResult, Synchronizer
+from kbx.workspace import SyncDefinition
+
+TOKEN = 'secret'
+
+
+def _fake_trans_job(self: Synchronizer, job: BatchJob, slot: int | str, proof_hints: bool = False,
+                    use_cache: bool = True, defer_hints: bool = False) -> SyncResult:
+    """Write the reversed input as the output, and store a complement for both models, as `trans_job` would."""
+    input_path, output_path = Path(job.input_path), Path(job.output_path)
+    if input_path.read_bytes() == b'fail':
+        raise SyncError('the model is invalid')
+    written = output_path if not output_path.exists() else Path(f'{output_path}{SYNCHRONIZED_SUFFIX}')
+    written.write_bytes(input_path.read_bytes()[::-1])
+    for path in (input_path, output_path):
+        content = path.read_bytes()
+        self.store.put(path, hashlib.sha256(content).hexdigest(), b'complement of ' + content)
+    return SyncResult(job.direction, input_path, output_path, written, {})
+
+
+@pytest.fixture
+def workspace(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    workspace = tmp_path / 'workspace'
+    workspace.mkdir()
+    SyncDefinition('bx.k', 'source', 'target').save(workspace)
+    for direction in ('forward', 'backward'):
+        kompiled = workspace / direction / 'llvm-kompiled'
+        kompiled.mkdir(parents=True)
+        (kompiled / 'definition.kore').write_text(f'{direction} definition')
+        (kompiled / 'interpreter').write_text('#!/bin/sh\n')
+        (kompiled / 'interpreter').chmod(0o755)
+    monkeypatch.setattr(Synchronizer, 'trans_job', _fake_trans_job)
+    return workspace
+
+
+def _start_worker(coordinator: Coordinator, cache_dir: Path, token: str | None = TOKEN) -> threading.Thread:
+    worker = Worker(coordinator.address, cache_dir, slots=2, connect_timeout=5, token=token)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_job_queue_is_bounded() -> None:
+    queue = _JobQueue(1)
+    first, second, retried = (_Task(BatchJob('forward', f'{name}.in', f'{name}.out'), Future())
+                              for name in ('first', 'second', 'retried'))
+    queue.put(first)
+    with pytest.raises(DistributedError):
+        queue.put(second, timeout=0.05)
+    # a requeued task was admitted already, and goes first
+    queue.put_front(retried)
+    assert queue.get(0.05) is retried
+    assert queue.get(0.05) is first
+    assert queue.get(0.05) is None
+    queue.put(second, timeout=0.05)
+    assert queue.close() == [second]
+    with pytest.raises(DistributedError):
+        queue.put(first)
+
+
+def test_put_waits_for_a_free_place() -> None:
+    queue = _JobQueue(1)
+    tasks = [_Task(BatchJob('forward', f'{idx}.in', f'{idx}.out'), Future()) for idx in range(2)]
+    queue.put(tasks[0])
+    thread = threading.Thread(target=queue.put, args=(tasks[1], 5))
+    thread.start()
+    assert queue.get(1) is tasks[0]
+    thread.join()
+    assert queue.get(1) is tasks[1]
+
+
+def test_retry_requeues_until_the_retries_run_out(workspace: Path) -> None:
+    with Synchronizer(workspace) as sync, Coordinator(sync, retries=1, token=TOKEN) as coordinator:
+        task = _Task(BatchJob('forward', 'a.in', 'a.out'), Future())
+        coordinator._retry(task, 'lost')
+        assert coordinator._queue.get(0.05) is task
+        coordinator._retry(task, 'lost')
+        assert coordinator._queue.get(0.05) is None
+        with pytest.raises(SyncError):
+            task.future.result(0)
+
+
+def test_round_trip(workspace: Path, tmp_path: Path) -> None:
+    models = tmp_path / 'models'
+    models.mkdir()
+    (models / 'created.in').write_bytes(b'abc')
+    (models / 'updated.in').write_bytes(b'xyz')
+    (models / 'updated.out').write_bytes(b'old')
+    (models / 'failed.in').write_bytes(b'fail')
+    jobs = [BatchJob('forward', models / f'{name}.in', models / f'{name}.out')
+            for name in ('created', 'updated', 'failed')]
+    with Synchronizer(workspace) as sync:
+        with Coordinator(sync, token=TOKEN) as coordinator:
+            worker = _start_worker(coordinator, tmp_path / 'cache')
+            batch = coordinator.run_batch(jobs)
+        worker.join(10)
+        assert not worker.is_alive()
+        assert [result.written_path for result in batch.results] == [
+            models / 'created.out', Path(f"{models / 'updated.out'}{SYNCHRONIZED_SUFFIX}")]
+        assert (models / 'created.out').read_bytes() == b'cba'
+        assert Path(f"{models / 'updated.out'}{SYNCHRONIZED_SUFFIX}").read_bytes() == b'zyx'
+        assert batch.failures == [(jobs[2], 'the model is invalid')]
+        # the complements are stored under the hashes of the models the coordinator sent
+        for name, content in (('created.in', b'abc'), ('created.out', b'cba'), ('updated.out', b'old')):
+            complement = sync.store.lookup(models / name, hashlib.sha256(content).hexdigest())
+            assert complement is not None and complement.read_bytes() == b'complement of ' + content
+
+
+def test_job_of_a_lost_worker_is_requeued(workspace: Path, tmp_path: Path) -> None:
+    (tmp_path / 'a.in').write_bytes(b'abc')
+    with Synchronizer(workspace) as sync, Coordinator(sync, token=TOKEN) as coordinator:
+        future = coordinator.submit(BatchJob('forward', tmp_path / 'a.in', tmp_path / 'a.out'))
+        # a worker taking the job and disconnecting
+        conn = _Connection(socket.create_connection(coordinator.address))
+        conn.send({'type': 'hello', 'version': PROTOCOL_VERSION, 'slot': 0, 'token': TOKEN})
+        assert conn.recv()[0]['type'] == 'workspace'
+        conn.send({'type': 'ready'})
+        assert conn.recv()[0]['type'] == 'job'
+        conn.close()
+        _start_worker(coordinator, tmp_path / 'cache')
+        assert future.result(10).written_path == tmp_path / 'a.out'
+
+
+def test_wrong_token_is_refused(workspace: Path, tmp_path: Path) -> None:
+    (tmp_path / 'a.in').write_bytes(b'abc')
+    with Synchronizer(workspace) as sync, Coordinator(sync, token=TOKEN) as coordinator:
+        worker = _start_worker(coordinator, tmp_path / 'cache', token='guess')
+        worker.join(10)
+        assert not worker.is_alive()
+        assert not (tmp_path / 'cache' / 'blobs').exists()
+
+
+def test_non_loopback_host_requires_a_token(workspace: Path) -> None:
+    with Synchronizer(workspace) as sync:
+        with pytest.raises(DistributedError):
+            Coordinator(sync, host='0.0.0.0')
+
+
+@pytest.mark.parametrize('path', ['/etc/passwd', '../outside', 'forward/../../outside', ''])
+def test_artifact_outside_of_the_workspace_is_rejected(path: str) -> None:
+    with pytest.raises(DistributedError):
+        check_artifact(Artifact(path, '0' * 64, 0, 0o644))
+
+
+def test_artifact_hash_must_be_a_digest() -> None:
+    check_artifact(Artifact('forward/llvm-kompiled/definition.kore', '0' * 64, 0, 0o644))
+    with pytest.raises(DistributedError):
+        check_artifact(Artifact('forward/definition.kore', '../../x', 0, 0o644))
+
+
+@pytest.mark.parametrize('name', ['', '.', '..', 'a/b', '/etc/passwd', 'a\\b'])
+def test_job_file_name_must_be_plain(name: str) -> None:
+    with pytest.raises(DistributedError):
+        check_file_name(name)
@@ -0,0 +1,79 @@
+import io
+
+import pytest
+from pyk.kore.parser import KoreParser
+from pyk.kore.syntax import App, DV, SortApp, String
+
+from kbx.kore import KoreReader, find_cell, parse_pattern, read_cell, replace_cell, write_pattern
+
+CONFIG = (
+    "Lbl'-LT-'generatedTop'-GT-'{}("
+    "Lbl'-LT-'in'-GT-'{}(Lbl'Hash'family{}(\\dv{SortString{}}(\"Ma\\\"rch \\\\dv{x}\\u00e9\"), Lbl'Stop'List{}())), "
+    "Lbl'-LT-'out'-GT-'{}(inj{SortInt{}, SortKItem{}}(\\dv{SortInt{}}(\"42\"))), "
+    "Lbl'-LT-'kbx-complements-holder'-GT-'{}(Lbl'Unds'Map'Unds'{}(Lbl'Stop'Map{}(), \\and{SortMap{}}(X : SortMap{}, "
+    "\\top{SortMap{}}()))), "
+    "Lbl'-LT-'x-in'-GT-'{}(@S : SortK{}), "
+    "Lbl'-LT-'generatedCounter'-GT-'{}(\\dv{SortInt{}}(\"0\")))\n"
+)
+IN: str = "Lbl'-LT-'in'-GT-'"
+OUT: str = "Lbl'-LT-'out'-GT-'"
+
+
+def _reader(text: str, chunk_size: int) -> KoreReader:
+    return KoreReader(io.BytesIO(text.encode()), chunk_size)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1 << 16])
+def test_pattern_equals_kore_parser(chunk_size: int) -> None:
+    expected = KoreParser(CONFIG).pattern()
+    assert _reader(CONFIG, chunk_size).pattern() == expected
+    assert parse_pattern(CONFIG) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1 << 16])
+def test_find_skips_to_the_applications(chunk_size: int) -> None:
+    config = KoreParser(CONFIG).pattern()
+    reader = _reader(CONFIG, chunk_size)
+    found = reader.find([OUT, IN, 'LblMissing'])
+    assert found == {IN: find_cell(config, IN), OUT: find_cell(config, OUT)}
+    # the spans cover the text of the applications
+    for symbol, cell in found.items():
+        start, end = reader.spans[symbol]
+        assert KoreParser(CONFIG[start:end]).pattern() == cell
+
+
+def test_find_ignores_longer_identifiers() -> None:
+    # `x-in` ends like the symbol of `in`, but is another identifier
+    text = ("Lbl'-LT-'top'-GT-'{}(Lbl'-LT-'x-in'-GT-'{}(\\dv{SortInt{}}(\"1\")), "
+            "Lbl'-LT-'in'-GT-'{}(\\dv{SortInt{}}(\"2\")))")
+    assert read_cell(io.BytesIO(text.encode()), IN) == App(IN, (), (DV(SortApp('SortInt'), String('2')),))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1 << 16])
+def test_find_all_yields_the_outermost_applications(chunk_size: int) -> None:
+    tokens = list(_reader(CONFIG, chunk_size).find_all('\\dv'))
+    assert [token.value.value for token in tokens] == ['Ma"rch \\dv{x}\u00e9', '42', '0']
+
+
+def test_write_pattern_round_trips() -> None:
+    config = KoreParser(CONFIG).pattern()
+    output = io.StringIO()
+    write_pattern(config, output)
+    assert output.getvalue() == config.text
+    replaced = replace_cell(config, OUT, App(OUT, (), (DV(SortApp('SortInt'), String('7')),)))
+    assert find_cell(replaced, OUT).args[0].value.value == '7'
+    assert find_cell(replaced, IN) == find_cell(config, IN)
+
+
+def test_deep_lists_do_not_recurse() -> None:
+    depth = 20000
+    text = "Lbl'UndsCommUndsUnds'{}(\\dv{SortInt{}}(\"1\"), " * depth + "Lbl'Stop'List{}()" + ')' * depth
+    pattern = KoreReader(io.BytesIO(text.encode())).pattern()
+    output = io.StringIO()
+    write_pattern(pattern, output)
+    assert output.getvalue().replace(' ', '') == text.replace(' ', '')
+
+
+def test_truncated_input_is_an_error() -> None:
+    with pytest.raises(ValueError):
+        _reader(CONFIG[:40], 1).pattern()
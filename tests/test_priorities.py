@@ -0,0 +1,74 @@
+from collections import Counter
+
+from pyk.kast import Atts
+from pyk.kast.inner import KApply, KRewrite, KSequence, KToken, KVariable
+from pyk.kast.outer import KRule
+
+from kbx.prelude import ATT_KBX_RULE
+from kbx.priorities import RESERVED_PRIORITIES, assign_priorities, may_overlap
+
+
+def _cell(name: str, content) -> KApply:
+    return KApply(f'<{name}>', [KToken('', 'Bool'), content, KToken('', 'Bool')])
+
+
+def _rule(head: str, tag: str, priority: int | None = None, owise: bool = False) -> tuple[KRule, str]:
+    lhs = KSequence([KApply(head, [KVariable('X')]), KVariable('REST')])
+    body = _cell('k', KRewrite(lhs, KVariable('REST')))
+    atts = [ATT_KBX_RULE(tag)]
+    if priority is not None:
+        atts.append(Atts.PRIORITY(str(priority)))
+    if owise:
+        atts.append(Atts.OWISE(None))
+    return KRule(body).let(att=KRule(body).att.update(atts)), 'MOD'
+
+
+def test_may_overlap_clashing_constructors() -> None:
+    assert not may_overlap(KApply('a', [KVariable('X')]), KApply('b', [KVariable('X')]))
+    assert not may_overlap(KToken('1', 'Int'), KToken('2', 'Int'))
+
+
+def test_may_overlap_variables_and_equal_heads() -> None:
+    assert may_overlap(KApply('a', [KVariable('X')]), KApply('a', [KToken('1', 'Int')]))
+    assert may_overlap(KVariable('X'), KApply('b', []))
+    assert may_overlap(KApply('_Map_', [KVariable('M'), KVariable('N')]),
+                       KApply('_|->_', [KVariable('K'), KVariable('V')]))
+
+
+def test_may_overlap_cells_by_name() -> None:
+    a = KApply('#cells', [_cell('k', KApply('a', [])), _cell('out', KVariable('O'))])
+    b = KApply('#cells', [_cell('out', KApply('b', [])), _cell('k', KApply('a', []))])
+    c = KApply('#cells', [_cell('k', KApply('c', []))])
+    assert may_overlap(a, b)
+    assert not may_overlap(a, c)
+
+
+def test_assign_priorities_keeps_overlapping_order() -> None:
+    # the second rule overlaps the owise rule, the first one clashes with both
+    rules = [_rule('a', '0:put_r'), _rule('b', '1:put_r'), _rule('b', '1:create_r', owise=True)]
+    priorities, report = assign_priorities(rules, Counter({'1:put_r': 100, '1:create_r': 5, '0:put_r': 50}), 'forward')
+    assert priorities[1] < priorities[2]
+    # the clashing rule shares the priority of the put rule rather than delay it
+    assert priorities[0] == priorities[1]
+    assert report.new_attempts <= report.old_attempts
+    # a rarely applied clashing rule is tried after the rules it would delay
+    priorities, _ = assign_priorities(rules, Counter({'1:put_r': 100, '1:create_r': 5}), 'forward')
+    assert priorities[0] == priorities[2]
+
+
+def test_assign_priorities_orders_by_hits_and_skips_reserved_band() -> None:
+    # a chain of overlapping rules of strictly increasing priorities needs one level per rule
+    rules = [_rule('a', f'{idx}:put_r', priority=idx + 1) for idx in range(60)]
+    rules.append(_rule('z', '60:put_r', priority=200))
+    priorities, _ = assign_priorities(rules, Counter({'60:put_r': 5}), 'forward')
+    assert [priorities[idx] for idx in range(60)] == sorted(priorities[idx] for idx in range(60))
+    assert len(set(priorities[idx] for idx in range(60))) == 60
+    assert not any(priority in RESERVED_PRIORITIES for priority in priorities.values())
+    # the clashing rule is tried first
+    assert priorities[60] == min(priorities.values())
+
+
+def test_assign_priorities_keeps_equal_priorities_of_overlapping_rules() -> None:
+    rules = [_rule('a', '0:put_r'), _rule('a', '1:put_r')]
+    priorities, _ = assign_priorities(rules, Counter({'1:put_r': 7}), 'forward')
+    assert priorities[0] == priorities[1]
@@ -0,0 +1,55 @@
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import IO
+
+import pytest
+
+from kbx.profiling import Profiler, stream_with_usage
+
+
+def test_concurrent_phases_record_their_own_processes(tmp_path: Path) -> None:
+    profiler = Profiler(tmp_path)
+    barrier = threading.Barrier(2)
+
+    def _phase(name: str) -> None:
+        with profiler.phase(name):
+            # both phases are open while the processes run
+            barrier.wait()
+            profiler.run(['sh', '-c', f'echo {name}'])
+            barrier.wait()
+
+    threads = [threading.Thread(target=_phase, args=(name,)) for name in ('first', 'second')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    processes = {phase.name: [process.cmd for process in phase.processes] for phase in profiler.phases}
+    assert processes == {'first': ['sh -c echo first'], 'second': ['sh -c echo second']}
+    # the reports are numbered in the order the phases ended
+    assert sorted(phase.pstats[:3] for phase in profiler.phases) == ['00-', '01-']
+    assert not tracemalloc.is_tracing()
+
+
+def test_joined_thread_records_in_the_phase(tmp_path: Path) -> None:
+    profiler = Profiler(tmp_path)
+    with profiler.phase('outer'):
+        phase = profiler.current
+
+        def _run() -> None:
+            profiler.run(['sh', '-c', 'echo unattributed'])
+            with profiler.joined(phase):
+                profiler.run(['sh', '-c', 'echo joined'])
+
+        thread = threading.Thread(target=_run)
+        thread.start()
+        thread.join()
+    assert [process.cmd for process in profiler.phases[0].processes] == ['sh -c echo joined']
+
+
+def test_stream_reports_the_error_of_consume() -> None:
+    def _consume(stdout: IO[bytes]) -> None:
+        raise ValueError('truncated')
+
+    with pytest.raises(ValueError, match='truncated'):
+        stream_with_usage(['sh', '-c', 'printf partial; exit 1'], _consume)
@@ -0,0 +1,115 @@
+import pytest
+from pyk.kast import Atts
+from pyk.kast.inner import KApply, KInner, KLabel, KRewrite, KSort, KToken, KVariable
+from pyk.kast.outer import KDefinition, KFlatModule, KNonTerminal, KProduction, KRule, KTerminal
+from pyk.prelude.kbool import FALSE, TRUE, andBool
+from pyk.prelude.kint import intToken
+
+from kbx.prelude import ATT_KBX_RULE
+from kbx.pruning import PruneReason, find_dead_rules
+
+FOO, ITEM, INT = KSort('Foo'), KSort('Item'), KSort('Int')
+# syntax Foo ::= a(Item) | b() | f(Item, Item); syntax Item ::= Int | c()
+KDEF = KDefinition('TEST', [KFlatModule('TEST', [
+    KProduction(FOO, [KTerminal('a'), KTerminal('('), KNonTerminal(ITEM), KTerminal(')')], klabel=KLabel('a')),
+    KProduction(FOO, [KTerminal('b')], klabel=KLabel('b')),
+    KProduction(FOO, [KTerminal('f'), KTerminal('('), KNonTerminal(ITEM), KTerminal(','), KNonTerminal(ITEM),
+                      KTerminal(')')], klabel=KLabel('f')),
+    KProduction(ITEM, [KNonTerminal(INT)]),
+    KProduction(ITEM, [KTerminal('c')], klabel=KLabel('c')),
+])])
+
+
+def _rule(lhs: KInner, tag: str, priority: int | None = None, requires: KInner | None = None,
+          simplification: bool = False) -> tuple[KRule, str]:
+    atts = [ATT_KBX_RULE(tag)]
+    if priority is not None:
+        atts.append(Atts.PRIORITY(str(priority)))
+    if simplification:
+        atts.append(Atts.SIMPLIFICATION(''))
+    rule = KRule(KRewrite(lhs, KApply('b')), requires=requires if requires is not None else TRUE)
+    return rule.let(att=rule.att.update(atts)), 'TEST'
+
+
+def _positive(var: KVariable) -> KInner:
+    return KApply('_>Int_', [var, intToken(0)])
+
+
+def _dead(rules: list[tuple[KRule, str]]) -> dict[str, tuple[PruneReason, str | None]]:
+    return {pruned.rule: (pruned.reason, pruned.by) for pruned in find_dead_rules(rules, KDEF).values()}
+
+
+def test_false_side_condition_is_unreachable() -> None:
+    assert _dead([_rule(KApply('a', [KVariable('X')]), '0:put_r', requires=FALSE)]) == {
+        '0:put_r': (PruneReason.UNREACHABLE, None)}
+
+
+def test_rule_under_a_more_general_rule_of_higher_priority_is_subsumed() -> None:
+    rules = [_rule(KApply('a', [intToken(1)]), '0:create_r', priority=60),
+             _rule(KApply('a', [KVariable('X', ITEM)]), '0:put_r', priority=40)]
+    assert _dead(rules) == {'0:create_r': (PruneReason.SUBSUMED, '0:put_r')}
+
+
+def test_general_rule_of_lower_priority_does_not_subsume() -> None:
+    rules = [_rule(KApply('a', [intToken(1)]), '0:put_r', priority=40),
+             _rule(KApply('a', [KVariable('X', ITEM)]), '0:create_r', priority=60)]
+    assert _dead(rules) == {}
+
+
+def test_stronger_side_condition_does_not_subsume() -> None:
+    x = KVariable('X', INT)
+    rules = [_rule(KApply('a', [x]), '0:put_r', priority=40, requires=_positive(x)),
+             _rule(KApply('a', [KVariable('Y', INT)]), '0:create_r', priority=60)]
+    assert _dead(rules) == {}
+
+
+def test_side_condition_implied_conjunct_by_conjunct_subsumes() -> None:
+    x, y = KVariable('X', INT), KVariable('Y', INT)
+    rules = [_rule(KApply('a', [x]), '0:put_r', priority=40, requires=_positive(x)),
+             _rule(KApply('a', [y]), '0:create_r', priority=60,
+                   requires=andBool([_positive(y), KApply('_<Int_', [y, intToken(9)])]))]
+    assert _dead(rules) == {'0:create_r': (PruneReason.SUBSUMED, '0:put_r')}
+
+
+def test_variable_of_another_sort_does_not_subsume() -> None:
+    # X:Int does not match c(), which is an Item but not an Int
+    rules = [_rule(KApply('a', [KVariable('X', INT)]), '0:put_r', priority=40),
+             _rule(KApply('a', [KApply('c')]), '1:put_r', priority=60)]
+    assert _dead(rules) == {}
+
+
+def test_token_of_another_sort_does_not_subsume() -> None:
+    rules = [_rule(KApply('a', [KToken('1', 'Int')]), '0:put_r', priority=40),
+             _rule(KApply('a', [KToken('1', 'String')]), '1:put_r', priority=60)]
+    assert _dead(rules) == {}
+
+
+def test_renamed_rule_of_the_same_priority_is_a_duplicate() -> None:
+    rules = [_rule(KApply('f', [KVariable('X', ITEM), KVariable('Y', ITEM)]), '0:put_r'),
+             _rule(KApply('f', [KVariable('A', ITEM), KVariable('B', ITEM)]), '1:put_r')]
+    assert _dead(rules) == {'1:put_r': (PruneReason.DUPLICATE, '0:put_r')}
+
+
+@pytest.mark.parametrize('args', [
+    # a non-injective renaming: the second rule only matches equal arguments
+    [KVariable('Z', ITEM), KVariable('Z', ITEM)],
+    # another sort
+    [KVariable('A', INT), KVariable('B', ITEM)],
+])
+def test_rule_that_is_no_renaming_is_no_duplicate(args: list[KInner]) -> None:
+    rules = [_rule(KApply('f', [KVariable('X', ITEM), KVariable('Y', ITEM)]), '0:put_r'),
+             _rule(KApply('f', args), '1:put_r')]
+    assert _dead(rules) == {}
+
+
+def test_unordered_rules_are_not_analysed() -> None:
+    rules = [_rule(KApply('a', [KVariable('X', ITEM)]), '0:put_r', priority=40),
+             _rule(KApply('a', [intToken(1)]), '1:put_r', priority=60, simplification=True)]
+    assert _dead(rules) == {}
+
+
+def test_dead_rules_do_not_subsume() -> None:
+    # the unreachable general rule cannot shadow the specific one
+    rules = [_rule(KApply('a', [KVariable('X', ITEM)]), '0:put_r', priority=40, requires=FALSE),
+             _rule(KApply('a', [intToken(1)]), '1:put_r', priority=60)]
+    assert _dead(rules) == {'0:put_r': (PruneReason.UNREACHABLE, None)}
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+from kbx.results import ResultCache, ResultKey
+
+
+def _key(source: str = 'source', target: str = 'target', complements: str = 'complements',
+         definition: str = 'definition', direction: str = 'forward', source_path: str = '/models/a.in',
+         target_path: str = '/models/a.out') -> ResultKey:
+    return ResultKey(direction, source_path, target_path, source, target, complements, definition)
+
+
+def test_miss_then_hit(tmp_path: Path) -> None:
+    cache = ResultCache(tmp_path / 'results')
+    written = tmp_path / 'model.out'
+    assert cache.get(_key()) is None
+    stored = cache.put(_key(), written, b'output')
+    assert cache.get(_key()) == stored
+    assert stored.written_path == written
+
+
+def test_any_changed_part_of_the_key_misses(tmp_path: Path) -> None:
+    cache = ResultCache(tmp_path / 'results')
+    cache.put(_key(), tmp_path / 'model.out', b'output')
+    for key in (_key(source='edited'), _key(target='edited'), _key(complements='edited'),
+                _key(definition='rekompiled'), _key(direction='backward'), _key(source_path='/models/b.in'),
+                _key(target_path='/models/b.out')):
+        assert cache.get(key) is None
+
+
+def test_missing_copy_misses(tmp_path: Path) -> None:
+    cache = ResultCache(tmp_path / 'results')
+    stored = cache.put(_key(), tmp_path / 'model.out', b'output')
+    (cache.directory / stored.output_hash).unlink()
+    assert cache.get(_key()) is None
+
+
+def test_restore_rewrites_only_a_changed_output(tmp_path: Path) -> None:
+    cache = ResultCache(tmp_path / 'results')
+    written = tmp_path / 'model.out'
+    written.write_bytes(b'output')
+    stored = cache.put(_key(), written, b'output')
+    assert not cache.restore(stored)
+    written.write_bytes(b'edited')
+    assert cache.restore(stored)
+    assert written.read_bytes() == b'output'
+
+
+def test_least_recently_used_results_are_evicted(tmp_path: Path) -> None:
+    cache = ResultCache(tmp_path / 'results', max_entries=2)
+    for name in ('a', 'b'):
+        cache.put(_key(source=name), tmp_path / f'{name}.out', name.encode())
+    # using a makes b the least recently used
+    assert cache.get(_key(source='a')) is not None
+    cache.put(_key(source='c'), tmp_path / 'c.out', b'c')
+    assert cache.get(_key(source='b')) is None
+    assert cache.get(_key(source='a')) is not None
+    assert cache.get(_key(source='c')) is not None
+    # the copy of the evicted output is removed, the copies of the others are kept
+    assert sorted(path.name for path in cache.directory.iterdir() if path.name != 'index.json') == sorted(
+        entry['output_hash'] for entry in cache.load_index().values())
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+from kbx.synchronizer import SyncError, Synchronizer
+from kbx.workspace import SyncDefinition
+
+
+@pytest.fixture
+def workspace(tmp_path: Path) -> Path:
+    workspace = tmp_path / 'workspace'
+    workspace.mkdir()
+    SyncDefinition('bx.k', 'source', 'target').save(workspace)
+    return workspace
+
+
+def _fake_krun(monkeypatch: pytest.MonkeyPatch, script: str) -> None:
+    monkeypatch.setattr(Synchronizer, 'krun_command', lambda self, direction: ['sh', '-c', script, 'krun'])
+
+
+def test_parse_reports_the_error_of_krun(workspace: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _fake_krun(monkeypatch, 'printf "[Error] Inner Parser: unexpected token" >&2; exit 113')
+    with Synchronizer(workspace) as sync, pytest.raises(SyncError, match='unexpected token'):
+        sync._parse_cell('forward', str(workspace / 'model'), 'source')
+
+
+def test_parse_reports_a_silent_failure_of_krun(workspace: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # a truncated configuration is not reported as such when krun failed
+    _fake_krun(monkeypatch, 'printf "Lbl\'-LT-\'generatedTop\'-GT-\'{}("; exit 1')
+    with Synchronizer(workspace) as sync, pytest.raises(SyncError, match='krun exited with 1'):
+        sync._parse_cell('forward', str(workspace / 'model'), 'source')
+
+
+def test_parse_reports_a_missing_cell(workspace: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _fake_krun(monkeypatch, 'printf "Lbl\'-LT-\'generatedTop\'-GT-\'{}()"')
+    with Synchronizer(workspace) as sync, pytest.raises(SyncError, match='no <source> cell'):
+        sync._parse_cell('forward', str(workspace / 'model'), 'source')
+
+
+def test_result_key_tells_pairs_of_the_same_contents_apart(workspace: Path) -> None:
+    for name in ('a', 'b'):
+        (workspace / f'{name}.in').write_text('model')
+        (workspace / f'{name}.out').write_text('other model')
+    with Synchronizer(workspace) as sync:
+        assert (sync._result_key('forward', str(workspace / 'a.in'), str(workspace / 'a.out'))
+                != sync._result_key('forward', str(workspace / 'b.in'), str(workspace / 'b.out')))
+
+
+def test_result_key_hashes_the_contents_of_the_complements(workspace: Path) -> None:
+    source, target = workspace / 'a.in', workspace / 'a.out'
+    source.write_text('model')
+    target.write_text('other model')
+    with Synchronizer(workspace) as sync:
+        sync.store.put(source, sync._file_hash(source), b'complement')
+        key = sync._result_key('forward', str(source), str(target))
+        # a complement of the same size
+        sync.store.put(source, sync._file_hash(source), b'Complement')
+        assert sync._result_key('forward', str(source), str(target)) != key
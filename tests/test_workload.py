@@ -0,0 +1,50 @@
+import pytest
+
+from kbx.workload import HCSPShape, Process, Statement, edit_hcsp, generate_hcsp, iter_plantuml_text
+
+
+def _interrupt(channel: str, var: str, *body: Statement) -> Statement:
+    return Statement('interrupts', (channel, var), (body,))
+
+
+def test_plantuml_follows_the_interleaving_of_the_transformation() -> None:
+    processes = [
+        Process('P0', (Statement('assign', ('v0', '1')), _interrupt('ch0', 'v1', Statement('wait', ('5',))),
+                       Statement('wait', ('7',)))),
+        Process('P1', (Statement('loop', (), ((Statement('wait', ('1',)),),)),)),
+        Process('Env0', (Statement('send', ('ch0', '0')),)),
+    ]
+    assert ''.join(iter_plantuml_text(processes)).splitlines() == [
+        "' P0 \"Initialize\"",
+        'opt',
+        # P0 waits on its channel, so P1 is spawned and runs to its end
+        '  loop true',
+        '    P1 -[ #black ]> P1 :waiting 1',
+        '  end',
+        "  ' process P1",
+        '  Env0 -[ #black ]> P0 : v1 := 0',
+        "  ' process Env0",
+        '  P0 -[ #black ]> P0 :waiting 5',
+        'end',
+        'P0 -[ #black ]> P0 :waiting 7',
+        "' process P0",
+    ]
+
+
+def test_plantuml_rejects_undetermined_and_deadlocked_models() -> None:
+    receiver = Process('P0', (_interrupt('ch0', 'v0', Statement('wait', ('5',))),))
+    sender = Process('Env0', (Statement('send', ('ch0', '0')), Statement('wait', ('1',))))
+    with pytest.raises(ValueError, match='not determined'):
+        ''.join(iter_plantuml_text([receiver, sender]))
+    with pytest.raises(ValueError, match='deadlocks on the channels: ch0'):
+        ''.join(iter_plantuml_text([receiver]))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_generated_models_have_a_determined_interleaving(seed: int) -> None:
+    processes = generate_hcsp(HCSPShape(processes=4, statements=20, interrupts=6, branches=2), seed)
+    modified, _ = edit_hcsp(processes, 10, seed)
+    for model in (processes, modified):
+        lines = [line.strip() for line in ''.join(iter_plantuml_text(model)).splitlines()]
+        assert lines.count('opt') == lines.count('end') - sum(line.startswith(('loop', 'alt')) for line in lines) == 12
+        assert sum(line.startswith("' process") for line in lines) == len(model)